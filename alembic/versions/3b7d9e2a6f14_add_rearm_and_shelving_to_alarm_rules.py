@@ -0,0 +1,28 @@
+"""Add rearm_seconds and shelved_until to alarm_rules
+
+Revision ID: 3b7d9e2a6f14
+Revises: 8e4a2f6c1d3b
+Create Date: 2026-10-18 21:18:47.301562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7d9e2a6f14'
+down_revision: Union[str, None] = '8e4a2f6c1d3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('alarm_rules', sa.Column('rearm_seconds', sa.Float(), nullable=True))
+    op.add_column('alarm_rules', sa.Column('shelved_until', sa.TIMESTAMP(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('alarm_rules', 'shelved_until')
+    op.drop_column('alarm_rules', 'rearm_seconds')
@@ -0,0 +1,35 @@
+"""Add tenant_id and is_active to alarm_rules
+
+Revision ID: 5c1d7e93a4b2
+Revises: b30ebe55246d
+Create Date: 2026-10-18 14:05:22.813406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1d7e93a4b2'
+down_revision: Union[str, None] = 'b30ebe55246d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('alarm_rules', sa.Column('tenant_id', sa.UUID(), nullable=True))
+    op.add_column('alarm_rules', sa.Column('is_active', sa.Boolean(), server_default=sa.text('true'), nullable=False))
+    # Las reglas existentes pertenecen al tenant de su activo.
+    op.execute("UPDATE alarm_rules r SET tenant_id = a.tenant_id FROM assets a WHERE a.id = r.asset_id")
+    op.alter_column('alarm_rules', 'tenant_id', nullable=False)
+    op.create_foreign_key('alarm_rules_tenant_id_fkey', 'alarm_rules', 'tenants', ['tenant_id'], ['id'])
+    op.create_index(op.f('ix_alarm_rules_tenant_id'), 'alarm_rules', ['tenant_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_alarm_rules_tenant_id'), table_name='alarm_rules')
+    op.drop_constraint('alarm_rules_tenant_id_fkey', 'alarm_rules', type_='foreignkey')
+    op.drop_column('alarm_rules', 'is_active')
+    op.drop_column('alarm_rules', 'tenant_id')
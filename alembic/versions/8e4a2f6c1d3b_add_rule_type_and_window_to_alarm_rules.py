@@ -0,0 +1,28 @@
+"""Add rule_type and window_seconds to alarm_rules
+
+Revision ID: 8e4a2f6c1d3b
+Revises: 5c1d7e93a4b2
+Create Date: 2026-10-18 16:42:10.527194
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4a2f6c1d3b'
+down_revision: Union[str, None] = '5c1d7e93a4b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('alarm_rules', sa.Column('rule_type', sa.String(), server_default='threshold', nullable=False))
+    op.add_column('alarm_rules', sa.Column('window_seconds', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('alarm_rules', 'window_seconds')
+    op.drop_column('alarm_rules', 'rule_type')
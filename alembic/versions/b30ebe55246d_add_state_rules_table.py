@@ -0,0 +1,51 @@
+"""Add state_rules table
+
+Revision ID: b30ebe55246d
+Revises: ff925b97f22d
+Create Date: 2026-10-18 11:40:07.518930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b30ebe55246d'
+down_revision: Union[str, None] = 'ff925b97f22d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('state_rules',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('tenant_id', sa.UUID(), nullable=False),
+    sa.Column('asset_id', sa.UUID(), nullable=True),
+    sa.Column('asset_type_id', sa.UUID(), nullable=True),
+    sa.Column('metric_name', sa.String(), nullable=False),
+    sa.Column('default_state', sa.String(), nullable=False),
+    sa.Column('states', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('hysteresis', sa.Float(), nullable=False),
+    sa.Column('min_dwell_seconds', sa.Float(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.ForeignKeyConstraint(['asset_type_id'], ['asset_types.id'], ),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_state_rules_tenant_id'), 'state_rules', ['tenant_id'], unique=False)
+    op.create_index(op.f('ix_state_rules_asset_id'), 'state_rules', ['asset_id'], unique=False)
+    op.create_index(op.f('ix_state_rules_asset_type_id'), 'state_rules', ['asset_type_id'], unique=False)
+    op.create_index(op.f('ix_state_rules_is_active'), 'state_rules', ['is_active'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_state_rules_is_active'), table_name='state_rules')
+    op.drop_index(op.f('ix_state_rules_asset_type_id'), table_name='state_rules')
+    op.drop_index(op.f('ix_state_rules_asset_id'), table_name='state_rules')
+    op.drop_index(op.f('ix_state_rules_tenant_id'), table_name='state_rules')
+    op.drop_table('state_rules')
@@ -0,0 +1,59 @@
+"""Add state intervals to machine_state_history
+
+Revision ID: ff925b97f22d
+Revises: e977e9bf006c
+Create Date: 2026-10-18 09:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ff925b97f22d'
+down_revision: Union[str, None] = 'e977e9bf006c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('machine_state_history', sa.Column('start_time', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('machine_state_history', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('machine_state_history', sa.Column('duration_seconds', sa.Float(), nullable=True))
+    # Las filas existentes solo tenían `timestamp`: se toma como inicio del intervalo.
+    op.execute("UPDATE machine_state_history SET start_time = COALESCE(timestamp, now())")
+    op.alter_column('machine_state_history', 'start_time', nullable=False)
+    # Cada registro anterior termina donde empieza el siguiente del mismo activo.
+    op.execute(
+        """
+        UPDATE machine_state_history h
+        SET end_time = n.next_start,
+            duration_seconds = EXTRACT(EPOCH FROM n.next_start - h.start_time)
+        FROM (
+            SELECT id, lead(start_time) OVER (PARTITION BY asset_id ORDER BY start_time, id) AS next_start
+            FROM machine_state_history
+        ) n
+        WHERE h.id = n.id AND n.next_start IS NOT NULL
+        """
+    )
+    op.create_index(
+        'ix_machine_state_history_asset_id_start_time', 'machine_state_history', ['asset_id', 'start_time'], unique=False
+    )
+    # Índice parcial: el intervalo abierto de cada activo se encuentra sin recorrer el histórico.
+    op.create_index(
+        'ix_machine_state_history_open_interval',
+        'machine_state_history',
+        ['asset_id'],
+        unique=False,
+        postgresql_where=sa.text('end_time IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_machine_state_history_open_interval', table_name='machine_state_history')
+    op.drop_index('ix_machine_state_history_asset_id_start_time', table_name='machine_state_history')
+    op.drop_column('machine_state_history', 'duration_seconds')
+    op.drop_column('machine_state_history', 'end_time')
+    op.drop_column('machine_state_history', 'start_time')
@@ -0,0 +1,272 @@
+# /app/alarming/active_alarms.py
+"""
+Alarmas activas y control de avalanchas de alarmas, compartidos en Redis.
+
+Una regla incumplida solo crea una alarma si Redis la "concede" (script Lua atómico, así dos
+workers que ven el mismo incumplimiento no crean dos alarmas):
+
+- la regla no tiene ya una alarma activa (sin reconocer);
+- han pasado `rearm_seconds` desde su última alarma (retardo de rearme: una señal que oscila
+  alrededor del umbral no genera una alarma por cada reconocimiento);
+- el activo no ha superado `rate_limit` alarmas en la ventana actual de `rate_window` segundos.
+
+Las ocurrencias que no generan alarma (regla activa, en rearme, activo limitado o regla
+archivada) solo se cuentan, por regla, desde su última alarma: la tabla `alarms` y las
+notificaciones quedan acotadas aunque la señal se dispare miles de veces.
+
+Claves:
+
+    alarming:active              hash regla -> {"alarm_id", "asset_id", "triggered_at", "claimed_at"}
+    alarming:last_raised         hash regla -> epoch (s) de su última alarma
+    alarming:suppressed          hash regla -> ocurrencias suprimidas desde su última alarma
+    alarming:rate:<activo>:<n>   alarmas del activo en la ventana n (con TTL)
+
+Cada proceso guarda además las reglas activas en un set en memoria para descartar sin ir a
+Redis los incumplimientos de reglas que ya tienen alarma. Se resincroniza cada
+`sync_interval` segundos y al recibir el evento `alarming.active` (reconocimientos).
+
+La concesión se escribe en Redis antes de que el lote confirme la alarma en la BD. Si el
+proceso muere entre medias, o si falla la liberación tras un rollback, la regla quedaría activa
+sin alarma que reconocer. Por eso cada `reconcile_interval` segundos `reconcile` compara
+`alarming:active` con las alarmas sin reconocer de la BD: añade las que faltan y quita las
+entradas cuya alarma no está en la BD, salvo las concedidas hace menos de `claim_grace`
+segundos (su lote puede no haber confirmado todavía).
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import redis
+
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger("app.alarming.active_alarms")
+
+# Canal del Event Broker en el que se anuncian las alarmas reconocidas.
+ACTIVE_ALARMS_EVENTS_CHANNEL = "alarming.active"
+
+ACTIVE_KEY = "alarming:active"
+LAST_RAISED_KEY = "alarming:last_raised"
+SUPPRESSED_KEY = "alarming:suppressed"
+RATE_KEY_PREFIX = "alarming:rate:"
+
+RAISED = "raised"
+SUPPRESSED_ACTIVE = "active"
+SUPPRESSED_REARM = "rearm"
+SUPPRESSED_RATE_LIMIT = "rate_limit"
+SUPPRESSED_SHELVED = "shelved"
+
+# (regla, activo, rearm_seconds, alarma a registrar, ocurrencias en el lote)
+Candidate = Tuple[uuid.UUID, uuid.UUID, float, dict, int]
+
+# KEYS: active, last_raised, suppressed. ARGV: now, rate_limit, rate_window, rate_prefix y por
+# candidata (regla, activo, rearm, alarma JSON, ocurrencias). Devuelve el resultado de cada una.
+_CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate_limit = tonumber(ARGV[2])
+local rate_window = tonumber(ARGV[3])
+local results = {}
+for i = 5, #ARGV, 5 do
+    local rule, asset, rearm, occurrences = ARGV[i], ARGV[i + 1], tonumber(ARGV[i + 2]), tonumber(ARGV[i + 4])
+    local result = 'raised'
+    if redis.call('HEXISTS', KEYS[1], rule) == 1 then
+        result = 'active'
+    else
+        local last = redis.call('HGET', KEYS[2], rule)
+        if last and now - tonumber(last) < rearm then
+            result = 'rearm'
+        elseif rate_limit > 0 then
+            local key = ARGV[4] .. asset .. ':' .. math.floor(now / rate_window)
+            local count = redis.call('INCR', key)
+            if count == 1 then
+                redis.call('EXPIRE', key, math.ceil(rate_window * 2))
+            end
+            if count > rate_limit then
+                result = 'rate_limit'
+            end
+        end
+    end
+    if result == 'raised' then
+        redis.call('HSET', KEYS[1], rule, ARGV[i + 3])
+        redis.call('HSET', KEYS[2], rule, ARGV[1])
+        redis.call('HSET', KEYS[3], rule, occurrences - 1)
+    else
+        redis.call('HINCRBY', KEYS[3], rule, occurrences)
+    end
+    results[#results + 1] = result
+end
+return results
+"""
+
+# KEYS: active. ARGV: pares (regla, entrada leída). Borra cada regla solo si su entrada no ha
+# cambiado desde que se leyó (nadie la ha liberado y vuelto a conceder entre medias).
+_REMOVE_UNCHANGED_SCRIPT = """
+local removed = 0
+for i = 1, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+        removed = removed + 1
+    end
+end
+return removed
+"""
+
+
+class ActiveAlarmStore:
+    """Reglas con alarma activa (en memoria y en Redis) y concesión de alarmas nuevas."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        sync_interval: float = 30.0,
+        rate_limit: int = 0,
+        rate_window: float = 60.0,
+        reconcile_interval: float = 300.0,
+        claim_grace: float = 120.0,
+    ):
+        self.redis = redis_client
+        self.sync_interval = sync_interval
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.reconcile_interval = reconcile_interval
+        self.claim_grace = claim_grace
+        self._claim = redis_client.register_script(_CLAIM_SCRIPT)
+        self._remove_unchanged = redis_client.register_script(_REMOVE_UNCHANGED_SCRIPT)
+        self._lock = threading.Lock()
+        self._active: Set[uuid.UUID] = set()
+        self._synced_at = 0.0
+        self._reconciled_at: Optional[float] = None
+
+    @property
+    def reconcile_due(self) -> bool:
+        """Si toca reconciliar con la BD (nunca se ha hecho en este proceso o ha caducado)."""
+        return self._reconciled_at is None or time.monotonic() - self._reconciled_at >= self.reconcile_interval
+
+    def reconcile(self, alarms: Iterable[Tuple[uuid.UUID, uuid.UUID, uuid.UUID, datetime]], now: Optional[float] = None) -> int:
+        """
+        Ajusta `alarming:active` a las alarmas sin reconocer de la BD `(regla, alarma, activo,
+        instante)`: registra las que falten (p. ej. tras vaciar Redis) y quita las entradas cuya
+        alarma no está en la BD y se concedieron hace más de `claim_grace` segundos. Después
+        sincroniza el set local. Devuelve el número de entradas quitadas.
+        """
+        now = time.time() if now is None else now
+        mapping, alarm_ids = {}, set()
+        for rule_id, alarm_id, asset_id, triggered_at in alarms:
+            mapping[str(rule_id)] = _payload(alarm_id, asset_id, triggered_at, now)
+            alarm_ids.add(str(alarm_id))
+
+        orphans = []
+        for rule_id, payload in self.redis.hgetall(ACTIVE_KEY).items():
+            entry = json.loads(payload)
+            if entry.get("alarm_id") in alarm_ids or now - entry.get("claimed_at", 0) < self.claim_grace:
+                continue
+            orphans.extend([rule_id, payload])
+
+        pipe = self.redis.pipeline(transaction=False)
+        if orphans:
+            self._remove_unchanged(keys=[ACTIVE_KEY], args=orphans, client=pipe)
+        for rule_id, payload in mapping.items():
+            pipe.hsetnx(ACTIVE_KEY, rule_id, payload)
+        results = pipe.execute()
+        removed = int(results[0]) if orphans else 0
+        self.sync()
+        self._reconciled_at = time.monotonic()
+        if removed:
+            logger.warning(f"Quitadas {removed} reglas activas de Redis cuya alarma no está sin reconocer en la BD.")
+        logger.info(f"Alarmas activas reconciliadas: {len(mapping)} en la BD, {len(self._active)} en Redis.")
+        return removed
+
+    def sync(self):
+        active = {uuid.UUID(rule_id) for rule_id in self.redis.hkeys(ACTIVE_KEY)}
+        with self._lock:
+            self._active = active
+            self._synced_at = time.monotonic()
+
+    def known_active(self) -> Set[uuid.UUID]:
+        """Reglas con alarma activa según el set local (se resincroniza si ha caducado)."""
+        if time.monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+        return self._active
+
+    def claim(
+        self, candidates: List[Candidate], suppressed: Dict[uuid.UUID, int], now: Optional[float] = None
+    ) -> List[str]:
+        """
+        Pide en una sola ida y vuelta las alarmas de `candidates` y suma a cada regla de
+        `suppressed` sus ocurrencias descartadas. Devuelve el resultado de cada candidata
+        (`raised` o el motivo de la supresión).
+        """
+        now = time.time() if now is None else now
+        pipe = self.redis.pipeline(transaction=False)
+        for rule_id, count in suppressed.items():
+            pipe.hincrby(SUPPRESSED_KEY, str(rule_id), count)
+        if candidates:
+            args = [now, self.rate_limit, self.rate_window, RATE_KEY_PREFIX]
+            for rule_id, asset_id, rearm_seconds, alarm, occurrences in candidates:
+                args.extend([
+                    str(rule_id), str(asset_id), rearm_seconds,
+                    _payload(alarm["id"], asset_id, alarm["triggered_at"], now), occurrences,
+                ])
+            self._claim(keys=[ACTIVE_KEY, LAST_RAISED_KEY, SUPPRESSED_KEY], args=args, client=pipe)
+        results = pipe.execute()
+        if not candidates:
+            return []
+        outcomes = [r.decode() if isinstance(r, bytes) else r for r in results[-1]]
+        with self._lock:
+            self._active.update(c[0] for c, outcome in zip(candidates, outcomes) if outcome in (RAISED, SUPPRESSED_ACTIVE))
+        return outcomes
+
+    def release(self, rule_ids: Iterable[uuid.UUID], rearm: bool = True):
+        """
+        Quita las reglas de las alarmas activas (alarma reconocida). Con `rearm=False` también
+        se olvida su última alarma: la usa el rollback de un lote cuyas alarmas no llegaron a la BD.
+        """
+        fields = [str(rule_id) for rule_id in rule_ids]
+        if not fields:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hdel(ACTIVE_KEY, *fields)
+        if not rearm:
+            pipe.hdel(LAST_RAISED_KEY, *fields)
+        pipe.execute()
+        self.forget(rule_ids)
+
+    def forget(self, rule_ids: Iterable[uuid.UUID]):
+        with self._lock:
+            self._active.difference_update(rule_ids)
+
+    def on_alarms_changed(self, data: dict):
+        """Manejador del Event Broker: la regla de una alarma reconocida deja de estar activa."""
+        if data.get("alarm_rule_id"):
+            self.forget([uuid.UUID(data["alarm_rule_id"])])
+
+    def suppressed_counts(self, rule_ids: List[uuid.UUID]) -> Dict[uuid.UUID, int]:
+        """Ocurrencias suprimidas de cada regla desde su última alarma."""
+        if not rule_ids:
+            return {}
+        counts = self.redis.hmget(SUPPRESSED_KEY, [str(rule_id) for rule_id in rule_ids])
+        return {rule_id: int(count or 0) for rule_id, count in zip(rule_ids, counts)}
+
+
+def _payload(alarm_id: uuid.UUID, asset_id: uuid.UUID, triggered_at: datetime, claimed_at: float) -> str:
+    return json.dumps({
+        "alarm_id": str(alarm_id), "asset_id": str(asset_id),
+        "triggered_at": triggered_at.isoformat(), "claimed_at": claimed_at,
+    })
+
+
+# Alarmas activas del proceso: las comparten todas las instancias de `AlarmingService`.
+active_alarm_store = ActiveAlarmStore(
+    get_redis_client(),
+    sync_interval=settings.ALARM_ACTIVE_SYNC_SECONDS,
+    rate_limit=settings.ALARM_ASSET_RATE_LIMIT,
+    rate_window=settings.ALARM_ASSET_RATE_WINDOW_SECONDS,
+    reconcile_interval=settings.ALARM_ACTIVE_RECONCILE_SECONDS,
+    claim_grace=settings.ALARM_ACTIVE_CLAIM_GRACE_SECONDS,
+)
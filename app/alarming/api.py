@@ -6,10 +6,13 @@ import logging
 from typing import List
 import uuid
 
+import redis
 from fastapi import APIRouter, Depends, status, HTTPException
 
 from app.alarming import schemas # Importar schemas
 from app.alarming.service import AlarmingService
+from app.alarming.stream import read_evaluator_statuses
+from app.core.redis import get_redis_client
 from app.dependencies.services import get_alarming_service
 from app.dependencies.tenant import get_tenant_id
 from app.dependencies.auth import get_current_active_user
@@ -60,6 +63,25 @@ def delete_alarm_rule(
     alarming_service.delete_rule(rule_id, tenant_id, current_user)
     return None
 
+@router.post("/rules/{rule_id}/shelve", response_model=schemas.AlarmRule, dependencies=[Depends(require_permission("alarm:acknowledge"))])
+def shelve_alarm_rule(
+    rule_id: uuid.UUID,
+    shelve_in: schemas.AlarmRuleShelve,
+    alarming_service: AlarmingService = Depends(get_alarming_service),
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+    current_user: User = Depends(get_current_active_user)
+):
+    return alarming_service.shelve_rule(rule_id, shelve_in, tenant_id, current_user)
+
+@router.post("/rules/{rule_id}/unshelve", response_model=schemas.AlarmRule, dependencies=[Depends(require_permission("alarm:acknowledge"))])
+def unshelve_alarm_rule(
+    rule_id: uuid.UUID,
+    alarming_service: AlarmingService = Depends(get_alarming_service),
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+    current_user: User = Depends(get_current_active_user)
+):
+    return alarming_service.unshelve_rule(rule_id, tenant_id, current_user)
+
 # --- Endpoints para Alarmas Activas ---
 
 @router.get("/alarms/active", response_model=List[schemas.AlarmRead], dependencies=[Depends(require_permission("alarm:read"))])
@@ -77,3 +99,10 @@ def acknowledge_alarm(
     current_user: User = Depends(get_current_active_user)
 ):
     return alarming_service.acknowledge_alarm(alarm_id, tenant_id, current_user)
+
+# --- Evaluador de alarmas dedicado ---
+
+@router.get("/evaluator/status", response_model=List[schemas.AlarmEvaluatorPartitionStatus], dependencies=[Depends(require_permission("alarm_rule:read"))])
+def get_evaluator_status(redis_client: redis.Redis = Depends(get_redis_client)):
+    """Retraso de cada partición del evaluador de alarmas (vacío si ALARM_STREAM_ENABLED=false)."""
+    return read_evaluator_statuses(redis_client)
@@ -0,0 +1,202 @@
+# /app/alarming/evaluator.py
+"""
+Evaluación vectorizada de las reglas de alarma sobre un lote de ingesta completo.
+
+Cada lectura se expande en tantos pares (lectura, regla) como reglas tenga su (activo,
+métrica); todas las condiciones se evalúan de una vez con NumPy. Las lecturas que incumplen
+la misma regla dentro del lote se agrupan: la primera (en el tiempo) da el valor y el instante
+de la alarma y el resto solo se cuenta.
+
+Las reglas de ventana se evalúan par a par: las lecturas nuevas se añaden a las guardadas en el
+ring buffer del par y el valor derivado se calcula para cada lectura nueva. En `sustained` la
+racha se continúa desde el inicio guardado en `RingBufferStore.streaks`, sin leer el buffer.
+En esas reglas el valor de la alarma es el valor derivado. Cada ampliación de un buffer (y cada
+racha que cambia) se anota en `updates` para deshacerla si la transacción del lote no se confirma.
+
+Si la ventana de una regla `rate_of_change` o `rolling_*` abarca más lecturas de las que caben en
+el buffer, el valor se calcula solo con las guardadas: se cuenta en `alarm_window_truncated` y se
+avisa una vez por regla.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.alarming.rule_index import CompiledAlarmRules
+from app.alarming.windows import (
+    RULE_SUSTAINED,
+    BufferUndo,
+    RingBufferStore,
+    sustained_breaches,
+    window_statistic,
+)
+from app.core.metrics import metrics
+from app.telemetry.columnar import ColumnarReadings
+
+logger = logging.getLogger("app.alarming.evaluator")
+
+# Lecturas añadidas a un ring buffer: (clave, deshacer del `extend` (posiciones añadidas y lecturas
+# desplazadas), {regla sustained: (inicio de racha previo, inicio fijado)}).
+BufferUpdate = Tuple[Hashable, Optional[BufferUndo], Dict[Hashable, Tuple[Optional[int], Optional[int]]]]
+
+# Reglas cuya ventana truncada ya se ha avisado en el log.
+_truncation_warned: Set[Hashable] = set()
+
+
+@dataclass
+class BatchBreaches:
+    """Reglas incumplidas en un lote (una entrada por regla)."""
+
+    rule_indices: np.ndarray  # posición de la regla en `CompiledAlarmRules`
+    values: np.ndarray  # valor de la primera lectura que la incumple
+    timestamps_ns: np.ndarray  # instante de esa lectura
+    occurrences: np.ndarray  # lecturas del lote que incumplen la regla
+
+    def __len__(self) -> int:
+        return int(self.rule_indices.shape[0])
+
+    @classmethod
+    def empty(cls) -> "BatchBreaches":
+        return cls(np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, np.int64), np.empty(0, np.int64))
+
+
+def find_breaches(
+    rules: CompiledAlarmRules,
+    batch: ColumnarReadings,
+    buffers: RingBufferStore,
+    updates: Optional[List[BufferUpdate]] = None,
+) -> BatchBreaches:
+    """Evalúa todas las reglas contra todas las lecturas del lote (ampliaciones de buffers en `updates`)."""
+    n = len(batch)
+    if not len(rules) or n == 0:
+        return BatchBreaches.empty()
+
+    # Tramo de reglas de cada par (activo, métrica) del lote: una búsqueda por par, no por lectura.
+    n_metrics = max(len(batch.metric_names), 1)
+    pairs, inverse = np.unique(batch.asset_codes.astype(np.int64) * n_metrics + batch.metric_codes, return_inverse=True)
+    metric_names = [name.lower() for name in batch.metric_names]
+    starts = np.zeros(pairs.shape[0], np.int64)
+    counts = np.zeros(pairs.shape[0], np.int64)
+    windowed = []
+    for k, pair in enumerate(pairs.tolist()):
+        key = (batch.asset_ids[pair // n_metrics], metric_names[pair % n_metrics])
+        span = rules.spans.get(key)
+        if span is not None:
+            starts[k], counts[k] = span[0], span[1] - span[0]
+            if key in rules.windowed:
+                windowed.append((k, key))
+
+    instant = _instant_breaches(rules, batch, inverse, starts, counts)
+    if not windowed:
+        return instant
+    updates = [] if updates is None else updates
+    return _concat(instant, _windowed_breaches(rules, batch, inverse, windowed, buffers, updates))
+
+
+def _instant_breaches(
+    rules: CompiledAlarmRules, batch: ColumnarReadings, inverse: np.ndarray, starts: np.ndarray, counts: np.ndarray
+) -> BatchBreaches:
+    row_counts = counts[inverse]
+    row_counts[np.isnan(batch.values)] = 0
+    total = int(row_counts.sum())
+    if total == 0:
+        return BatchBreaches.empty()
+
+    # Expansión a pares (lectura, regla).
+    rows = np.repeat(np.arange(len(batch)), row_counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+    rule_indices = starts[inverse][rows] + offsets
+    hit = rules.instant[rule_indices] & rules.breaches(rule_indices, batch.values[rows])
+    rows, rule_indices = rows[hit], rule_indices[hit]
+    if not rows.size:
+        return BatchBreaches.empty()
+
+    # Una entrada por regla: la primera lectura que la incumple.
+    order = np.lexsort((batch.timestamps_ns[rows], rule_indices))
+    rows, rule_indices = rows[order], rule_indices[order]
+    first = np.flatnonzero(np.r_[True, rule_indices[1:] != rule_indices[:-1]])
+    return BatchBreaches(
+        rule_indices=rule_indices[first],
+        values=batch.values[rows[first]],
+        timestamps_ns=batch.timestamps_ns[rows[first]],
+        occurrences=np.diff(np.r_[first, rule_indices.shape[0]]),
+    )
+
+
+def _windowed_breaches(
+    rules: CompiledAlarmRules,
+    batch: ColumnarReadings,
+    inverse: np.ndarray,
+    windowed: list,
+    buffers: RingBufferStore,
+    updates: List[BufferUpdate],
+) -> BatchBreaches:
+    # Filas del lote agrupadas por par, cada grupo en orden temporal.
+    order = np.lexsort((batch.timestamps_ns, inverse))
+    bounds = np.searchsorted(inverse[order], np.arange(int(inverse.max()) + 2))
+    found: List[tuple] = []
+    with buffers.lock:
+        for k, key in windowed:
+            rows = order[bounds[k]:bounds[k + 1]]
+            rows = rows[~np.isnan(batch.values[rows])]
+            old_ts, old_values = buffers.read(key)
+            if old_ts.shape[0]:
+                # Lecturas repetidas (reintentos del spool) o fuera de orden: ya no cambian la ventana.
+                rows = rows[batch.timestamps_ns[rows] > old_ts[-1]]
+            if not rows.size:
+                continue
+            new_ts, new_values = batch.timestamps_ns[rows], batch.values[rows]
+            ts, values = np.concatenate((old_ts, new_ts)), np.concatenate((old_values, new_values))
+            first = old_ts.shape[0]
+            streaks = {}
+            for r in rules.windowed[key]:
+                window_ns = int(rules.window_ns[r])
+                if rules.rule_types[r] == RULE_SUSTAINED:
+                    derived = new_values
+                    rule_id = rules.rule_ids[r]
+                    before = buffers.streaks.get(rule_id)
+                    holds = rules.breaches(np.full(new_values.shape[0], r), new_values)
+                    hit, after = sustained_breaches(new_ts, holds, window_ns, before)
+                    if after != before:
+                        streaks[rule_id] = (before, after)
+                        if after is None:
+                            del buffers.streaks[rule_id]
+                        else:
+                            buffers.streaks[rule_id] = after
+                else:
+                    if first == buffers.capacity and new_ts[0] - window_ns < old_ts[0]:
+                        _warn_truncated(rules, r, buffers.capacity)
+                    derived = window_statistic(rules.rule_types[r], ts, values, window_ns, first)
+                    hit = rules.breaches(np.full(derived.shape[0], r), derived)
+                hits = np.flatnonzero(hit)
+                if hits.size:
+                    found.append((r, derived[hits[0]], new_ts[hits[0]], hits.size))
+            updates.append((key, buffers.extend(key, new_ts, new_values), streaks))
+
+    if not found:
+        return BatchBreaches.empty()
+    rule_indices, values, timestamps_ns, occurrences = zip(*found)
+    return BatchBreaches(
+        np.array(rule_indices, np.int64), np.array(values, np.float64),
+        np.array(timestamps_ns, np.int64), np.array(occurrences, np.int64),
+    )
+
+
+def _warn_truncated(rules: CompiledAlarmRules, r: int, capacity: int):
+    metrics.inc("alarm_window_truncated", rule_type=rules.rule_types[r])
+    rule_id = rules.rule_ids[r]
+    if rule_id not in _truncation_warned:
+        _truncation_warned.add(rule_id)
+        logger.warning(
+            f"La ventana de la regla de alarma {rule_id} abarca más de {capacity} lecturas: "
+            f"se evalúa solo con las últimas {capacity} (ALARM_WINDOW_BUFFER_SAMPLES)."
+        )
+
+
+def _concat(a: BatchBreaches, b: BatchBreaches) -> BatchBreaches:
+    return BatchBreaches(
+        np.r_[a.rule_indices, b.rule_indices], np.r_[a.values, b.values],
+        np.r_[a.timestamps_ns, b.timestamps_ns], np.r_[a.occurrences, b.occurrences],
+    )
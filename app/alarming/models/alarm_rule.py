@@ -3,7 +3,7 @@
 Modelo de la base de datos para la entidad AlarmRule.
 """
 import uuid
-from sqlalchemy import Column, String, Float, Boolean, ForeignKey
+from sqlalchemy import Column, String, Float, Boolean, ForeignKey, TIMESTAMP
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
@@ -12,11 +12,21 @@ class AlarmRule(Base):
     __tablename__ = "alarm_rules"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Aislamiento por Tenant
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False, index=True)
     asset_id = Column(UUID(as_uuid=True), ForeignKey("assets.id"), nullable=False, index=True)
     metric_name = Column(String, nullable=False)
     condition = Column(String, nullable=False)  # e.g., '>', '<', '=='
     threshold = Column(Float, nullable=False)
     severity = Column(String, nullable=False) # e.g., 'critical', 'warning'
+    # Tipo de regla (ver app/alarming/windows.py) y ventana de las reglas que la usan
+    rule_type = Column(String, nullable=False, default="threshold", server_default="threshold")
+    window_seconds = Column(Float, nullable=True)
+    # Control de avalanchas: retardo de rearme (None = ALARM_REARM_SECONDS) y archivado temporal
+    rearm_seconds = Column(Float, nullable=True)
+    shelved_until = Column(TIMESTAMP(timezone=True), nullable=True)
     is_enabled = Column(Boolean, default=True)
+    # Campo para soft delete
+    is_active = Column(Boolean, default=True, nullable=False, server_default="true")
 
     asset = relationship("Asset", back_populates="alarm_rules")
@@ -2,11 +2,12 @@
 """
 Capa de Repositorio para el módulo de Alertas (Alarming).
 """
-from typing import List, Optional
+from typing import List, Optional, Set, Tuple
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import Session, contains_eager
 
 from app.alarming import models, schemas
 from app.telemetry.schemas import SensorReadingCreate
@@ -38,13 +39,15 @@ class AlarmingRepository:
             models.AlarmRule.is_active == True
         ).offset(skip).limit(limit).all()
 
-    def list_all_enabled_rules(self, tenant_id: uuid.UUID) -> List[models.AlarmRule]:
-        """Lista todas las reglas activas y habilitadas para el motor de alarmas."""
-        return self.db.query(models.AlarmRule).filter(
-            models.AlarmRule.tenant_id == tenant_id,
+    def list_all_enabled_rules(self, tenant_id: Optional[uuid.UUID] = None) -> List[models.AlarmRule]:
+        """Lista las reglas activas y habilitadas para el motor de alarmas (de todos los tenants si no se indica)."""
+        query = self.db.query(models.AlarmRule).filter(
             models.AlarmRule.is_active == True,
             models.AlarmRule.is_enabled == True
-        ).all()
+        )
+        if tenant_id is not None:
+            query = query.filter(models.AlarmRule.tenant_id == tenant_id)
+        return query.all()
 
     def update_rule(self, db_rule: models.AlarmRule, rule_in: schemas.AlarmRuleUpdate) -> models.AlarmRule:
         update_data = rule_in.model_dump(exclude_unset=True)
@@ -64,29 +67,50 @@ class AlarmingRepository:
         self.db.refresh(db_rule)
         return db_rule
 
+    def set_shelved_until(self, db_rule: models.AlarmRule, shelved_until: Optional[datetime]) -> models.AlarmRule:
+        db_rule.shelved_until = shelved_until
+        self.db.add(db_rule)
+        self.db.commit()
+        self.db.refresh(db_rule)
+        return db_rule
+
     # --- Métodos para Alarm ---
 
-    def create_alarm(self, rule_id: uuid.UUID, triggering_value: float, tenant_id: uuid.UUID) -> models.Alarm:
-        db_alarm = models.Alarm(rule_id=rule_id, triggering_value=triggering_value, tenant_id=tenant_id)
-        self.db.add(db_alarm)
-        self.db.commit()
-        self.db.refresh(db_alarm)
-        return db_alarm
+    def create_alarms(self, alarms: List[dict]) -> None:
+        """Inserta varias alarmas en una sola sentencia. No confirma la transacción."""
+        self.db.execute(insert(models.Alarm), alarms)
 
-    def get_active_alarms(self, tenant_id: uuid.UUID) -> List[models.Alarm]:
-        return self.db.query(models.Alarm).options(joinedload(models.Alarm.rule)).filter(
-            models.Alarm.tenant_id == tenant_id,
-            models.Alarm.is_acknowledged == False
-        ).all()
+    def get_rules_with_active_alarms(self, rule_ids: List[uuid.UUID]) -> Set[uuid.UUID]:
+        """De las reglas indicadas, las que tienen una alarma sin reconocer."""
+        rows = self.db.query(models.Alarm.alarm_rule_id).filter(
+            models.Alarm.alarm_rule_id.in_(rule_ids),
+            or_(models.Alarm.acknowledged == False, models.Alarm.acknowledged.is_(None))
+        ).distinct().all()
+        return {row.alarm_rule_id for row in rows}
+
+    def list_unacknowledged_alarms(self) -> List[Tuple[uuid.UUID, uuid.UUID, uuid.UUID, datetime]]:
+        """Alarmas sin reconocer de todos los tenants: (regla, alarma, activo, instante)."""
+        return [
+            tuple(row) for row in self.db.query(
+                models.Alarm.alarm_rule_id, models.Alarm.id, models.Alarm.asset_id, models.Alarm.triggered_at
+            ).filter(or_(models.Alarm.acknowledged == False, models.Alarm.acknowledged.is_(None))).all()
+        ]
 
-    def acknowledge_alarm(self, alarm_id: uuid.UUID, tenant_id: uuid.UUID) -> Optional[models.Alarm]:
-        db_alarm = self.db.query(models.Alarm).filter(
+    def get_alarm(self, alarm_id: uuid.UUID, tenant_id: uuid.UUID) -> Optional[models.Alarm]:
+        return self.db.query(models.Alarm).join(models.Alarm.rule).filter(
             models.Alarm.id == alarm_id,
-            models.Alarm.tenant_id == tenant_id
+            models.AlarmRule.tenant_id == tenant_id
         ).first()
-        if db_alarm:
-            db_alarm.acknowledged = True
-            db_alarm.acknowledged_at = datetime.now(timezone.utc)
-            self.db.commit()
-            self.db.refresh(db_alarm)
+
+    def get_active_alarms(self, tenant_id: uuid.UUID) -> List[models.Alarm]:
+        return self.db.query(models.Alarm).join(models.Alarm.rule).options(contains_eager(models.Alarm.rule)).filter(
+            models.AlarmRule.tenant_id == tenant_id,
+            or_(models.Alarm.acknowledged == False, models.Alarm.acknowledged.is_(None))
+        ).order_by(models.Alarm.triggered_at.desc()).all()
+
+    def acknowledge_alarm(self, db_alarm: models.Alarm) -> models.Alarm:
+        db_alarm.acknowledged = True
+        db_alarm.acknowledged_at = datetime.now(timezone.utc)
+        self.db.commit()
+        self.db.refresh(db_alarm)
         return db_alarm
@@ -0,0 +1,133 @@
+# /app/alarming/rule_index.py
+"""
+Índice en memoria de las reglas de alarma, compiladas por (activo, métrica).
+
+Las reglas habilitadas se cargan de una vez (`list_all_enabled_rules`) en arrays planos de
+condiciones y umbrales, con el tramo de reglas de cada par (activo, métrica) en un dict.
+Evaluar una lectura es una búsqueda en el dict y unas comparaciones vectoriales, sin
+consultas a la BD. El índice se recarga entero cuando se invalida (evento `alarming.rules` al
+crear, modificar o borrar una regla) o cada `reload_interval` segundos.
+
+Las reglas de ventana (`sustained`, `rate_of_change`, `rolling_mean`, `rolling_std`) se
+evalúan sobre las últimas lecturas de su par guardadas en `alarm_window_buffers`.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.alarming import models
+from app.alarming.repository import AlarmingRepository
+from app.alarming.windows import RULE_THRESHOLD, RULE_TYPES, WINDOWED_RULE_TYPES, RingBufferStore
+from app.core.config import settings
+
+logger = logging.getLogger("app.alarming.rule_index")
+
+# Canal del Event Broker en el que se anuncian los cambios de reglas de alarma.
+ALARM_RULES_EVENTS_CHANNEL = "alarming.rules"
+
+CONDITION_GT = 0
+CONDITION_LT = 1
+CONDITION_EQ = 2
+CONDITIONS = {">": CONDITION_GT, "<": CONDITION_LT, "==": CONDITION_EQ, "=": CONDITION_EQ}
+
+
+class CompiledAlarmRules:
+    """
+    Instantánea de las reglas de alarma preparada para evaluarse con arrays.
+
+    Las reglas se guardan en arrays planos ordenados por (activo, métrica); `spans` da para
+    cada par el tramo `[start, stop)` de sus reglas. Las reglas de ventana se evalúan aparte:
+    `instant` las excluye de la evaluación lectura a lectura y `windowed` da sus posiciones por par.
+    """
+
+    def __init__(self, rules: List[models.AlarmRule]):
+        rules = sorted(rules, key=lambda rule: (str(rule.asset_id), rule.metric_name.lower()))
+        self.rule_ids: List[uuid.UUID] = [rule.id for rule in rules]
+        self.tenant_ids: List[uuid.UUID] = [rule.tenant_id for rule in rules]
+        self.asset_ids: List[uuid.UUID] = [rule.asset_id for rule in rules]
+        self.severities: List[str] = [rule.severity for rule in rules]
+        self.conditions = np.array([CONDITIONS[rule.condition] for rule in rules], dtype=np.int8)
+        self.thresholds = np.array([rule.threshold for rule in rules], dtype=np.float64)
+        self.rule_types: List[str] = [rule.rule_type for rule in rules]
+        self.instant = np.array([rule.rule_type == RULE_THRESHOLD for rule in rules], dtype=bool)
+        self.window_ns = np.array([int((rule.window_seconds or 0) * 1e9) for rule in rules], dtype=np.int64)
+        self.rearm_seconds = [
+            settings.ALARM_REARM_SECONDS if rule.rearm_seconds is None else rule.rearm_seconds for rule in rules
+        ]
+        self.shelved_until = np.array(
+            [rule.shelved_until.timestamp() if rule.shelved_until else 0.0 for rule in rules], dtype=np.float64
+        )
+        self.spans: Dict[Tuple[uuid.UUID, str], Tuple[int, int]] = {}
+        self.windowed: Dict[Tuple[uuid.UUID, str], List[int]] = {}
+        for i, rule in enumerate(rules):
+            key = (rule.asset_id, rule.metric_name.lower())
+            start, _ = self.spans.get(key, (i, i))
+            self.spans[key] = (start, i + 1)
+            if rule.rule_type in WINDOWED_RULE_TYPES:
+                self.windowed.setdefault(key, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.rule_ids)
+
+    def breaches(self, rule_indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Para cada par (regla, valor), si el valor cumple la condición de la regla."""
+        conditions = self.conditions[rule_indices]
+        thresholds = self.thresholds[rule_indices]
+        return (
+            ((conditions == CONDITION_GT) & (values > thresholds))
+            | ((conditions == CONDITION_LT) & (values < thresholds))
+            | ((conditions == CONDITION_EQ) & (values == thresholds))
+        )
+
+
+class AlarmRuleIndex:
+    """Reglas de alarma habilitadas de todos los tenants, indexadas por (activo, métrica)."""
+
+    def __init__(self, reload_interval: float = 60.0):
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._rules: Optional[CompiledAlarmRules] = None
+
+    def invalidate(self):
+        self._rules = None
+
+    def on_rules_changed(self, data: dict):
+        """Manejador del Event Broker: el índice se recarga en la siguiente evaluación."""
+        self.invalidate()
+
+    def snapshot(self, db: Session) -> CompiledAlarmRules:
+        """Reglas vigentes (se recargan si el índice se invalidó o caducó)."""
+        rules = self._rules
+        if rules is not None and time.monotonic() - self._loaded_at < self.reload_interval:
+            return rules
+        with self._lock:
+            if self._rules is not None and time.monotonic() - self._loaded_at < self.reload_interval:
+                return self._rules
+            valid = []
+            for rule in AlarmingRepository(db).list_all_enabled_rules():
+                if rule.condition not in CONDITIONS:
+                    logger.error(f"Regla de alarma {rule.id} con condición desconocida '{rule.condition}', se ignora.")
+                    continue
+                if rule.rule_type not in RULE_TYPES or (
+                    rule.rule_type in WINDOWED_RULE_TYPES and not (rule.window_seconds or 0) > 0
+                ):
+                    logger.error(f"Regla de alarma {rule.id} de tipo '{rule.rule_type}' sin ventana válida, se ignora.")
+                    continue
+                valid.append(rule)
+            # Se sustituye la instantánea entera: los lectores sin lock ven la vieja o la nueva.
+            rules = self._rules = CompiledAlarmRules(valid)
+            self._loaded_at = time.monotonic()
+        logger.info(f"Índice de reglas de alarma cargado: {len(valid)} reglas.")
+        return rules
+
+
+# Índice y buffers de ventana del proceso: los comparten todas las instancias de `AlarmingService`.
+alarm_rule_index = AlarmRuleIndex(reload_interval=settings.ALARM_RULES_RELOAD_SECONDS)
+alarm_window_buffers = RingBufferStore(capacity=settings.ALARM_WINDOW_BUFFER_SAMPLES)
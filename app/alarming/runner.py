@@ -0,0 +1,157 @@
+# /app/alarming/runner.py
+"""
+Evaluador de alarmas dedicado: consume los lotes que publica la ingesta (ver `stream.py`).
+
+    python -m app.alarming.runner --workers 2
+    python -m app.alarming.runner --workers 2 --partitions 0-3   # otra réplica: --partitions 4-7
+
+Requiere `ALARM_STREAM_ENABLED=true` en los procesos de ingesta (API y runner del Core Engine).
+Lanza N procesos y reparte entre ellos las particiones indicadas (por defecto todas). Cada
+proceso evalúa las suyas con `AlarmingService.evaluate_batch` y confirma las entradas cuando
+las alarmas están en la BD. Las particiones se protegen con leases: dos réplicas con las mismas
+particiones no las consumen a la vez, la segunda queda de reserva y las toma si la primera cae.
+
+El proceso padre vigila a los hijos y relanza los que terminan de forma inesperada.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import signal
+import socket
+import threading
+import time
+from typing import List
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.alarming.runner")
+
+
+def run_worker(worker_id: str, partitions: List[int]):
+    """Evalúa las particiones asignadas hasta recibir SIGTERM o SIGINT."""
+    from app.alarming.active_alarms import ACTIVE_ALARMS_EVENTS_CHANNEL, active_alarm_store
+    from app.alarming.rule_index import ALARM_RULES_EVENTS_CHANNEL, alarm_rule_index
+    from app.alarming.service import AlarmingService
+    from app.alarming.stream import AlarmStreamConsumer
+    from app.assets.repository import AssetRepository
+    from app.auditing.service import AuditService
+    from app.core.database import session_scope
+    from app.core.event_broker import EventBroker
+    from app.core.metrics import metrics
+    from app.core.redis import get_redis_binary_client, get_redis_client
+    from app.notifications.service import NotificationService
+    from app.telemetry.columnar import ColumnarReadings
+
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: stop.set())
+
+    event_broker = EventBroker(get_redis_client())
+    event_broker.subscribe(ALARM_RULES_EVENTS_CHANNEL, alarm_rule_index.on_rules_changed)
+    event_broker.subscribe(ACTIVE_ALARMS_EVENTS_CHANNEL, active_alarm_store.on_alarms_changed)
+    event_broker.start_listening()
+
+    consumer = AlarmStreamConsumer(
+        get_redis_binary_client(),
+        worker_id,
+        partitions,
+        lease_ttl=settings.ALARM_EVALUATOR_LEASE_TTL_SECONDS,
+        read_count=settings.ALARM_EVALUATOR_READ_COUNT,
+        block_ms=settings.ALARM_EVALUATOR_BLOCK_MS,
+    )
+    refresh_interval = settings.ALARM_EVALUATOR_LEASE_TTL_SECONDS / 3
+    next_refresh = 0.0
+    backoff = 1.0
+    logger.info(f"Evaluador de alarmas {worker_id} iniciado (particiones candidatas: {partitions}).")
+
+    while not stop.is_set():
+        try:
+            if time.monotonic() >= next_refresh:
+                consumer.refresh()
+                consumer.publish_status()
+                next_refresh = time.monotonic() + refresh_interval
+            entries = consumer.read()
+            if not entries:
+                continue
+            batch = ColumnarReadings.concat([batch for _, _, batch in entries])
+            started = time.perf_counter()
+            with session_scope() as db:
+                audit_service = AuditService(db)
+                AlarmingService(
+                    db, NotificationService(db), AssetRepository(db), audit_service, event_broker=event_broker
+                ).evaluate_batch(batch)
+            consumer.ack(entries)
+            metrics.inc("alarm_stream_evaluated_rows", len(batch))
+            metrics.observe("alarm_stream_batch_seconds", time.perf_counter() - started)
+            backoff = 1.0
+        except Exception as e:
+            # Las entradas sin confirmar se vuelven a leer en la siguiente vuelta.
+            logger.error(f"[{worker_id}] Error evaluando alarmas, se reintenta en {backoff:.0f} s: {e}", exc_info=True)
+            consumer.recover()
+            stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    logger.info(f"Deteniendo el evaluador de alarmas {worker_id}...")
+    try:
+        consumer.leave()
+    except Exception as e:
+        logger.warning(f"[{worker_id}] No se pudieron liberar las particiones: {e}")
+
+
+def _worker_main(worker_id: str, partitions: List[int]):
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [{worker_id}] %(name)s %(levelname)s %(message)s")
+    run_worker(worker_id, partitions)
+
+
+def main():
+    from app.alarming.stream import parse_partitions
+
+    parser = argparse.ArgumentParser(description="Evaluador de alarmas dedicado.")
+    parser.add_argument("--workers", type=int, default=settings.ALARM_EVALUATOR_WORKERS)
+    parser.add_argument("--partitions", default=None, help="Particiones a consumir, p. ej. '0-3,6' (por defecto todas).")
+    parser.add_argument("--worker-prefix", default=socket.gethostname(), help="Prefijo del identificador de cada proceso.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    partitions = parse_partitions(args.partitions, settings.ALARM_STREAM_PARTITIONS)
+    workers = max(1, min(args.workers, len(partitions)))
+    # `spawn`: cada hijo crea desde cero sus conexiones (Redis, pool de BD).
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def _spawn(index: int):
+        worker_id = f"{args.worker_prefix}:alarms:{index}"
+        process = context.Process(target=_worker_main, args=(worker_id, partitions[index::workers]), name=worker_id)
+        process.start()
+        return process
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    processes = {index: _spawn(index) for index in range(workers)}
+    logger.info(f"Evaluador de alarmas iniciado con {workers} procesos para las particiones {partitions}.")
+
+    while not stopping:
+        time.sleep(1)
+        for index, process in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                logger.error(f"El proceso {process.name} terminó (código {process.exitcode}); se relanza.")
+                processes[index] = _spawn(index)
+
+    logger.info("Deteniendo los procesos del evaluador de alarmas...")
+    for process in processes.values():
+        if process.is_alive():
+            process.terminate()  # SIGTERM: cada proceso libera sus particiones
+    for process in processes.values():
+        process.join(timeout=30)
+        if process.is_alive():
+            process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,9 @@ class AlarmRuleBase(BaseModel):
     condition: str
     threshold: float
     severity: str = "warning"
+    rule_type: str = "threshold"  # threshold, sustained, rate_of_change, rolling_mean, rolling_std
+    window_seconds: Optional[float] = None  # Obligatorio salvo en las reglas 'threshold'
+    rearm_seconds: Optional[float] = None  # Por defecto ALARM_REARM_SECONDS
     is_enabled: bool = True
 
 class AlarmRuleCreate(AlarmRuleBase):
@@ -22,10 +25,17 @@ class AlarmRuleUpdate(BaseModel):
     condition: Optional[str] = None
     threshold: Optional[float] = None
     severity: Optional[str] = None
+    rule_type: Optional[str] = None
+    window_seconds: Optional[float] = None
+    rearm_seconds: Optional[float] = None
     is_enabled: Optional[bool] = None
 
+class AlarmRuleShelve(BaseModel):
+    duration_minutes: float  # Hasta ALARM_MAX_SHELVE_HOURS
+
 class AlarmRule(AlarmRuleBase):
     id: uuid.UUID
+    shelved_until: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -33,17 +43,30 @@ class AlarmRule(AlarmRuleBase):
 # --- Esquemas para Alarm ---
 
 class AlarmBase(BaseModel):
-    rule_id: uuid.UUID
-    triggering_value: float
-    is_acknowledged: bool
+    alarm_rule_id: uuid.UUID
+    asset_id: uuid.UUID
+    severity: Optional[str] = None
+    triggered_value: Optional[float] = None
 
 class AlarmCreate(AlarmBase):
     pass
 
 class AlarmRead(AlarmBase): # Renombrado de Alarm a AlarmRead
     id: uuid.UUID
-    created_at: datetime
+    triggered_at: datetime
+    acknowledged: Optional[bool] = False
+    acknowledged_at: Optional[datetime] = None
+    suppressed_count: int = 0  # Ocurrencias de la regla descartadas desde esta alarma
     rule: AlarmRule # Anidar la regla para tener contexto
 
     class Config:
         from_attributes = True
+
+# --- Evaluador de alarmas dedicado ---
+
+class AlarmEvaluatorPartitionStatus(BaseModel):
+    partition: int
+    worker_id: str
+    lag_seconds: float  # Antigüedad de la última entrada procesada (0 si está al día)
+    backlog: Optional[int] = None  # Entradas del stream aún no entregadas (Redis >= 7)
+    updated_at: datetime
@@ -2,21 +2,54 @@
 """
 Capa de Servicio para el módulo de Alertas (Alarming).
 """
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional, TYPE_CHECKING
 import uuid
+import numpy as np
+import redis
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from app.alarming import models, schemas
+from app.alarming.active_alarms import (
+    ACTIVE_ALARMS_EVENTS_CHANNEL, RAISED, SUPPRESSED_ACTIVE, SUPPRESSED_SHELVED, ActiveAlarmStore, active_alarm_store,
+)
+from app.alarming.evaluator import find_breaches
 from app.alarming.repository import AlarmingRepository
-from app.core.exceptions import NotFoundException
+from app.alarming.rule_index import (
+    ALARM_RULES_EVENTS_CHANNEL, CONDITIONS, AlarmRuleIndex, alarm_rule_index, alarm_window_buffers,
+)
+from app.alarming.windows import RULE_TYPES, WINDOWED_RULE_TYPES, RingBufferStore
+from app.core.config import settings
+from app.core.event_broker import EventBroker
+from app.core.metrics import metrics
+from app.core.exceptions import ConflictException, NotFoundException, ValidationException
 from app.assets.repository import AssetRepository
 from app.notifications.service import NotificationService # Importar NotificationService
 from app.auditing.service import AuditService
 from app.identity.models import User
+from app.telemetry.columnar import ColumnarReadings
+from app.telemetry.schemas import SensorReadingCreate
 
 if TYPE_CHECKING:
     from app.maintenance.service import MaintenanceService
 
+logger = logging.getLogger("app.alarming.service")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Reglas concedidas en Redis y lecturas añadidas a los ring buffers por la transacción en curso
+# (se deshacen si hay rollback).
+_CLAIMED_KEY = "alarming_claimed_rules"
+_BUFFER_UPDATES_KEY = "alarming_buffer_updates"
+
+
+def _ns_to_datetime(ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=ns // 1000)
+
 class AlarmingService:
     """Servicio de negocio para la gestión de alarmas y sus reglas."""
 
@@ -26,7 +59,11 @@ class AlarmingService:
         notification_service: NotificationService, # Recibir NotificationService
         asset_repo: AssetRepository, 
         audit_service: AuditService,
-        maintenance_service: Optional['MaintenanceService'] = None
+        maintenance_service: Optional['MaintenanceService'] = None,
+        event_broker: Optional[EventBroker] = None,
+        rule_index: AlarmRuleIndex = alarm_rule_index,
+        window_buffers: RingBufferStore = alarm_window_buffers,
+        active_alarms: ActiveAlarmStore = active_alarm_store
     ):
         self.db = db
         self.notification_service = notification_service
@@ -34,65 +71,266 @@ class AlarmingService:
         self.asset_repo = asset_repo
         self.audit_service = audit_service
         self.maintenance_service = maintenance_service
+        self.event_broker = event_broker
+        self.rule_index = rule_index
+        self.window_buffers = window_buffers
+        self.active_alarms = active_alarms
+
+    # --- Reglas de alarma ---
+
+    def _validate_rule(
+        self, asset_id: uuid.UUID, condition: Optional[str], tenant_id: uuid.UUID,
+        rule_type: str = "threshold", window_seconds: Optional[float] = None, rearm_seconds: Optional[float] = None
+    ):
+        if condition is not None and condition not in CONDITIONS:
+            raise ValidationException(f"Condición '{condition}' no soportada. Use una de: {', '.join(CONDITIONS)}.")
+        if rule_type not in RULE_TYPES:
+            raise ValidationException(f"Tipo de regla '{rule_type}' no soportado. Use uno de: {', '.join(RULE_TYPES)}.")
+        if rule_type in WINDOWED_RULE_TYPES and not (window_seconds or 0) > 0:
+            raise ValidationException(f"Las reglas '{rule_type}' necesitan un window_seconds positivo.")
+        if rearm_seconds is not None and rearm_seconds < 0:
+            raise ValidationException("rearm_seconds no puede ser negativo.")
+        if asset_id is not None and not self.asset_repo.get_asset(asset_id, tenant_id):
+            raise NotFoundException("Activo no encontrado.")
+
+    def create_alarm_rule(self, rule_in: schemas.AlarmRuleCreate, tenant_id: uuid.UUID, user: User) -> models.AlarmRule:
+        self._validate_rule(
+            rule_in.asset_id, rule_in.condition, tenant_id, rule_in.rule_type, rule_in.window_seconds, rule_in.rearm_seconds
+        )
+        new_rule = self.alarming_repo.create_alarm_rule(rule_in, tenant_id)
+        self.audit_service.log_operation(user, "CREATE_ALARM_RULE", new_rule)
+        self._publish_rules_change(new_rule, "created")
+        return new_rule
+
+    def get_rule(self, rule_id: uuid.UUID, tenant_id: uuid.UUID) -> models.AlarmRule:
+        db_rule = self.alarming_repo.get_rule(rule_id, tenant_id)
+        if not db_rule or not db_rule.is_active:
+            raise NotFoundException("Regla de alarma no encontrada.")
+        return db_rule
+
+    def list_rules(self, tenant_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[models.AlarmRule]:
+        return self.alarming_repo.list_rules(tenant_id, skip, limit)
+
+    def update_rule(self, rule_id: uuid.UUID, rule_in: schemas.AlarmRuleUpdate, tenant_id: uuid.UUID, user: User) -> models.AlarmRule:
+        db_rule = self.get_rule(rule_id, tenant_id)
+        changes = rule_in.model_dump(exclude_unset=True)
+        self._validate_rule(
+            None, rule_in.condition, tenant_id,
+            changes.get("rule_type", db_rule.rule_type), changes.get("window_seconds", db_rule.window_seconds),
+            rule_in.rearm_seconds,
+        )
+        updated_rule = self.alarming_repo.update_rule(db_rule, rule_in)
+        self.audit_service.log_operation(user, "UPDATE_ALARM_RULE", updated_rule, details=changes)
+        self._publish_rules_change(updated_rule, "updated")
+        return updated_rule
+
+    def delete_rule(self, rule_id: uuid.UUID, tenant_id: uuid.UUID, user: User) -> models.AlarmRule:
+        db_rule = self.get_rule(rule_id, tenant_id)
+        deleted_rule = self.alarming_repo.delete_rule(db_rule)
+        self.audit_service.log_operation(user, "DELETE_ALARM_RULE", deleted_rule)
+        self._publish_rules_change(deleted_rule, "deleted")
+        return deleted_rule
 
-    def create_rule(self, rule_in: schemas.AlarmRuleCreate) -> models.AlarmRule:
-        return self.alarming_repo.create_rule(rule_in)
+    def _publish_rules_change(self, rule: models.AlarmRule, action: str):
+        """Invalida el índice de reglas de este proceso y avisa al resto."""
+        self.rule_index.invalidate()
+        if self.event_broker is None:
+            return
+        try:
+            self.event_broker.publish(ALARM_RULES_EVENTS_CHANNEL, {"alarm_rule_id": str(rule.id), "action": action})
+        except Exception as e:
+            # Los demás procesos recargan igualmente el índice cada ALARM_RULES_RELOAD_SECONDS.
+            logger.warning(f"No se pudo publicar el cambio de la regla de alarma {rule.id}: {e}")
 
-    def get_rules_by_asset(self, asset_id: uuid.UUID) -> List[models.AlarmRule]:
-        return self.alarming_repo.get_rules_by_asset(asset_id)
+    def shelve_rule(
+        self, rule_id: uuid.UUID, shelve_in: schemas.AlarmRuleShelve, tenant_id: uuid.UUID, user: User
+    ) -> models.AlarmRule:
+        """Archiva la regla: sus incumplimientos solo se cuentan hasta que expire el plazo."""
+        if not 0 < shelve_in.duration_minutes <= settings.ALARM_MAX_SHELVE_HOURS * 60:
+            raise ValidationException(
+                f"La duración del archivado debe estar entre 0 y {settings.ALARM_MAX_SHELVE_HOURS * 60:g} minutos."
+            )
+        db_rule = self.get_rule(rule_id, tenant_id)
+        until = datetime.now(timezone.utc) + timedelta(minutes=shelve_in.duration_minutes)
+        shelved_rule = self.alarming_repo.set_shelved_until(db_rule, until)
+        self.audit_service.log_operation(user, "SHELVE_ALARM_RULE", shelved_rule, details={"shelved_until": until.isoformat()})
+        self._publish_rules_change(shelved_rule, "shelved")
+        return shelved_rule
+
+    def unshelve_rule(self, rule_id: uuid.UUID, tenant_id: uuid.UUID, user: User) -> models.AlarmRule:
+        db_rule = self.get_rule(rule_id, tenant_id)
+        unshelved_rule = self.alarming_repo.set_shelved_until(db_rule, None)
+        self.audit_service.log_operation(user, "UNSHELVE_ALARM_RULE", unshelved_rule)
+        self._publish_rules_change(unshelved_rule, "unshelved")
+        return unshelved_rule
+
+    # --- Alarmas ---
 
     def get_active_alarms(self, tenant_id: uuid.UUID) -> List[models.Alarm]:
-        return self.alarming_repo.get_active_alarms(tenant_id)
+        alarms = self.alarming_repo.get_active_alarms(tenant_id)
+        try:
+            counts = self.active_alarms.suppressed_counts([alarm.alarm_rule_id for alarm in alarms])
+        except redis.RedisError as e:
+            logger.warning(f"No se pudieron leer las ocurrencias suprimidas de Redis: {e}")
+            counts = {}
+        for alarm in alarms:
+            alarm.suppressed_count = counts.get(alarm.alarm_rule_id, 0)
+        return alarms
 
-    def acknowledge_alarm(self, alarm_id: uuid.UUID, user: User) -> models.Alarm:
-        alarm = self.alarming_repo.get_alarm(alarm_id)
+    def acknowledge_alarm(self, alarm_id: uuid.UUID, tenant_id: uuid.UUID, user: User) -> models.Alarm:
+        alarm = self.alarming_repo.get_alarm(alarm_id, tenant_id)
         if not alarm:
-            raise NotFoundException("Alarm not found")
-        
-        updated_alarm = self.alarming_repo.acknowledge_alarm(alarm, user.id)
-        
-        self.audit_service.create_log(
-            user_id=user.id,
-            tenant_id=user.tenant_id,
-            action="ALARM_ACKNOWLEDGED",
-            details=f"Alarma {alarm_id} reconocida por {user.name}"
-        )
-        
+            raise NotFoundException("Alarma no encontrada.")
+        if alarm.acknowledged:
+            raise ConflictException("La alarma ya está reconocida.")
+        updated_alarm = self.alarming_repo.acknowledge_alarm(alarm)
+        self.audit_service.log_operation(user, "ACKNOWLEDGE_ALARM", updated_alarm)
+        self._release_active_alarm(updated_alarm)
         return updated_alarm
 
+    def _release_active_alarm(self, alarm: models.Alarm):
+        """La regla de la alarma reconocida vuelve a poder disparar (tras su retardo de rearme)."""
+        try:
+            self.active_alarms.release([alarm.alarm_rule_id])
+        except redis.RedisError as e:
+            # Sin Redis la regla sigue bloqueada hasta que se precargue de nuevo desde la BD.
+            logger.warning(f"No se pudo liberar la alarma {alarm.id} en Redis: {e}")
+            return
+        if self.event_broker is None:
+            return
+        try:
+            self.event_broker.publish(
+                ACTIVE_ALARMS_EVENTS_CHANNEL, {"alarm_id": str(alarm.id), "alarm_rule_id": str(alarm.alarm_rule_id)}
+            )
+        except Exception as e:
+            # Los demás procesos se resincronizan con Redis cada ALARM_ACTIVE_SYNC_SECONDS.
+            logger.warning(f"No se pudo publicar el reconocimiento de la alarma {alarm.id}: {e}")
+
     def check_and_trigger_alarms(self, asset_id: uuid.UUID, metric_name: str, value: float):
+        """Evalúa una lectura suelta, con el instante actual, y confirma las alarmas creadas."""
+        reading = SensorReadingCreate(
+            asset_id=asset_id, metric_name=metric_name, value=value, timestamp=datetime.now(timezone.utc)
+        )
+        if self.evaluate_readings([reading]):
+            self.db.commit()
+
+    def evaluate_batch(self, batch: ColumnarReadings) -> int:
         """
-        Verifica si un nuevo valor de telemetría dispara alguna alarma.
-        Este método es llamado por TelemetryService.
+        Evalúa un lote de ingesta completo contra todas las reglas (ver `evaluator.py`).
+
+        Cada regla incumplida genera como mucho una alarma por lote, y solo si Redis la concede
+        (sin alarma activa, fuera del retardo de rearme y dentro del límite del activo, ver
+        `active_alarms.py`) y la regla no está archivada. El resto de ocurrencias solo se cuenta.
+        Las alarmas nuevas se insertan en una sola sentencia, sin commit: se confirman con el
+        resto del lote. Devuelve el número de alarmas creadas.
         """
-        rules = self.alarming_repo.get_rules_for_asset_and_metric(asset_id, metric_name)
-        for rule in rules:
-            if self._evaluate_condition(value, rule.condition, rule.threshold):
-                # Verificar si ya existe una alarma activa para esta regla
-                if not self.alarming_repo.has_active_alarm(rule.id):
-                    self._trigger_alarm(rule, value)
-
-    def _evaluate_condition(self, value: float, condition: str, threshold: float) -> bool:
-        if condition == ">": return value > threshold
-        if condition == "<": return value < threshold
-        if condition == "==": return value == threshold
-        return False
-
-    def _trigger_alarm(self, rule: models.AlarmRule, value: float):
+        rules = self.rule_index.snapshot(self.db)
+        buffer_updates = []
+        breaches = find_breaches(rules, batch, self.window_buffers, buffer_updates)
+        if buffer_updates:
+            self._track_transaction()[_BUFFER_UPDATES_KEY].extend(buffer_updates)
+        if not len(breaches):
+            return 0
+        now = time.time()
+        shelved = rules.shelved_until[breaches.rule_indices] > now
+        try:
+            new_alarms = self._claim_alarms(rules, breaches, shelved, now)
+        except redis.RedisError as e:
+            logger.warning(f"Redis no disponible para las alarmas activas, se consulta la BD: {e}")
+            new_alarms = self._alarms_without_store(rules, breaches, shelved)
+        if new_alarms:
+            self.alarming_repo.create_alarms(new_alarms)
+            metrics.inc("alarms_triggered", len(new_alarms))
+        return len(new_alarms)
+
+    def evaluate_readings(self, readings: List[SensorReadingCreate]) -> int:
+        """Evalúa una lista de lecturas (ver `evaluate_batch`)."""
+        return self.evaluate_batch(ColumnarReadings.from_readings(readings))
+
+    def _claim_alarms(self, rules, breaches, shelved: np.ndarray, now: float) -> List[dict]:
+        store = self.active_alarms
+        if store.reconcile_due:
+            removed = store.reconcile(self.alarming_repo.list_unacknowledged_alarms())
+            if removed:
+                metrics.inc("alarm_active_orphans_removed", removed)
+        active = store.known_active()
+        candidates, suppressed, reasons = [], {}, Counter()
+        for i, value, ns, occurrences, is_shelved in zip(
+            breaches.rule_indices.tolist(), breaches.values.tolist(), breaches.timestamps_ns.tolist(),
+            breaches.occurrences.tolist(), shelved.tolist(),
+        ):
+            rule_id = rules.rule_ids[i]
+            if is_shelved or rule_id in active:
+                suppressed[rule_id] = occurrences
+                reasons[SUPPRESSED_SHELVED if is_shelved else SUPPRESSED_ACTIVE] += occurrences
+                continue
+            alarm = self._new_alarm(rules, i, value, ns)
+            candidates.append((rule_id, rules.asset_ids[i], rules.rearm_seconds[i], alarm, occurrences))
+
+        new_alarms = []
+        for (_, _, _, alarm, occurrences), outcome in zip(candidates, store.claim(candidates, suppressed, now)):
+            if outcome == RAISED:
+                new_alarms.append(alarm)
+                # Las demás lecturas del lote que incumplen la regla ya están cubiertas por esta alarma.
+                reasons[SUPPRESSED_ACTIVE] += occurrences - 1
+            else:
+                reasons[outcome] += occurrences
+        for reason, count in reasons.items():
+            if count:
+                metrics.inc("alarms_suppressed", count, reason=reason)
+        if new_alarms:
+            self._track_transaction()[_CLAIMED_KEY].extend(alarm["alarm_rule_id"] for alarm in new_alarms)
+        return new_alarms
+
+    def _alarms_without_store(self, rules, breaches, shelved: np.ndarray) -> List[dict]:
+        """Sin Redis: solo se descartan las reglas archivadas o con alarma sin reconocer en la BD."""
+        indices = breaches.rule_indices[~shelved].tolist()
+        active = self.alarming_repo.get_rules_with_active_alarms([rules.rule_ids[i] for i in indices])
+        return [
+            self._new_alarm(rules, i, value, ns)
+            for i, value, ns in zip(indices, breaches.values[~shelved].tolist(), breaches.timestamps_ns[~shelved].tolist())
+            if rules.rule_ids[i] not in active
+        ]
+
+    @staticmethod
+    def _new_alarm(rules, i: int, value: float, ns: int) -> dict:
+        return {
+            "id": uuid.uuid4(),
+            "alarm_rule_id": rules.rule_ids[i],
+            "asset_id": rules.asset_ids[i],
+            "severity": rules.severities[i],
+            "triggered_value": value,
+            "triggered_at": _ns_to_datetime(ns),
+        }
+
+    def _track_transaction(self) -> dict:
         """
-        (Método privado) Crea una alarma y envía una notificación.
+        Si el lote no llega a confirmarse, las reglas concedidas se liberan en Redis y las
+        lecturas añadidas a los ring buffers se retiran (así su reintento vuelve a evaluarlas).
         """
-        alarm = self.alarming_repo.create_alarm(rule.id, value)
-        
-        # --- Enviar Notificación Directa ---
-        # Usamos NotificationService en lugar de EventBroker por ahora
-        # TODO: En el futuro, esto podría volver a ser un evento si implementamos EDA completo
-        
-        # Nota: Aquí necesitaríamos saber a quién notificar. 
-        # Por simplicidad, asumiremos que notificamos a todos los usuarios del tenant con rol OPERATOR
-        # Pero como NotificationService.create_platform_notification_for_role es para plataforma,
-        # necesitaríamos una función similar para tenants.
-        # Por ahora, dejaremos este paso pendiente de implementación detallada en NotificationService
-        # o simplemente no notificamos hasta tener esa lógica.
-        
-        pass
+        if _CLAIMED_KEY not in self.db.info:
+            self.db.info[_CLAIMED_KEY] = []
+            self.db.info[_BUFFER_UPDATES_KEY] = []
+            event.listen(self.db, "after_commit", self._on_commit)
+            event.listen(self.db, "after_rollback", self._on_rollback)
+        return self.db.info
+
+    def _on_commit(self, session: Session):
+        session.info.get(_CLAIMED_KEY, []).clear()
+        session.info.get(_BUFFER_UPDATES_KEY, []).clear()
+
+    def _on_rollback(self, session: Session):
+        updates = session.info.get(_BUFFER_UPDATES_KEY)
+        if updates:
+            with self.window_buffers.lock:
+                for key, undo, streaks in reversed(updates):
+                    self.window_buffers.revert(key, undo, streaks)
+            updates.clear()
+        rule_ids = session.info.get(_CLAIMED_KEY)
+        if not rule_ids:
+            return
+        try:
+            self.active_alarms.release(list(rule_ids), rearm=False)
+        except redis.RedisError as e:
+            logger.warning(f"No se pudieron liberar {len(rule_ids)} alarmas tras el rollback: {e}")
+        rule_ids.clear()
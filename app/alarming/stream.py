@@ -0,0 +1,291 @@
+# /app/alarming/stream.py
+"""
+Lotes de lecturas hacia el evaluador de alarmas dedicado (`app/alarming/runner.py`).
+
+Con `ALARM_STREAM_ENABLED`, la ingesta no evalúa alarmas: tras confirmar cada lote en la BD lo
+publica en Redis Streams y los procesos evaluadores lo consumen, así una regla lenta no añade
+latencia a la ingesta y cada parte escala por su cuenta.
+
+- Particiones: stream `alarming:readings:<p>` con `p = crc32(asset_id) % ALARM_STREAM_PARTITIONS`.
+  Todas las lecturas de un activo van a la misma partición y cada partición la consume un solo
+  proceso a la vez (lease en Redis, como los conectores en `core_engine/sharding.py`): se
+  conservan el orden por activo y los ring buffers de las reglas de ventana.
+- Entradas: `{"payload": <MessagePack columnar>}` (ver `columnar.encode_msgpack_payload`), con
+  `MAXLEN ~ ALARM_STREAM_MAXLEN` por partición.
+- Grupo de consumidores `alarm-evaluator`: cada entrada se confirma (XACK) cuando sus alarmas
+  están en la BD. Las entradas sin confirmar de un proceso caído las reclama (XAUTOCLAIM) el
+  siguiente dueño de la partición.
+- Retraso: cada proceso publica, por partición, la antigüedad de la última entrada procesada y
+  las entradas pendientes de entregar (`alarming:evaluator_status:<p>`, ver `read_evaluator_statuses`).
+"""
+
+import json
+import logging
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+import redis
+
+from app.core.metrics import metrics
+from app.core_engine.sharding import _ACQUIRE_SCRIPT, _RELEASE_SCRIPT
+from app.telemetry.columnar import (
+    ASSET_CODE_DTYPE, METRIC_CODE_DTYPE, ColumnarPayloadError, ColumnarReadings, decode_msgpack_payload,
+    encode_msgpack_payload,
+)
+
+logger = logging.getLogger("app.alarming.stream")
+
+STREAM_KEY_PREFIX = "alarming:readings:"
+LEASE_KEY_PREFIX = "alarming:partition_lease:"
+STATUS_KEY_PREFIX = "alarming:evaluator_status:"
+CONSUMER_GROUP = "alarm-evaluator"
+
+# (partición, id de la entrada, lote)
+StreamEntry = Tuple[int, bytes, ColumnarReadings]
+
+
+def partition_of(asset_id: UUID, partitions: int) -> int:
+    """Partición de un activo (estable entre procesos, a diferencia de `hash()`)."""
+    return zlib.crc32(asset_id.bytes) % partitions
+
+
+def stream_key(partition: int) -> str:
+    return f"{STREAM_KEY_PREFIX}{partition}"
+
+
+def _compact(batch: ColumnarReadings) -> ColumnarReadings:
+    """Sub-lote con diccionarios reducidos a los activos y métricas que usa."""
+    assets, asset_codes = np.unique(batch.asset_codes, return_inverse=True)
+    metric_names, metric_codes = np.unique(batch.metric_codes, return_inverse=True)
+    return ColumnarReadings(
+        asset_ids=[batch.asset_ids[i] for i in assets.tolist()],
+        metric_names=[batch.metric_names[i] for i in metric_names.tolist()],
+        asset_codes=asset_codes.astype(ASSET_CODE_DTYPE),
+        metric_codes=metric_codes.astype(METRIC_CODE_DTYPE),
+        timestamps_ns=batch.timestamps_ns,
+        values=batch.values,
+        source=batch.source,
+    )
+
+
+class AlarmStreamPublisher:
+    """Publica los lotes ya confirmados en los streams de alarmas, repartidos por activo."""
+
+    def __init__(self, redis_client: redis.Redis, partitions: int, maxlen: int):
+        self.redis = redis_client
+        self.partitions = partitions
+        self.maxlen = maxlen
+
+    def publish(self, batch: ColumnarReadings):
+        """
+        Una entrada por partición con lecturas, en una sola ida y vuelta. No lanza excepciones:
+        el lote ya está en la BD y reintentarlo lo duplicaría, así que un fallo solo se registra.
+        """
+        if not len(batch):
+            return
+        asset_partitions = np.array([partition_of(a, self.partitions) for a in batch.asset_ids], dtype=np.int64)
+        row_partitions = asset_partitions[batch.asset_codes]
+        pipe = self.redis.pipeline(transaction=False)
+        for partition in np.unique(row_partitions).tolist():
+            part = _compact(batch.take(row_partitions == partition))
+            pipe.xadd(stream_key(partition), {"payload": encode_msgpack_payload(part)}, maxlen=self.maxlen, approximate=True)
+        try:
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"No se pudo publicar un lote de {len(batch)} lecturas para el evaluador de alarmas: {e}")
+            metrics.inc("alarm_stream_publish_errors")
+            return
+        metrics.inc("alarm_stream_published_rows", len(batch))
+
+
+class AlarmStreamConsumer:
+    """
+    Lee las particiones asignadas a un proceso evaluador (las que consigue su lease).
+
+    `refresh()` adquiere o renueva los leases; `read()` devuelve primero las entradas pendientes
+    (sin XACK) de las particiones recién adquiridas o tras un error, y después las nuevas.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        worker_id: str,
+        partitions: Iterable[int],
+        lease_ttl: float = 15.0,
+        read_count: int = 50,
+        block_ms: int = 1000,
+    ):
+        self.redis = redis_client
+        self.worker_id = worker_id
+        self.partitions = list(partitions)
+        self.lease_ttl = lease_ttl
+        self.read_count = read_count
+        self.block_ms = block_ms
+        self._acquire = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+        self.owned: List[int] = []
+        self._recovering: set = set()
+        self._groups_ready: set = set()
+        self._last_entry_ms: Dict[int, int] = {}
+        self._behind: set = set()  # particiones con entradas en la última lectura
+
+    def _ensure_group(self, partition: int):
+        if partition in self._groups_ready:
+            return
+        try:
+            self.redis.xgroup_create(stream_key(partition), CONSUMER_GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._groups_ready.add(partition)
+
+    def refresh(self) -> List[int]:
+        """Adquiere o renueva los leases de las particiones candidatas (sin dueño o ya nuestras)."""
+        ttl_ms = int(self.lease_ttl * 1000)
+        pipe = self.redis.pipeline(transaction=False)
+        for partition in self.partitions:
+            self._acquire(keys=[f"{LEASE_KEY_PREFIX}{partition}"], args=[self.worker_id, ttl_ms], client=pipe)
+        owned = [p for p, acquired in zip(self.partitions, pipe.execute()) if acquired]
+        for partition in sorted(set(owned) - set(self.owned)):
+            self._take_over(partition)
+        lost = set(self.owned) - set(owned)
+        if lost:
+            logger.warning(f"[{self.worker_id}] Particiones de alarmas perdidas: {sorted(lost)}")
+            for partition in lost:
+                metrics.remove_gauge("alarm_stream_lag_seconds", partition=partition)
+                metrics.remove_gauge("alarm_stream_backlog", partition=partition)
+        if owned != self.owned:
+            logger.info(f"[{self.worker_id}] Particiones de alarmas: {owned}")
+        self.owned = owned
+        return owned
+
+    def _take_over(self, partition: int):
+        """Pasa a este proceso las entradas sin confirmar de un dueño anterior de la partición."""
+        self._ensure_group(partition)
+        start = "0-0"
+        while True:
+            start = self.redis.xautoclaim(
+                stream_key(partition), CONSUMER_GROUP, self.worker_id, min_idle_time=0, start_id=start, justid=True
+            )[0]
+            if start in (b"0-0", "0-0"):
+                break
+        self._recovering.add(partition)
+
+    def recover(self):
+        """Tras un error, las entradas entregadas y sin confirmar se vuelven a leer."""
+        self._recovering.update(self.owned)
+
+    def read(self) -> List[StreamEntry]:
+        if not self.owned:
+            time.sleep(self.block_ms / 1000)
+            return []
+        recovering = [p for p in self.owned if p in self._recovering]
+        if recovering:
+            # "0": entradas ya entregadas a este consumidor y sin XACK (no bloquea).
+            response = self.redis.xreadgroup(
+                CONSUMER_GROUP, self.worker_id, {stream_key(p): "0" for p in recovering}, count=self.read_count
+            )
+            pending = {int(key.decode().rsplit(":", 1)[1]) for key, messages in response if messages}
+            self._recovering.difference_update(set(recovering) - pending)
+        else:
+            response = self.redis.xreadgroup(
+                CONSUMER_GROUP, self.worker_id, {stream_key(p): ">" for p in self.owned},
+                count=self.read_count, block=self.block_ms,
+            )
+        entries, trimmed = [], []
+        self._behind = set()
+        for key, messages in response or []:
+            partition = int(key.decode().rsplit(":", 1)[1])
+            for entry_id, fields in messages:
+                payload = fields.get(b"payload") if fields else None
+                if payload is None:
+                    # Entrada pendiente recortada por MAXLEN antes de procesarse: solo se confirma.
+                    trimmed.append((partition, entry_id, None))
+                    continue
+                try:
+                    batch = decode_msgpack_payload(payload)
+                except ColumnarPayloadError as e:
+                    # Se descarta: reintentarla bloquearía la partición para siempre.
+                    logger.error(f"[{self.worker_id}] Entrada {entry_id!r} de la partición {partition} inválida: {e}")
+                    trimmed.append((partition, entry_id, None))
+                    continue
+                entries.append((partition, entry_id, batch))
+                self._last_entry_ms[partition] = int(entry_id.split(b"-")[0])
+                self._behind.add(partition)
+        if trimmed:
+            logger.warning(f"[{self.worker_id}] {len(trimmed)} lotes del stream descartados sin evaluar.")
+            metrics.inc("alarm_stream_trimmed_entries", len(trimmed))
+            self.ack(trimmed)
+        return entries
+
+    def ack(self, entries: List[StreamEntry]):
+        by_partition: Dict[int, List[bytes]] = {}
+        for partition, entry_id, _ in entries:
+            by_partition.setdefault(partition, []).append(entry_id)
+        pipe = self.redis.pipeline(transaction=False)
+        for partition, entry_ids in by_partition.items():
+            pipe.xack(stream_key(partition), CONSUMER_GROUP, *entry_ids)
+        pipe.execute()
+
+    def publish_status(self):
+        """
+        Retraso por partición: antigüedad de la última entrada procesada (0 si la última
+        lectura no trajo entradas) y entradas del stream aún no entregadas al grupo.
+        """
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for partition in self.owned:
+            pipe.xinfo_groups(stream_key(partition))
+        groups_per_partition = pipe.execute(raise_on_error=False)
+        pipe = self.redis.pipeline(transaction=False)
+        for partition, groups in zip(self.owned, groups_per_partition):
+            backlog = None
+            if not isinstance(groups, Exception):
+                for group in groups:
+                    if group.get("name") in (CONSUMER_GROUP, CONSUMER_GROUP.encode()):
+                        backlog = group.get("lag")  # Redis >= 7
+            last_ms = self._last_entry_ms.get(partition)
+            lag = 0.0 if partition not in self._behind or last_ms is None else max(0.0, now - last_ms / 1000)
+            metrics.set_gauge("alarm_stream_lag_seconds", lag, partition=partition)
+            if backlog is not None:
+                metrics.set_gauge("alarm_stream_backlog", backlog, partition=partition)
+            status = {
+                "partition": partition,
+                "worker_id": self.worker_id,
+                "lag_seconds": round(lag, 3),
+                "backlog": backlog,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }
+            pipe.set(f"{STATUS_KEY_PREFIX}{partition}", json.dumps(status), px=int(self.lease_ttl * 2000))
+        pipe.execute()
+
+    def leave(self):
+        """Libera los leases para que otro proceso tome las particiones sin esperar a que caduquen."""
+        pipe = self.redis.pipeline(transaction=False)
+        for partition in self.owned:
+            self._release(keys=[f"{LEASE_KEY_PREFIX}{partition}"], args=[self.worker_id], client=pipe)
+        pipe.execute()
+        self.owned = []
+
+
+def read_evaluator_statuses(redis_client: redis.Redis) -> List[Dict]:
+    """Estado de las particiones publicado por los procesos evaluadores vivos."""
+    keys = sorted(redis_client.scan_iter(match=f"{STATUS_KEY_PREFIX}*"))
+    if not keys:
+        return []
+    return sorted((json.loads(raw) for raw in redis_client.mget(keys) if raw), key=lambda s: s["partition"])
+
+
+def parse_partitions(spec: Optional[str], partitions: int) -> List[int]:
+    """`"0-3,6"` -> `[0, 1, 2, 3, 6]`; sin especificar, todas las particiones."""
+    if not spec:
+        return list(range(partitions))
+    selected = set()
+    for part in spec.split(","):
+        low, _, high = part.strip().partition("-")
+        selected.update(range(int(low), int(high or low) + 1))
+    return sorted(p for p in selected if 0 <= p < partitions)
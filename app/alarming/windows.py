@@ -0,0 +1,216 @@
+# /app/alarming/windows.py
+"""
+Reglas de alarma con ventana temporal y los ring buffers que las alimentan.
+
+Tipos de regla (`AlarmRule.rule_type`); la condición y el umbral se aplican a:
+
+- `threshold`: el valor instantáneo de cada lectura (comportamiento original).
+- `sustained`: el valor instantáneo, pero solo dispara si la condición se mantiene en todas las
+  lecturas durante al menos `window_seconds`.
+- `rate_of_change`: la variación por segundo entre la lectura y la más antigua de la ventana.
+- `rolling_mean` / `rolling_std`: la media / desviación típica de las lecturas de la ventana.
+
+Las últimas lecturas de cada (activo, métrica) con reglas de ventana se guardan en memoria en
+un `RingBufferStore`: arrays de NumPy de tamaño fijo, así que evaluar una regla nunca consulta
+`sensor_readings`. En `rate_of_change` y `rolling_*` la ventana efectiva está limitada a las
+últimas `capacity` lecturas (el evaluador lo avisa con la métrica `alarm_window_truncated`).
+`sustained` no depende del buffer: el inicio de la racha en curso de cada regla se guarda
+como timestamp en `streaks`, así que admite ventanas de cualquier duración.
+"""
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+RULE_THRESHOLD = "threshold"
+RULE_SUSTAINED = "sustained"
+RULE_RATE_OF_CHANGE = "rate_of_change"
+RULE_ROLLING_MEAN = "rolling_mean"
+RULE_ROLLING_STD = "rolling_std"
+
+RULE_TYPES = (RULE_THRESHOLD, RULE_SUSTAINED, RULE_RATE_OF_CHANGE, RULE_ROLLING_MEAN, RULE_ROLLING_STD)
+WINDOWED_RULE_TYPES = frozenset(RULE_TYPES) - {RULE_THRESHOLD}
+
+
+@dataclass(frozen=True)
+class BufferUndo:
+    """Lo necesario para deshacer un `extend`: sus posiciones y el contenido previo del buffer."""
+
+    first_seq: int  # número de secuencia de la primera lectura añadida
+    added: int
+    previous_ts: np.ndarray
+    previous_values: np.ndarray
+    previous_seqs: np.ndarray
+
+
+class RingBufferStore:
+    """
+    Últimas `capacity` lecturas `(timestamp ns, valor)` de cada clave, en orden de llegada.
+
+    Todas las claves comparten tres matrices (claves x capacity) que crecen duplicando filas:
+    timestamps, valores y el número de secuencia de cada lectura en su clave, que identifica
+    las posiciones que añadió cada `extend` aunque otra lectura tenga el mismo timestamp.
+    `streaks` guarda, por regla `sustained`, el inicio (ns) de su racha en curso. No es
+    thread-safe por sí mismo: quien lee o modifica un buffer o una racha debe tener `lock`.
+    """
+
+    def __init__(self, capacity: int = 256, initial_slots: int = 64):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self._slots: Dict[Hashable, int] = {}
+        self._ts = np.zeros((initial_slots, capacity), dtype=np.int64)
+        self._values = np.zeros((initial_slots, capacity), dtype=np.float64)
+        self._seqs = np.zeros((initial_slots, capacity), dtype=np.int64)
+        self._head = np.zeros(initial_slots, dtype=np.int64)
+        self._count = np.zeros(initial_slots, dtype=np.int64)
+        self._next_seq = np.zeros(initial_slots, dtype=np.int64)
+        # Tramos de secuencia deshechos por clave: sus lecturas no vuelven con el deshacer de otro lote.
+        self._reverted: Dict[int, Deque[Tuple[int, int]]] = {}
+        self.streaks: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _slot(self, key: Hashable) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = len(self._slots)
+            if slot == self._head.shape[0]:
+                rows = self._head.shape[0]
+                self._ts = np.vstack([self._ts, np.zeros((rows, self.capacity), dtype=np.int64)])
+                self._values = np.vstack([self._values, np.zeros((rows, self.capacity), dtype=np.float64)])
+                self._seqs = np.vstack([self._seqs, np.zeros((rows, self.capacity), dtype=np.int64)])
+                self._head = np.concatenate([self._head, np.zeros(rows, dtype=np.int64)])
+                self._count = np.concatenate([self._count, np.zeros(rows, dtype=np.int64)])
+                self._next_seq = np.concatenate([self._next_seq, np.zeros(rows, dtype=np.int64)])
+        return slot
+
+    def _positions(self, slot: int) -> np.ndarray:
+        return (self._head[slot] - self._count[slot] + np.arange(self._count[slot])) % self.capacity
+
+    def read(self, key: Hashable) -> Tuple[np.ndarray, np.ndarray]:
+        """Copia de las lecturas guardadas de `key`, de la más antigua a la más reciente."""
+        slot = self._slots.get(key)
+        if slot is None or not self._count[slot]:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        positions = self._positions(slot)
+        return self._ts[slot, positions], self._values[slot, positions]
+
+    def extend(self, key: Hashable, timestamps_ns: np.ndarray, values: np.ndarray) -> Optional[BufferUndo]:
+        """
+        Añade lecturas (ya ordenadas por tiempo) descartando las más antiguas si no caben.
+        Devuelve lo necesario para deshacerlo con `revert`.
+        """
+        if not timestamps_ns.shape[0]:
+            return None
+        slot = self._slot(key)
+        timestamps_ns, values = timestamps_ns[-self.capacity:], values[-self.capacity:]
+        k = timestamps_ns.shape[0]
+        previous = self._positions(slot)
+        undo = BufferUndo(
+            int(self._next_seq[slot]), k,
+            self._ts[slot, previous], self._values[slot, previous], self._seqs[slot, previous],
+        )
+        positions = (self._head[slot] + np.arange(k)) % self.capacity
+        self._ts[slot, positions] = timestamps_ns
+        self._values[slot, positions] = values
+        self._seqs[slot, positions] = self._next_seq[slot] + np.arange(k)
+        self._next_seq[slot] += k
+        self._head[slot] = (self._head[slot] + k) % self.capacity
+        self._count[slot] = min(self.capacity, self._count[slot] + k)
+        return undo
+
+    def revert(
+        self,
+        key: Hashable,
+        undo: Optional[BufferUndo],
+        streaks: Optional[Dict[Hashable, Tuple[Optional[int], Optional[int]]]] = None,
+    ):
+        """
+        Deshace un `extend` cuya transacción no llegó a confirmarse: quita las posiciones que
+        añadió (por número de secuencia, no por timestamp) y recupera las que desplazaron, directa
+        o indirectamente. Las lecturas que otros lotes hayan añadido después se conservan.
+        `streaks` da, por regla, (inicio previo, inicio fijado por el lote); solo se restaura si
+        nadie lo ha cambiado después.
+        """
+        for rule_id, (before, after) in (streaks or {}).items():
+            if self.streaks.get(rule_id) == after:
+                if before is None:
+                    self.streaks.pop(rule_id, None)
+                else:
+                    self.streaks[rule_id] = before
+        slot = self._slots.get(key)
+        if slot is None or undo is None:
+            return
+        reverted = self._reverted.setdefault(slot, deque(maxlen=32))
+        reverted.append((undo.first_seq, undo.first_seq + undo.added))
+        positions = self._positions(slot)
+        seqs, first = np.unique(np.concatenate((undo.previous_seqs, self._seqs[slot, positions])), return_index=True)
+        ts = np.concatenate((undo.previous_ts, self._ts[slot, positions]))[first]
+        values = np.concatenate((undo.previous_values, self._values[slot, positions]))[first]
+        keep = np.ones(seqs.shape[0], dtype=bool)
+        for start, stop in reverted:
+            keep &= (seqs < start) | (seqs >= stop)
+        keep[np.flatnonzero(keep)[:-self.capacity]] = False
+        n = int(keep.sum())
+        self._ts[slot, :n] = ts[keep]
+        self._values[slot, :n] = values[keep]
+        self._seqs[slot, :n] = seqs[keep]
+        self._head[slot] = n % self.capacity
+        self._count[slot] = n
+
+
+def window_starts(timestamps_ns: np.ndarray, window_ns: int, first: int) -> np.ndarray:
+    """Para cada lectura desde `first`, índice de la lectura más antigua dentro de su ventana."""
+    return np.searchsorted(timestamps_ns, timestamps_ns[first:] - window_ns, side="left")
+
+
+def window_statistic(
+    rule_type: str, timestamps_ns: np.ndarray, values: np.ndarray, window_ns: int, first: int = 0
+) -> np.ndarray:
+    """
+    Valor derivado (`rate_of_change`, `rolling_mean` o `rolling_std`) en cada lectura desde
+    `first`, calculado sobre la ventana `[t - window, t]` con sumas acumuladas.
+    """
+    starts = window_starts(timestamps_ns, window_ns, first)
+    ends = np.arange(first, values.shape[0])
+    if rule_type == RULE_RATE_OF_CHANGE:
+        elapsed = (timestamps_ns[ends] - timestamps_ns[starts]) / 1e9
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(elapsed > 0, (values[ends] - values[starts]) / elapsed, np.nan)
+
+    # Se resta el primer valor para que las sumas de cuadrados no pierdan precisión.
+    shifted = values - values[0] if values.shape[0] else values
+    sums = np.concatenate(([0.0], np.cumsum(shifted)))
+    counts = ends - starts + 1
+    mean = (sums[ends + 1] - sums[starts]) / counts
+    if rule_type == RULE_ROLLING_MEAN:
+        return mean + (values[0] if values.shape[0] else 0.0)
+    if rule_type == RULE_ROLLING_STD:
+        squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+        variance = (squares[ends + 1] - squares[starts]) / counts - mean * mean
+        return np.sqrt(np.maximum(variance, 0.0))
+    raise ValueError(f"Tipo de regla sin estadístico de ventana: {rule_type}")
+
+
+def sustained_breaches(
+    timestamps_ns: np.ndarray, holds: np.ndarray, window_ns: int, streak_start_ns: Optional[int] = None
+) -> Tuple[np.ndarray, Optional[int]]:
+    """
+    Para cada lectura, si la condición (`holds`) se cumple sin interrupción desde hace al menos
+    `window_ns`. `streak_start_ns` es el inicio de la racha en curso al terminar el lote anterior
+    (None si su última lectura no cumplía la condición); se devuelve el de este lote.
+    """
+    n = holds.shape[0]
+    if not n:
+        return np.zeros(0, dtype=bool), streak_start_ns
+    # Inicio de la racha actual: la lectura siguiente al último incumplimiento de la condición
+    # o, si no lo hay en el lote, el de la racha que viene del lote anterior.
+    last_break = np.maximum.accumulate(np.where(holds, -1, np.arange(n)))
+    carried = timestamps_ns[0] if streak_start_ns is None else streak_start_ns
+    starts = np.where(last_break >= 0, timestamps_ns[np.minimum(last_break + 1, n - 1)], carried)
+    hits = holds & (timestamps_ns - starts >= window_ns)
+    return hits, (int(starts[-1]) if holds[-1] else None)
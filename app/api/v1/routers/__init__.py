@@ -28,6 +28,7 @@ from app.notifications import api_config as notifications_config_api
 from app.media import api as media_api
 from app.reporting import api as reporting_api # <-- Reporting
 from app.payments import api as payments_api # <-- Payments
+from app.monitoring import api as monitoring_api
 
 # --- Router Principal de la API v1 ---
 api_router = APIRouter()
@@ -62,7 +63,9 @@ back_office_router.include_router(auditing_api.router, dependencies=[Depends(req
 sys_mgt_router = APIRouter(prefix="/sys-mgt")
 sys_mgt_router.include_router(configuration_api.router)
 sys_mgt_router.include_router(core_engine_api.router)
+sys_mgt_router.include_router(core_engine_api.state_rules_router)
 sys_mgt_router.include_router(api_marketing.admin_router) # Marketing Admin
+sys_mgt_router.include_router(monitoring_api.router)
 
 # Montamos el router de identidad para super admins
 identity_superadmin_router = APIRouter(prefix="/identity")
@@ -32,6 +32,58 @@ class Settings(BaseSettings):
         """Genera la URL de conexión a la base de datos."""
         return f"postgresql+psycopg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    # --- Ingesta de Telemetría ---
+    TELEMETRY_QUEUE_MAX_ROWS: int = 200_000  # Capacidad máxima de la cola en lecturas
+    TELEMETRY_BATCH_MAX_ROWS: int = 5_000  # Tamaño de lote que dispara un flush inmediato
+    TELEMETRY_BATCH_MAX_DELAY_MS: int = 200  # Edad máxima de una lectura encolada antes del flush
+    TELEMETRY_QUEUE_RETRY_AFTER_SECONDS: int = 1  # Valor de Retry-After cuando la cola está llena
+    TELEMETRY_INGEST_WORKERS: int = 4  # Workers que vacían la cola, cada uno con su propia sesión de BD
+    TELEMETRY_STREAM_BATCH_ROWS: int = 10_000  # Lecturas por lote en la ingesta por streaming (backfills)
+    TELEMETRY_STREAM_MAX_LINE_BYTES: int = 64 * 1024  # Longitud máxima de una línea NDJSON
+    TELEMETRY_STREAM_MAX_REPORTED_ERRORS: int = 1_000  # Líneas erróneas detalladas en el resumen
+    TELEMETRY_SPOOL_ENABLED: bool = True  # Guardar en disco los lotes que fallan por caída de la BD
+    TELEMETRY_SPOOL_PATH: str = "/app/storage/telemetry_spool"
+    TELEMETRY_SPOOL_MAX_MB: int = 2_048  # Uso máximo de disco del spool de cada proceso
+    TELEMETRY_SPOOL_SEGMENT_MB: int = 64
+    TELEMETRY_SPOOL_REPLAY_BATCH_ROWS: int = 20_000  # Lecturas por lote al reenviar el spool
+    TELEMETRY_SPOOL_REPLAY_MAX_ATTEMPTS: int = 5  # Fallos no transitorios antes de apartar un lote a cuarentena
+
+    # --- Core Engine ---
+    CORE_ENGINE_MAX_CONCURRENT_POLLS: int = 256  # Sondeos de dispositivos en vuelo a la vez
+    CORE_ENGINE_SCHEDULER_TICK_MS: int = 20  # Resolución de la rueda de tiempo del planificador
+    CORE_ENGINE_RECONCILE_INTERVAL_SECONDS: float = 5.0  # Ciclo del supervisor de conectores
+    CORE_ENGINE_FAILED_AFTER_ERRORS: int = 5  # Fallos consecutivos para marcar un conector como FAILED
+    CORE_ENGINE_RESTART_BACKOFF_MAX_SECONDS: float = 300.0  # Techo del backoff de reinicio
+    CORE_ENGINE_MAX_CONCURRENT_STARTS: int = 64  # Conectores arrancando a la vez en una reconciliación
+    CORE_ENGINE_START_TIMEOUT_SECONDS: float = 10.0  # Tiempo máximo de arranque de un conector
+    CORE_ENGINE_RUN_IN_API: bool = True  # False si los conectores los ejecuta `python -m app.core_engine.runner`
+    CORE_ENGINE_RUNNER_WORKERS: int = 2  # Procesos por réplica del runner
+    CORE_ENGINE_LEASE_TTL_SECONDS: float = 15.0  # Validez del lease de una fuente sin renovarlo
+    CORE_ENGINE_MEMBER_TTL_SECONDS: float = 10.0  # Sin latido durante este tiempo, un proceso sale del anillo
+    CORE_ENGINE_STATE_RULES_RELOAD_SECONDS: float = 60.0  # Recarga periódica de las reglas de estado
+
+    # --- Alarmas ---
+    ALARM_RULES_RELOAD_SECONDS: float = 60.0  # Recarga periódica del índice de reglas de alarma
+    ALARM_WINDOW_BUFFER_SAMPLES: int = 256  # Lecturas guardadas por (activo, métrica): límite de la ventana de rate_of_change/rolling_*
+    ALARM_REARM_SECONDS: float = 60.0  # Mínimo entre dos alarmas de la misma regla (si la regla no fija el suyo)
+    ALARM_ASSET_RATE_LIMIT: int = 20  # Alarmas nuevas por activo y ventana (0 = sin límite)
+    ALARM_ASSET_RATE_WINDOW_SECONDS: float = 60.0
+    ALARM_MAX_SHELVE_HOURS: float = 24.0  # Máximo tiempo que se puede archivar una regla
+    ALARM_ACTIVE_SYNC_SECONDS: float = 30.0  # Resincronización del set local de alarmas activas con Redis
+    ALARM_ACTIVE_RECONCILE_SECONDS: float = 300.0  # Reconciliación de las alarmas activas de Redis con la BD
+    ALARM_ACTIVE_CLAIM_GRACE_SECONDS: float = 120.0  # Concesiones más recientes no se quitan (lote sin confirmar)
+    # Evaluador de alarmas dedicado (python -m app.alarming.runner): la ingesta publica los lotes en Redis Streams
+    ALARM_STREAM_ENABLED: bool = False  # False = las alarmas se evalúan en la propia ingesta
+    ALARM_STREAM_PARTITIONS: int = 8  # Streams particionados por activo (no cambiar con datos pendientes)
+    ALARM_STREAM_MAXLEN: int = 100000  # Entradas (lotes) retenidas por partición, aproximado
+    ALARM_EVALUATOR_WORKERS: int = 2
+    ALARM_EVALUATOR_LEASE_TTL_SECONDS: float = 15.0
+    ALARM_EVALUATOR_READ_COUNT: int = 50  # Entradas leídas por partición en cada lectura
+    ALARM_EVALUATOR_BLOCK_MS: int = 1000
+
+    # --- Monitorización ---
+    EVENT_LOOP_LAG_SAMPLE_SECONDS: float = 0.25  # Intervalo de muestreo del lag del bucle de eventos
+
     # --- Cache y Sesiones (Redis) ---
     REDIS_HOST: str
     REDIS_PORT: int = 6379
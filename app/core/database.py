@@ -1,10 +1,16 @@
 # /app/core/database.py
 
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+import psycopg
+from sqlalchemy import create_engine, event
+from sqlalchemy import exc as sa_exc
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
+from app.core.metrics import metrics
 
 # --- Creación del Engine de SQLAlchemy (Síncrono) ---
 engine = create_engine(
@@ -18,6 +24,78 @@ engine = create_engine(
 # --- Fábrica de Sesiones de Base de Datos (Síncrona) ---
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --- Sesiones para Componentes de Background ---
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Sesión de corta duración tomada del pool para un lote o tarea de background.
+
+    Los componentes de larga vida (cola de ingesta, conectores, detectores) no deben
+    retener una sesión durante toda la vida del proceso: abren una por lote/tarea con
+    este context manager, que confirma al salir, deshace si hay error y siempre cierra
+    (devolviendo la conexión al pool).
+    """
+    db: Session = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# --- Clasificación de Errores de BD ---
+# Las rutas COPY usan la conexión psycopg directamente, así que sus errores llegan sin envolver
+# en las excepciones de SQLAlchemy: se reconocen ambas.
+_DATA_ERRORS = (sa_exc.IntegrityError, sa_exc.DataError, psycopg.IntegrityError, psycopg.DataError)
+
+
+def is_data_error(error: BaseException) -> bool:
+    """
+    Error permanente de los datos (clave foránea inexistente, restricción, valor inválido):
+    reintentar las mismas filas fallará igual.
+    """
+    return isinstance(error, _DATA_ERRORS)
+
+
+_TRANSIENT_ERRORS = (
+    sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.DisconnectionError, sa_exc.TimeoutError,
+    psycopg.OperationalError, psycopg.InterfaceError,
+)
+
+
+def is_transient_db_error(error: BaseException) -> bool:
+    """Error de disponibilidad de la BD (conexión caída, pool agotado, servidor saturado): reintentable."""
+    return isinstance(error, _TRANSIENT_ERRORS)
+
+
+# --- Métricas del Pool de Conexiones ---
+def get_pool_status() -> Dict[str, float]:
+    """Devuelve el estado actual del pool de conexiones síncrono."""
+    pool = engine.pool
+    capacity = settings.DATABASE_POOL_SIZE + settings.DATABASE_POOL_OVERFLOW
+    checked_out = pool.checkedout()
+    return {
+        "size": pool.size(),
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "capacity": capacity,
+        "utilization": checked_out / capacity if capacity else 0.0,
+    }
+
+
+def _record_pool_metrics(*_args):
+    for name, value in get_pool_status().items():
+        metrics.set_gauge(f"db_pool_{name}", value)
+
+
+event.listen(engine, "checkout", _record_pool_metrics)
+event.listen(engine, "checkin", _record_pool_metrics)
+
+
 # --- Creación del Engine de SQLAlchemy (Asíncrono) ---
 # Necesario para scripts que usan asyncio o endpoints async de FastAPI
 async_engine = create_async_engine(
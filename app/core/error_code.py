@@ -14,6 +14,7 @@ class ErrorCode(str, Enum):
 
     VALIDATION_ERROR = "validation_error"  # Para errores 422
     PAYLOAD_TOO_LARGE = "payload_too_large"  # Para errores 413
+    SERVICE_UNAVAILABLE = "service_unavailable"  # Para errores 503
 
     UNEXPECTED_ERROR = "unexpected_error"
     # ... puedes añadir más códigos según sea necesario
\ No newline at end of file
@@ -42,3 +42,4 @@ class ErrorMessages:
     ASSET_NOT_FOUND = "ASSET.NOT_FOUND"
     WORK_ORDER_NOT_FOUND = "WORK_ORDER.NOT_FOUND"
     PROVIDER_NOT_FOUND = "PROVIDER.NOT_FOUND"
+    TELEMETRY_QUEUE_FULL = "TELEMETRY.QUEUE_FULL"
@@ -38,7 +38,9 @@ class EventBroker:
         """
         for message in self.pubsub.listen():
             if message["type"] == "message":
-                channel = message["channel"].decode("utf-8")
+                channel = message["channel"]
+                if isinstance(channel, bytes):  # Depende de decode_responses del cliente
+                    channel = channel.decode("utf-8")
                 handler = self.subscriptions.get(channel)
                 if handler:
                     try:
@@ -13,6 +13,7 @@ from app.core.exceptions import (
     NotFoundException,
     PayloadTooLargeException,
     PermissionDeniedException,
+    ServiceUnavailableException,
     ValidationException,
 )
 
@@ -91,6 +92,19 @@ def add_exception_handlers(app: FastAPI):
             content={"error_code": ErrorCode.PAYLOAD_TOO_LARGE, "message": exc.detail},
         )
 
+    @app.exception_handler(ServiceUnavailableException)
+    async def service_unavailable_handler(request: Request, exc: ServiceUnavailableException):
+        """Handler para servicios temporalmente no disponibles (503), con Retry-After opcional."""
+        logger.warning(
+            f"Service unavailable: {exc.detail}. Path: {request.method} {request.url.path}"
+        )
+        headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after is not None else None
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"error_code": ErrorCode.SERVICE_UNAVAILABLE, "message": exc.detail},
+            headers=headers,
+        )
+
     @app.exception_handler(ValidationException)
     async def validation_exception_handler(request: Request, exc: ValidationException):
         """Handler para errores de validación de negocio (422)."""
@@ -122,10 +122,15 @@ class InvalidCredentialsException(CustomBaseException):
 
 
 class ServiceUnavailableException(CustomBaseException):
-    """Lanzada cuando un servicio externo no está disponible."""
+    """
+    Lanzada cuando un servicio (externo o interno) no está disponible temporalmente (resulta en un 503).
+
+    `retry_after` (segundos) se devuelve al cliente en la cabecera `Retry-After`.
+    """
 
-    def __init__(self, detail: str = ErrorMessages.SERVICE_UNAVAILABLE):
+    def __init__(self, detail: str = ErrorMessages.SERVICE_UNAVAILABLE, retry_after: int | None = None):
         self.detail = detail
+        self.retry_after = retry_after
         super().__init__(self.detail)
 
 
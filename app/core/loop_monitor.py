@@ -0,0 +1,50 @@
+# /app/core/loop_monitor.py
+"""
+Monitor del retardo (lag) del bucle de eventos de asyncio.
+
+Duerme a intervalos fijos y mide cuánto tarda el bucle en despertarlo respecto a lo
+esperado. Cualquier trabajo bloqueante en el bucle (commits, I/O síncrona, CPU) aparece
+como lag, por lo que esta métrica permite verificar que la ingesta no bloquea el proceso.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger("app.core.loop_monitor")
+
+LOOP_LAG_METRIC = "event_loop_lag_seconds"
+
+
+class EventLoopLagMonitor:
+    """Tarea de background que registra el lag del bucle en el registro de métricas."""
+
+    def __init__(self, interval: float, warn_threshold: float = 0.5):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Monitor de lag del bucle de eventos iniciado (intervalo={self.interval}s).")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            metrics.observe(LOOP_LAG_METRIC, lag)
+            metrics.set_gauge(LOOP_LAG_METRIC, lag)
+            if lag > self.warn_threshold:
+                logger.warning(f"El bucle de eventos estuvo bloqueado {lag * 1000:.0f} ms.")
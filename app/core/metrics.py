@@ -0,0 +1,108 @@
+# /app/core/metrics.py
+"""
+Registro de métricas en proceso.
+
+Proporciona contadores, gauges y resúmenes (ventana deslizante de muestras) con etiquetas,
+seguros para hilos, para instrumentar los componentes de background (cola de ingesta,
+conectores, bucle de eventos, pool de BD). Se exponen a través del endpoint de monitorización.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+SUMMARY_WINDOW = 1024  # Muestras que se conservan por serie para calcular percentiles
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Summary:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=SUMMARY_WINDOW)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def to_dict(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+
+        def _percentile(q: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "p50": _percentile(0.50),
+            "p95": _percentile(0.95),
+            "p99": _percentile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """Almacén de métricas con etiquetas. Todas las operaciones son thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._summaries: Dict[str, Dict[LabelKey, _Summary]] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: Any):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def remove_gauge(self, name: str, **labels: Any):
+        with self._lock:
+            self._gauges.get(name, {}).pop(_label_key(labels), None)
+
+    def observe(self, name: str, value: float, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            summary = series.get(key)
+            if summary is None:
+                summary = series[key] = _Summary()
+            summary.observe(value)
+
+    def snapshot(self) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Devuelve una copia serializable de todas las series."""
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                "summaries": {
+                    name: [{"labels": dict(k), **s.to_dict()} for k, s in series.items()]
+                    for name, series in self._summaries.items()
+                },
+            }
+
+
+# --- Registro global del proceso ---
+metrics = MetricsRegistry()
@@ -91,6 +91,14 @@ DATA_SOURCE_CREATE = "data_source:create"
 DATA_SOURCE_UPDATE = "data_source:update"
 DATA_SOURCE_DELETE = "data_source:delete"
 
+STATE_RULE_READ = "state_rule:read"
+STATE_RULE_CREATE = "state_rule:create"
+STATE_RULE_UPDATE = "state_rule:update"
+STATE_RULE_DELETE = "state_rule:delete"
+
+# --- Permisos de Monitorización del Sistema ---
+SYSTEM_METRICS_READ = "system_metrics:read"
+
 # --- Permisos de Auditoría y Aprobaciones ---
 AUDIT_LOG_READ = "audit_log:read"
 APPROVAL_READ = "approval:read"
@@ -146,4 +154,6 @@ DEFAULT_PLATFORM_ADMIN_PERMISSIONS = [
     CAMPAIGN_READ, CAMPAIGN_CREATE, CAMPAIGN_UPDATE, CAMPAIGN_DELETE,
     COUPON_READ, COUPON_CREATE, COUPON_UPDATE, COUPON_DELETE,
     REFERRAL_READ,
+    # Métricas internas de los procesos (no son de un tenant)
+    SYSTEM_METRICS_READ,
 ]
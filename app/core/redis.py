@@ -22,6 +22,15 @@ redis_connection_pool = redis.ConnectionPool(
 # Este es el cliente que el resto de la aplicación usará.
 redis_client = redis.Redis(connection_pool=redis_connection_pool)
 
+# --- Cliente binario ---
+# Sin decodificación, para valores que no son texto (p. ej. lotes MessagePack en streams).
+redis_binary_connection_pool = redis.ConnectionPool(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=0,
+)
+redis_binary_client = redis.Redis(connection_pool=redis_binary_connection_pool)
+
 
 # --- Dependencia para FastAPI ---
 def get_redis_client() -> redis.Redis:
@@ -29,3 +38,8 @@ def get_redis_client() -> redis.Redis:
     Dependencia de FastAPI que inyecta el cliente de Redis en los endpoints.
     """
     return redis_client
+
+
+def get_redis_binary_client() -> redis.Redis:
+    """Cliente de Redis que devuelve `bytes` (ver `redis_binary_client`)."""
+    return redis_binary_client
@@ -4,13 +4,17 @@ API Router para el Core Engine.
 """
 import logging
 import uuid
-from typing import List
+from typing import List, Optional
 
+import redis
 from fastapi import APIRouter, Depends, status
 
 from app.core_engine import schemas
 from app.core_engine.service import CoreEngineService
-from app.dependencies.services import get_core_engine_service
+from app.core.redis import get_redis_client
+from app.core_engine.sharding import read_connector_statuses
+from app.core_engine.supervisor import ConnectorSupervisor
+from app.dependencies.services import get_core_engine_service, get_connector_supervisor
 from app.dependencies.tenant import get_tenant_id
 from app.dependencies.permissions import require_permission
 from app.identity.models import User
@@ -38,6 +42,19 @@ def list_data_sources(
 ):
     return core_engine_service.list_data_sources(tenant_id, skip, limit)
 
+# Declarado antes de /{ds_id} para que "status" no se interprete como un ID.
+@router.get("/status", response_model=List[schemas.ConnectorStatusRead], dependencies=[Depends(require_permission("data_source:read"))])
+def get_connectors_status(
+    supervisor: Optional[ConnectorSupervisor] = Depends(get_connector_supervisor),
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+    redis_client: redis.Redis = Depends(get_redis_client),
+):
+    """Estado supervisado (CONNECTING, RUNNING, DEGRADED, FAILED) de los conectores del tenant."""
+    if supervisor is None:
+        # Los conectores corren en el runner del Core Engine, que publica su estado en Redis.
+        return read_connector_statuses(redis_client, tenant_id)
+    return supervisor.snapshot(tenant_id)
+
 @router.get("/{ds_id}", response_model=schemas.DataSourceRead, dependencies=[Depends(require_permission("data_source:read"))])
 def get_data_source(
     ds_id: uuid.UUID,
@@ -65,3 +82,54 @@ def delete_data_source(
 ):
     core_engine_service.delete_data_source(ds_id, tenant_id, current_user)
     return None
+
+
+# --- Reglas de estado de máquina ---
+
+state_rules_router = APIRouter(prefix="/state-rules", tags=["Core Engine - State Rules"])
+
+@state_rules_router.post("/", response_model=schemas.StateRuleRead, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_permission("state_rule:create"))])
+def create_state_rule(
+    rule_in: schemas.StateRuleCreate,
+    core_engine_service: CoreEngineService = Depends(get_core_engine_service),
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+    current_user: User = Depends(get_current_active_user)
+):
+    return core_engine_service.create_state_rule(rule_in, tenant_id, current_user)
+
+@state_rules_router.get("/", response_model=List[schemas.StateRuleRead], dependencies=[Depends(require_permission("state_rule:read"))])
+def list_state_rules(
+    skip: int = 0,
+    limit: int = 100,
+    core_engine_service: CoreEngineService = Depends(get_core_engine_service),
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+):
+    return core_engine_service.list_state_rules(tenant_id, skip, limit)
+
+@state_rules_router.get("/{rule_id}", response_model=schemas.StateRuleRead, dependencies=[Depends(require_permission("state_rule:read"))])
+def get_state_rule(
+    rule_id: uuid.UUID,
+    core_engine_service: CoreEngineService = Depends(get_core_engine_service),
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+):
+    return core_engine_service.get_state_rule(rule_id, tenant_id)
+
+@state_rules_router.put("/{rule_id}", response_model=schemas.StateRuleRead, dependencies=[Depends(require_permission("state_rule:update"))])
+def update_state_rule(
+    rule_id: uuid.UUID,
+    rule_in: schemas.StateRuleUpdate,
+    core_engine_service: CoreEngineService = Depends(get_core_engine_service),
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+    current_user: User = Depends(get_current_active_user)
+):
+    return core_engine_service.update_state_rule(rule_id, rule_in, tenant_id, current_user)
+
+@state_rules_router.delete("/{rule_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_permission("state_rule:delete"))])
+def delete_state_rule(
+    rule_id: uuid.UUID,
+    core_engine_service: CoreEngineService = Depends(get_core_engine_service),
+    tenant_id: uuid.UUID = Depends(get_tenant_id),
+    current_user: User = Depends(get_current_active_user)
+):
+    core_engine_service.delete_state_rule(rule_id, tenant_id, current_user)
+    return None
@@ -0,0 +1,99 @@
+# /app/core_engine/connectors/deadband.py
+"""
+Filtro de banda muerta (report-by-exception) para los conectores.
+
+Decide, para cada lectura de un lote, si se publica o se descarta antes de llegar a la
+ingesta. Las reglas se configuran por tag (registro Modbus o nodo OPC UA) con valores por
+defecto en `connection_params.deadband`:
+
+    deadband_abs:         se publica si |v - último publicado| > deadband_abs
+    deadband_pct:         se publica si |v - último publicado| > deadband_pct % de |último publicado|
+    min_interval_seconds: nunca se publica más de una vez por intervalo (salvo latido)
+    max_silent_seconds:   latido: se publica siempre que haya pasado este tiempo sin publicar
+
+Si se configuran `deadband_abs` y `deadband_pct` basta con superar uno de los dos. Un tag sin
+ninguna banda configurada publica cada lectura (sujeto a `min_interval_seconds`).
+
+El estado (último valor y momento publicados) vive en arrays de NumPy indexados por tag y
+cada lote se evalúa con operaciones vectorizadas.
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+RULE_KEYS = ("deadband_abs", "deadband_pct", "min_interval_seconds", "max_silent_seconds")
+
+
+class DeadbandFilter:
+    """Estado y reglas de banda muerta para los tags de una fuente de datos."""
+
+    def __init__(self, tags: Sequence[Dict[str, Any]], defaults: Optional[Dict[str, Any]] = None):
+        defaults = defaults or {}
+
+        def _rule(key: str) -> np.ndarray:
+            return np.array([float(tag.get(key, defaults.get(key)) or 0) for tag in tags], dtype=np.float64)
+
+        self.abs_band = _rule("deadband_abs")
+        self.pct_band = _rule("deadband_pct") / 100
+        self.min_interval = _rule("min_interval_seconds")
+        self.max_silent = _rule("max_silent_seconds")
+        self.has_band = (self.abs_band > 0) | (self.pct_band > 0)
+        # Sin banda ni intervalo mínimo en ningún tag, el filtro deja pasar todo sin coste.
+        self.enabled = bool((self.has_band | (self.min_interval > 0)).any())
+
+        self.last_value = np.full(len(tags), np.nan)
+        self.last_sent = np.full(len(tags), -np.inf)
+
+    def apply(self, tags: np.ndarray, values: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Devuelve la máscara de lecturas a publicar y actualiza el estado.
+
+        `tags` son índices de tag, `timestamps` segundos epoch. Si un tag aparece varias veces
+        en el lote, sus lecturas se evalúan en orden (cada una contra la última publicada).
+        """
+        tags = np.asarray(tags, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if not self.enabled:
+            return np.ones(tags.shape[0], dtype=bool)
+
+        order = np.argsort(tags, kind="stable")
+        sorted_tags = tags[order]
+        group_start = np.r_[True, sorted_tags[1:] != sorted_tags[:-1]] if sorted_tags.size else np.empty(0, bool)
+        if group_start.all():
+            return self._apply_unique(tags, values, timestamps)
+
+        # Rango de aparición de cada lectura dentro de su tag: la ronda r evalúa la r-ésima
+        # lectura de cada tag, así cada ronda tiene tags únicos y respeta el orden.
+        starts = np.maximum.accumulate(np.where(group_start, np.arange(sorted_tags.size), 0))
+        rank = np.empty(tags.shape[0], dtype=np.intp)
+        rank[order] = np.arange(sorted_tags.size) - starts
+        keep = np.zeros(tags.shape[0], dtype=bool)
+        for r in range(int(rank.max()) + 1):
+            idx = np.flatnonzero(rank == r)
+            keep[idx] = self._apply_unique(tags[idx], values[idx], timestamps[idx])
+        return keep
+
+    def _apply_unique(self, tags: np.ndarray, values: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        last_value = self.last_value[tags]
+        elapsed = timestamps - self.last_sent[tags]
+        delta = np.abs(values - last_value)
+
+        abs_band = self.abs_band[tags]
+        pct_band = self.pct_band[tags]
+        with np.errstate(invalid="ignore"):
+            changed = (
+                ~self.has_band[tags]
+                | ((abs_band > 0) & (delta > abs_band))
+                | ((pct_band > 0) & (delta > pct_band * np.abs(last_value)))
+                | (np.isnan(values) != np.isnan(last_value))
+            )
+        max_silent = self.max_silent[tags]
+        heartbeat = (max_silent > 0) & (elapsed >= max_silent)
+        keep = np.isinf(elapsed) | heartbeat | (changed & (elapsed >= self.min_interval[tags]))
+
+        sent = tags[keep]
+        self.last_value[sent] = values[keep]
+        self.last_sent[sent] = timestamps[keep]
+        return keep
@@ -0,0 +1,27 @@
+# /app/core_engine/connectors/health.py
+"""
+Estado de salud que cada conector reporta a su supervisor.
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class ConnectorHealth:
+    """Resultado de los últimos ciclos de un conector (éxitos, fallos consecutivos, error fatal)."""
+
+    def __init__(self):
+        self.last_success_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self.fatal = False
+
+    def record_success(self):
+        self.last_success_at = datetime.now(timezone.utc)
+        self.consecutive_failures = 0
+
+    def record_failure(self, error: BaseException, fatal: bool = False):
+        """Registra un fallo. `fatal` indica que el conector ya no se recuperará por sí mismo."""
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.consecutive_failures += 1
+        self.fatal = self.fatal or fatal
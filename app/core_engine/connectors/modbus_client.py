@@ -0,0 +1,105 @@
+# /app/core_engine/connectors/modbus_client.py
+"""
+Cliente Modbus TCP asíncrono con conexión persistente.
+
+Mantiene abierto el socket entre ciclos de sondeo y, si la conexión cae, reintenta con
+backoff exponencial en lugar de reconectar en cada ciclo.
+"""
+
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+from app.core.metrics import metrics
+from app.core_engine.connectors.modbus_read_planner import INPUT, ReadBlock
+
+logger = logging.getLogger("app.core_engine.connector.modbus")
+
+ILLEGAL_DATA_ADDRESS = 2  # Código de excepción Modbus
+
+
+class ModbusReadError(Exception):
+    """El dispositivo respondió a una lectura con una excepción Modbus."""
+
+    def __init__(self, block: ReadBlock, exception_code: Optional[int]):
+        self.block = block
+        self.exception_code = exception_code
+        super().__init__(
+            f"Excepción Modbus {exception_code} leyendo {block.count} registros {block.register_type} "
+            f"desde {block.start} (esclavo {block.slave})"
+        )
+
+    @property
+    def is_illegal_address(self) -> bool:
+        return self.exception_code == ILLEGAL_DATA_ADDRESS
+
+
+class PersistentModbusClient:
+    """Envoltorio de `AsyncModbusTcpClient` con reconexión controlada por backoff."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 502,
+        timeout: float = 3.0,
+        reconnect_min_delay: float = 0.5,
+        reconnect_max_delay: float = 30.0,
+        name: str = "",
+    ):
+        self.host = host
+        self.port = port
+        self.name = name or f"{host}:{port}"
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        # reconnect_delay=0 desactiva la reconexión interna de pymodbus: la gestionamos aquí.
+        self._client = AsyncModbusTcpClient(host, port=port, timeout=timeout, retries=0, reconnect_delay=0)
+        self._delay = reconnect_min_delay
+        self._next_attempt = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return bool(self._client.connected)
+
+    async def ensure_connected(self):
+        """
+        Garantiza la conexión o lanza `ConnectionException` sin esperar.
+
+        Tras un fallo, los intentos siguientes se rechazan de inmediato hasta que vence el
+        backoff (exponencial), de modo que un equipo caído no ocupa un hueco de E/S del
+        planificador en cada ciclo.
+        """
+        if self.connected:
+            return
+        now = time.monotonic()
+        if now < self._next_attempt:
+            raise ConnectionException(f"{self.name}: reconexión en espera ({self._next_attempt - now:.1f}s)")
+        if await self._client.connect():
+            logger.info(f"Conexión Modbus establecida con {self.name}")
+            self._delay = self.reconnect_min_delay
+            self._next_attempt = 0.0
+            return
+        logger.warning(f"No se pudo conectar con {self.name}; reintento en {self._delay:.1f}s")
+        self._next_attempt = now + self._delay
+        self._delay = min(self._delay * 2, self.reconnect_max_delay)
+        raise ConnectionException(f"{self.name}: no se pudo conectar")
+
+    async def read_block(self, block: ReadBlock) -> List[int]:
+        """Ejecuta una petición del plan y devuelve sus palabras de 16 bits."""
+        read = self._client.read_input_registers if block.register_type == INPUT else self._client.read_holding_registers
+        metrics.inc("modbus_requests", source=self.name)
+        try:
+            result = await read(block.start, block.count, slave=block.slave)
+        except (ConnectionException, ModbusIOException, asyncio.TimeoutError):
+            # Cualquier fallo de transporte invalida el socket; el siguiente ciclo reconecta.
+            self.close()
+            raise
+        if result.isError():
+            raise ModbusReadError(block, getattr(result, "exception_code", None))
+        return result.registers
+
+    def close(self):
+        self._client.close()
@@ -2,18 +2,27 @@
 """
 Conector específico para el protocolo Modbus TCP.
 
-Implementa un bucle de sondeo (polling) para leer registros de dispositivos
-Modbus a intervalos regulares.
+Lee registros de dispositivos Modbus a intervalos regulares. Los ciclos los dispara el
+planificador central de sondeos (`PollScheduler`); la conexión TCP se mantiene abierta entre
+ciclos y los registros se leen según un plan que fusiona rangos contiguos en pocas peticiones.
+Las lecturas que no superan la banda muerta configurada se descartan antes de la ingesta.
 """
 
-import asyncio
 import logging
-from typing import Callable, List, Dict, Any
+import time
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime, timezone
 
-from pymodbus.client import ModbusTcpClient
+import numpy as np
 
+from app.core.metrics import metrics
+from app.core_engine.connectors.deadband import DeadbandFilter
+from app.core_engine.connectors.health import ConnectorHealth
+from app.core_engine.connectors.modbus_decoder import BlockDecoder
+from app.core_engine.connectors.modbus_client import ModbusReadError, PersistentModbusClient
+from app.core_engine.connectors.modbus_read_planner import DEFAULT_MAX_GAP, ReadBlock, plan_reads
 from app.core_engine.models import DataSource
+from app.core_engine.poll_scheduler import PollScheduler
 from app.telemetry.schemas import SensorReadingCreate
 
 logger = logging.getLogger("app.core_engine.connector.modbus")
@@ -22,75 +31,133 @@ logger = logging.getLogger("app.core_engine.connector.modbus")
 class ModbusConnector:
     """Gestiona un ciclo de sondeo para un dispositivo Modbus TCP."""
 
-    def __init__(self, data_source: DataSource, data_callback: Callable[[List[SensorReadingCreate]], None]):
+    def __init__(
+        self,
+        data_source: DataSource,
+        data_callback: Callable[[List[SensorReadingCreate]], Awaitable[Any]],
+        scheduler: PollScheduler,
+    ):
         self.data_source = data_source
         self.data_callback = data_callback
+        self.scheduler = scheduler
+        self.health = ConnectorHealth()
         self.params = data_source.connection_params
-        self.client = ModbusTcpClient(self.params.get("host"), port=self.params.get("port", 502))
-        self._task = None
+        self.registers = self.params.get("registers", [])
+        self.read_plan: List[ReadBlock] = plan_reads(
+            self.registers,
+            default_slave=self.params.get("slave_id", 1),
+            max_gap=self.params.get("read_max_gap", DEFAULT_MAX_GAP),
+        )
+        self.decoders: Dict[ReadBlock, BlockDecoder] = {
+            block: BlockDecoder(block, self.registers) for block in self.read_plan
+        }
+        self.deadband = DeadbandFilter(self.registers, self.params.get("deadband"))
+        self.client = PersistentModbusClient(
+            self.params.get("host"),
+            port=self.params.get("port", 502),
+            timeout=self.params.get("timeout_seconds", 3.0),
+            name=data_source.name,
+        )
 
     async def start(self):
-        logger.info(f"Iniciando conector Modbus para: {self.data_source.name}")
-        self._task = asyncio.create_task(self._run())
+        if not self.registers:
+            logger.warning(f"No hay registros configurados para sondear en {self.data_source.name}. El conector no hará nada.")
+            return
+        logger.info(
+            f"Iniciando conector Modbus para: {self.data_source.name} "
+            f"({len(self.registers)} registros en {len(self.read_plan)} peticiones por ciclo)"
+        )
+        self.scheduler.schedule(
+            self.data_source.id,
+            self.params.get("polling_interval_seconds", 5),
+            self.poll_once,
+            name=self.data_source.name,
+        )
 
     async def stop(self):
         logger.info(f"Deteniendo conector Modbus para: {self.data_source.name}")
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
+        await self.scheduler.unschedule(self.data_source.id)
+        self.client.close()
         logger.info(f"Conector Modbus para {self.data_source.name} detenido.")
 
-    def _read_registers(self, registers: List[Dict[str, Any]]) -> List[SensorReadingCreate]:
-        """Función síncrona que se ejecuta en un hilo separado para leer los registros."""
-        readings = []
+    async def _read_block(self, block: ReadBlock) -> List[Tuple[ReadBlock, np.ndarray, float]]:
+        """Lee un bloque del plan y devuelve `(bloque, valores decodificados, timestamp epoch)`."""
         try:
-            self.client.connect()
-            for reg_config in registers:
-                address = reg_config["address"]
-                count = reg_config.get("count", 1)
-                # Usamos código de función 3 para leer registros "holding"
-                result = self.client.read_holding_registers(address, count, slave=self.params.get("slave_id", 1))
-                
-                if not result.isError():
-                    value = result.registers[0] # Asumimos que leemos un solo registro por ahora
-                    reading = SensorReadingCreate(
-                        asset_id=reg_config["asset_id"],
-                        timestamp=datetime.now(timezone.utc),
-                        metric_name=reg_config["metric_name"],
-                        value=float(value)
-                    )
-                    readings.append(reading)
-                else:
-                    logger.warning(f"Error leyendo registro Modbus en la dirección {address} para {self.data_source.name}")
-            return readings
-        finally:
-            self.client.close()
+            words = await self.client.read_block(block)
+        except ModbusReadError as e:
+            if not e.is_illegal_address or len(block.items) == 1:
+                raise
+            # El bloque contiene direcciones inexistentes: se divide hasta aislarlas (un bloque de
+            # un solo registro ya no se divide y su error se propaga, igual que el último error si
+            # no se pudo leer ninguna parte).
+            parts = block.split()
+            logger.warning(f"{e}; el bloque se divide en {len(parts)} peticiones para {self.data_source.name}")
+            self.read_plan = [p for b in self.read_plan for p in (parts if b is block else [b])]
+            self.decoders.update({part: BlockDecoder(part, self.registers) for part in parts})
+            results, last_error = [], e
+            for part in parts:
+                try:
+                    results.extend(await self._read_block(part))
+                except ModbusReadError as part_error:
+                    last_error = part_error
+                    logger.warning(f"{part_error} para {self.data_source.name}")
+            if not results:
+                raise last_error
+            return results
+        return [(block, self.decoders[block].decode(words), time.time())]
 
-    async def _run(self):
-        """El bucle principal que sondea los registros Modbus a intervalos."""
-        polling_interval = self.params.get("polling_interval_seconds", 5)
-        registers_to_read = self.params.get("registers", [])
+    async def _poll(self) -> List[SensorReadingCreate]:
+        """
+        Ejecuta un ciclo completo del plan de lectura y aplica la banda muerta al resultado.
+        Si no se pudo leer ningún bloque, propaga el último error (el ciclo cuenta como fallo).
+        """
+        await self.client.ensure_connected()
+        started = time.perf_counter()
+        results: List[Tuple[ReadBlock, np.ndarray, float]] = []
+        last_error: Optional[ModbusReadError] = None
+        for block in list(self.read_plan):
+            try:
+                results.extend(await self._read_block(block))
+            except ModbusReadError as e:
+                last_error = e
+                logger.warning(f"{e} para {self.data_source.name}")
+        metrics.set_gauge("modbus_requests_per_cycle", len(self.read_plan), source=self.data_source.name)
+        metrics.observe("modbus_poll_seconds", time.perf_counter() - started, source=self.data_source.name)
+        if not results:
+            if last_error is not None:
+                raise last_error
+            return []
 
-        if not registers_to_read:
-            logger.warning(f"No hay registros configurados para sondear en {self.data_source.name}. El conector no hará nada.")
-            return
+        tags = np.concatenate([np.fromiter((item.index for item in b.items), np.intp, len(b.items)) for b, _, _ in results])
+        values = np.concatenate([v for _, v, _ in results])
+        timestamps = np.concatenate([np.full(len(b.items), ts) for b, _, ts in results])
+        keep = self.deadband.apply(tags, values, timestamps)
+        dropped = int(keep.size - np.count_nonzero(keep))
+        if dropped:
+            metrics.inc("deadband_dropped_readings", dropped, source=self.data_source.name)
 
-        while True:
-            try:
-                # Ejecutar la lectura síncrona en un hilo separado para no bloquear el bucle de eventos
-                readings = await asyncio.to_thread(self._read_registers, registers_to_read)
-                
-                if readings:
-                    logger.debug(f"{len(readings)} lecturas recibidas de {self.data_source.name}")
-                    self.data_callback(readings)
-                
-                await asyncio.sleep(polling_interval)
-            except asyncio.CancelledError:
-                logger.info(f"La tarea del conector Modbus para {self.data_source.name} ha sido cancelada.")
-                break
-            except Exception as e:
-                logger.error(f"Error en el conector Modbus para {self.data_source.name}: {e}", exc_info=True)
-                await asyncio.sleep(polling_interval * 2) # Esperar más tiempo si hay un error
+        readings = []
+        for tag, value, ts in zip(tags[keep].tolist(), values[keep].tolist(), timestamps[keep].tolist()):
+            reg_config = self.registers[tag]
+            readings.append(
+                SensorReadingCreate(
+                    asset_id=reg_config["asset_id"],
+                    timestamp=datetime.fromtimestamp(ts, timezone.utc),
+                    metric_name=reg_config["metric_name"],
+                    value=value,
+                )
+            )
+        return readings
+
+    async def poll_once(self):
+        """Un ciclo de sondeo, invocado por el planificador."""
+        try:
+            readings = await self._poll()
+        except Exception as e:
+            self.health.record_failure(e)
+            raise
+        self.health.record_success()
+        if readings:
+            logger.debug(f"{len(readings)} lecturas recibidas de {self.data_source.name}")
+            # El callback solo encola: la persistencia ocurre en los workers de ingesta.
+            await self.data_callback(readings)
@@ -0,0 +1,132 @@
+# /app/core_engine/connectors/modbus_read_planner.py
+"""
+Planificador de lecturas Modbus.
+
+Agrupa los registros configurados en una fuente de datos en el menor número posible de
+peticiones de protocolo: los rangos contiguos (o separados por un hueco pequeño) del mismo
+esclavo y tipo de registro se fusionan en un único bloque de hasta 125 registros, que es el
+máximo de las funciones 3 y 4. Cada bloque conserva la posición de sus registros para poder
+repartir después la respuesta entre las lecturas.
+"""
+
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.core_engine.connectors.modbus_decoder import register_word_count
+
+MAX_REGISTERS_PER_REQUEST = 125  # Límite de Modbus para "Read Holding/Input Registers"
+DEFAULT_MAX_GAP = 16  # Registros no configurados que se leen de más antes de abrir otra petición
+
+HOLDING = "holding"
+INPUT = "input"
+REGISTER_TYPES = (HOLDING, INPUT)
+
+
+@dataclass(frozen=True)
+class PlannedRegister:
+    """Posición de un registro configurado dentro de un bloque de lectura."""
+
+    index: int  # Índice en la lista `connection_params.registers`
+    offset: int  # Desplazamiento (en palabras de 16 bits) desde el inicio del bloque
+    count: int  # Número de palabras que ocupa el registro
+
+
+@dataclass(frozen=True)
+class ReadBlock:
+    """Una petición Modbus: rango [start, start + count) de un esclavo y tipo de registro."""
+
+    slave: int
+    register_type: str
+    start: int
+    count: int
+    items: Tuple[PlannedRegister, ...]
+
+    def split_contiguous(self) -> List["ReadBlock"]:
+        """
+        Divide el bloque en sub-bloques sin huecos.
+
+        Se usa cuando el dispositivo rechaza un bloque fusionado porque alguna dirección
+        del hueco no existe (excepción "Illegal Data Address").
+        """
+        return _merge(
+            [(self.start + item.offset, item) for item in self.items],
+            slave=self.slave,
+            register_type=self.register_type,
+            max_gap=0,
+        )
+
+    def split(self) -> List["ReadBlock"]:
+        """
+        Sub-bloques a leer cuando el dispositivo rechaza este bloque por "Illegal Data Address":
+        los tramos contiguos o, si el bloque ya era contiguo, un bloque por registro (así la
+        dirección inexistente queda aislada en su propia petición).
+        """
+        parts = self.split_contiguous()
+        if len(parts) > 1:
+            return parts
+        return [
+            ReadBlock(self.slave, self.register_type, self.start + item.offset, item.count,
+                      (PlannedRegister(index=item.index, offset=0, count=item.count),))
+            for item in self.items
+        ]
+
+
+def _merge(
+    entries: Sequence[Tuple[int, PlannedRegister]], slave: int, register_type: str, max_gap: int
+) -> List[ReadBlock]:
+    """Fusiona entradas (dirección, registro) ordenadas por dirección en bloques de lectura."""
+    blocks: List[ReadBlock] = []
+    current: List[Tuple[int, PlannedRegister]] = []
+    start = end = 0
+
+    def _close():
+        if current:
+            items = tuple(
+                PlannedRegister(index=item.index, offset=address - start, count=item.count)
+                for address, item in current
+            )
+            blocks.append(ReadBlock(slave, register_type, start, end - start, items))
+
+    for address, item in sorted(entries, key=lambda e: e[0]):
+        item_end = address + item.count
+        if current and address - end <= max_gap and max(end, item_end) - start <= MAX_REGISTERS_PER_REQUEST:
+            end = max(end, item_end)
+            current.append((address, item))
+            continue
+        _close()
+        current = [(address, item)]
+        start, end = address, item_end
+    _close()
+    return blocks
+
+
+def plan_reads(
+    registers: Sequence[Dict[str, Any]], default_slave: int = 1, max_gap: int = DEFAULT_MAX_GAP
+) -> List[ReadBlock]:
+    """
+    Construye el plan de lectura para la lista `connection_params.registers`.
+
+    Cada registro admite `address`, `count` (por defecto, las palabras de su `data_type`),
+    `slave_id` (por defecto el de la fuente) y `register_type` (`holding` o `input`, por
+    defecto `holding`).
+    """
+    keyed: List[Tuple[Tuple[int, str], int, PlannedRegister]] = []
+    for index, config in enumerate(registers):
+        address = int(config["address"])
+        count = register_word_count(config)
+        register_type = config.get("register_type", HOLDING)
+        if register_type not in REGISTER_TYPES:
+            raise ValueError(f"Tipo de registro Modbus no soportado: '{register_type}'.")
+        if address < 0 or not 1 <= count <= MAX_REGISTERS_PER_REQUEST:
+            raise ValueError(f"Registro Modbus inválido (address={address}, count={count}).")
+        slave = int(config.get("slave_id", default_slave))
+        keyed.append(((slave, register_type), address, PlannedRegister(index=index, offset=0, count=count)))
+
+    keyed.sort(key=lambda k: k[0])
+    blocks: List[ReadBlock] = []
+    for (slave, register_type), group in groupby(keyed, key=lambda k: k[0]):
+        blocks.extend(
+            _merge([(address, item) for _, address, item in group], slave, register_type, max_gap)
+        )
+    return blocks
@@ -4,20 +4,35 @@ Conector específico para el protocolo OPC UA.
 
 Utiliza la librería asyncua para conectarse a servidores OPC UA, suscribirse
 a nodos (tags) y recibir actualizaciones de datos en tiempo real.
+
+Las notificaciones no se entregan una a una: se acumulan en un buffer que se vacía cuando
+alcanza `batch_max_rows` lecturas o cuando la más antigua supera `batch_max_delay_ms`,
+de modo que la ingesta recibe un lote (una inserción masiva) en lugar de una lectura por
+cambio de tag. Si la entrega de un lote falla, sus lecturas se conservan (hasta
+`_MAX_UNDELIVERED_BATCHES` lotes) y se reintentan por delante del siguiente.
 """
 
 import asyncio
 import logging
-from typing import Callable, Any, List, Dict
+from typing import Awaitable, Callable, Any, List, Dict
 from datetime import datetime, timezone
 
 from asyncua import Client, Node, ua
 
+import numpy as np
+
+from app.core.metrics import metrics
+from app.core_engine.connectors.deadband import DeadbandFilter
+from app.core_engine.connectors.health import ConnectorHealth
 from app.core_engine.models import DataSource
 from app.telemetry.schemas import SensorReadingCreate
 
 logger = logging.getLogger("app.core_engine.connector.opcua")
 
+DEFAULT_BATCH_MAX_ROWS = 1000
+DEFAULT_BATCH_MAX_DELAY_MS = 200
+_MAX_UNDELIVERED_BATCHES = 10  # Lecturas no entregadas que se conservan, en lotes de `batch_max_rows`
+
 
 class OpcUaDataChangeHandler:
     """Clase para manejar los callbacks de cambio de datos de la suscripción OPC UA."""
@@ -25,36 +40,105 @@ class OpcUaDataChangeHandler:
         self.connector = connector
 
 
-    def datachange_notification(self, node: Node, val: Any, data: ua.DataValue):
+    async def datachange_notification(self, node: Node, val: Any, data: ua.DataValue):
         """Callback que se ejecuta cuando la librería OPC UA detecta un cambio de valor."""
 
-        self.connector.process_data_change(node, val, data)
+        await self.connector.process_data_change(node, val, data)
 
 
 class OpcUaConnector:
     """Gestiona una conexión persistente con un servidor OPC UA."""
 
-    def __init__(self, data_source: DataSource, data_callback: Callable[[List[SensorReadingCreate]], None]):
+    def __init__(self, data_source: DataSource, data_callback: Callable[[List[SensorReadingCreate]], Awaitable[Any]]):
         self.data_source = data_source
         self.data_callback = data_callback
-        self.client = Client(url=self.data_source.connection_params.get("url"))
+        params = self.data_source.connection_params
+        self.client = Client(url=params.get("url"))
         self.subscription = None
         self._task = None
-        self._node_map: Dict[str, Dict[str, Any]] = {}
+        self._flush_task = None
+        self.health = ConnectorHealth()
+        self._nodes: List[Dict[str, Any]] = params.get("nodes", [])
+        self._node_map: Dict[str, int] = {}
+        self.deadband = DeadbandFilter(self._nodes, params.get("deadband"))
+
+        self.batch_max_rows = params.get("batch_max_rows", DEFAULT_BATCH_MAX_ROWS)
+        self.batch_max_delay = params.get("batch_max_delay_ms", DEFAULT_BATCH_MAX_DELAY_MS) / 1000
+        self._buffer: List[SensorReadingCreate] = []
+        self._buffer_tags: List[int] = []
+        self._undelivered: List[SensorReadingCreate] = []  # Ya filtradas por la banda muerta
+        self._pending_since = 0.0  # Instante (monotónico) de la lectura pendiente más antigua
+        self._wake = asyncio.Event()
 
     async def start(self):
         logger.info(f"Iniciando conector OPC UA para: {self.data_source.name}")
         self._task = asyncio.create_task(self._run())
+        self._flush_task = asyncio.create_task(self._flush_loop())
 
     async def stop(self):
         logger.info(f"Deteniendo conector OPC UA para: {self.data_source.name}")
-        if self._task:
-            self._task.cancel()
+        for task in (self._task, self._flush_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        # Lo que quedara en el buffer se entrega antes de terminar.
+        await self._flush()
+        logger.info(f"Conector OPC UA para {self.data_source.name} detenido.")
+
+    def _has_pending(self) -> bool:
+        return bool(self._buffer or self._undelivered)
+
+    async def _flush(self):
+        batch, self._buffer = self._buffer, []
+        tags, self._buffer_tags = self._buffer_tags, []
+        if batch and self.deadband.enabled:
+            keep = self.deadband.apply(
+                np.array(tags, dtype=np.intp),
+                np.array([r.value for r in batch], dtype=np.float64),
+                np.array([r.timestamp.timestamp() for r in batch], dtype=np.float64),
+            )
+            dropped = len(batch) - int(np.count_nonzero(keep))
+            if dropped:
+                metrics.inc("deadband_dropped_readings", dropped, source=self.data_source.name)
+                batch = [r for r, k in zip(batch, keep.tolist()) if k]
+        batch, self._undelivered = self._undelivered + batch, []
+        if not batch:
+            return
+        metrics.observe("opcua_batch_rows", len(batch), source=self.data_source.name)
+        try:
+            await self.data_callback(batch)
+        except Exception as e:
+            # Se reintentan en el próximo lote; si la entrega sigue fallando se descartan las más antiguas.
+            limit = self.batch_max_rows * _MAX_UNDELIVERED_BATCHES
+            self._undelivered = batch[-limit:]
+            dropped = len(batch) - len(self._undelivered)
+            if dropped:
+                metrics.inc("opcua_dropped_readings", dropped, source=self.data_source.name)
+            self._pending_since = asyncio.get_running_loop().time()
+            logger.error(
+                f"Error entregando {len(batch)} lecturas OPC UA de {self.data_source.name} "
+                f"({dropped} descartadas, el resto se reintenta): {e}", exc_info=True,
+            )
+
+    async def _flush_loop(self):
+        """Vacía el buffer al llegar a `batch_max_rows` o cuando lo pendiente cumple `batch_max_delay`."""
+        loop = asyncio.get_running_loop()
+        while True:
+            timeout = None
+            if self._has_pending():
+                timeout = max(0.0, self._pending_since + self.batch_max_delay - loop.time())
             try:
-                await self._task
-            except asyncio.CancelledError:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
                 pass
-        logger.info(f"Conector OPC UA para {self.data_source.name} detenido.")
+            self._wake.clear()
+            if len(self._buffer) >= self.batch_max_rows or (
+                self._has_pending() and loop.time() - self._pending_since >= self.batch_max_delay
+            ):
+                await self._flush()
 
     async def _run(self):
         handler = OpcUaDataChangeHandler(self)
@@ -63,49 +147,65 @@ class OpcUaConnector:
                 logger.info(f"Conectado a OPC UA server: {self.data_source.name}")
                 self.subscription = await self.client.create_subscription(500, handler)
                 
-                nodes_to_subscribe = self.data_source.connection_params.get("nodes", [])
                 node_objects = []
-                for node_config in nodes_to_subscribe:
+                for index, node_config in enumerate(self._nodes):
                     node = self.client.get_node(node_config["node_id"])
                     node_objects.append(node)
-                    self._node_map[node.nodeid.to_string()] = node_config
+                    self._node_map[node.nodeid.to_string()] = index
 
                 if node_objects:
                     await self.subscription.subscribe_data_change(node_objects)
                     logger.info(f"Suscrito a {len(node_objects)} nodos para {self.data_source.name}.")
-                
+                self.health.record_success()
+
+                # La sesión se mantiene viva; si el servidor cae, asyncua cierra el cliente y
+                # check_connection() lanza la excepción que marca el conector como fallido.
                 while True:
-                    await asyncio.sleep(3600)
+                    await asyncio.sleep(5)
+                    await self.client.check_connection()
 
         except asyncio.CancelledError:
             logger.info(f"La tarea del conector OPC UA para {self.data_source.name} ha sido cancelada.")
         except Exception as e:
             logger.error(f"Error en el conector OPC UA para {self.data_source.name}: {e}", exc_info=True)
+            # El supervisor reinicia el conector con backoff.
+            self.health.record_failure(e, fatal=True)
         finally:
             logger.info(f"Cerrando conexión OPC UA para: {self.data_source.name}")
 
 
     # --- CORRECCIÓN: La pista de tipo correcta es solo 'Node' ---
 
-    def process_data_change(self, node: Node, val: Any, data: ua.DataValue):
+    async def process_data_change(self, node: Node, val: Any, data: ua.DataValue):
         try:
             node_id_str = node.nodeid.to_string()
-            node_config = self._node_map.get(node_id_str)
+            index = self._node_map.get(node_id_str)
 
-            if not node_config:
+            if index is None:
                 logger.warning(f"Dato recibido de un nodo no mapeado: {node_id_str}")
                 return
+            node_config = self._nodes[index]
 
             logger.debug(f"Dato recibido de {self.data_source.name} - Nodo: {node_id_str}, Valor: {val}")
 
+            # asyncua entrega SourceTimestamp como datetime UTC sin zona horaria.
+            timestamp = data.SourceTimestamp
+            timestamp = timestamp.replace(tzinfo=timezone.utc) if timestamp else datetime.now(timezone.utc)
             reading = SensorReadingCreate(
                 asset_id=node_config["asset_id"],
-                timestamp=data.SourceTimestamp or datetime.now(timezone.utc),
+                timestamp=timestamp,
                 metric_name=node_config["metric_name"],
                 value=float(val)
             )
 
-            self.data_callback([reading])
+            if not self._has_pending():
+                # Empieza a contar la antigüedad del lote: el bucle de vaciado fija su plazo.
+                self._pending_since = asyncio.get_running_loop().time()
+                self._wake.set()
+            self._buffer.append(reading)
+            self._buffer_tags.append(index)
+            if len(self._buffer) >= self.batch_max_rows:
+                self._wake.set()
 
         except Exception as e:
             logger.error(f"Error procesando la notificación de cambio de dato: {e}", exc_info=True)
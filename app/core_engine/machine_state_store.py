@@ -0,0 +1,83 @@
+# /app/core_engine/machine_state_store.py
+"""
+Estado actual de las máquinas compartido en Redis.
+
+El `StateDetector` de cada proceso de ingesta publica aquí los cambios de estado una vez
+confirmados en la BD, y la API (cualquiera de sus workers) los lee sin depender de qué proceso
+detectó el cambio. Un hash por tenant, `machine_state:<tenant_id>`, con un campo por activo:
+
+    {"state": "RUNNING", "since": "2025-01-01T08:00:00.000000+00:00"}
+
+`since` es el inicio del estado vigente (el instante del último cambio), en UTC. Una escritura
+con un `since` anterior al guardado se descarta: los lotes de ingesta pueden confirmarse en otro
+orden. El estado de todos los activos de un tenant se lee con un solo HGETALL.
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import redis
+
+KEY_PREFIX = "machine_state:"
+
+# (tenant_id, asset_id, estado, inicio del estado)
+StateChange = Tuple[UUID, UUID, str, datetime]
+
+# ARGV: only_missing, y por activo (campo, since, valor). Escribe si no hay estado o si es más
+# reciente que el guardado (ISO 8601 en UTC con microsegundos: se compara como texto).
+_PUBLISH_SCRIPT = """
+local written = 0
+for i = 2, #ARGV, 3 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    local write = not current
+    if current and ARGV[1] == '0' then
+        write = cjson.decode(current)['since'] <= ARGV[i + 1]
+    end
+    if write then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+        written = written + 1
+    end
+end
+return written
+"""
+
+
+class MachineStateStore:
+    """Lectura y escritura del estado actual de las máquinas en Redis."""
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+        self._publish = redis_client.register_script(_PUBLISH_SCRIPT)
+
+    @staticmethod
+    def _key(tenant_id: UUID) -> str:
+        return f"{KEY_PREFIX}{tenant_id}"
+
+    def publish(self, changes: Iterable[StateChange], only_missing: bool = False):
+        """
+        Escribe el estado de varios activos en una sola ida y vuelta.
+
+        Con `only_missing` no se sobrescriben los activos que ya tienen estado (precarga desde
+        la BD al arrancar: otro proceso puede haber publicado ya un cambio más reciente).
+        """
+        by_tenant: Dict[UUID, List[str]] = {}
+        for tenant_id, asset_id, state, since in changes:
+            since_iso = since.astimezone(timezone.utc).isoformat(timespec="microseconds")
+            by_tenant.setdefault(tenant_id, []).extend(
+                [str(asset_id), since_iso, json.dumps({"state": state, "since": since_iso})]
+            )
+        if not by_tenant:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for tenant_id, args in by_tenant.items():
+            self._publish(keys=[self._key(tenant_id)], args=["1" if only_missing else "0", *args], client=pipe)
+        pipe.execute()
+
+    def get(self, tenant_id: UUID, asset_id: UUID) -> Optional[Dict]:
+        raw = self.redis.hget(self._key(tenant_id), str(asset_id))
+        return json.loads(raw) if raw else None
+
+    def get_all(self, tenant_id: UUID) -> Dict[UUID, Dict]:
+        return {UUID(asset_id): json.loads(raw) for asset_id, raw in self.redis.hgetall(self._key(tenant_id)).items()}
@@ -5,3 +5,4 @@ Expone los modelos del módulo Core Engine.
 
 from .data_source import DataSource
 from .machine_state_history import MachineStateHistory
+from .state_rule import StateRule
@@ -1,6 +1,6 @@
 # /app/core_engine/models/machine_state_history.py
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, String, DateTime, Float, ForeignKey, Index, func, text
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.db.base_class import Base
@@ -12,3 +12,16 @@ class MachineStateHistory(Base):
     asset_id = Column(UUID(as_uuid=True), ForeignKey("assets.id"), nullable=False, index=True)
     state = Column(String, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # Intervalo del estado: `end_time` es NULL mientras el estado sigue vigente.
+    start_time = Column(DateTime(timezone=True), nullable=False)
+    end_time = Column(DateTime(timezone=True), nullable=True)
+    duration_seconds = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_machine_state_history_asset_id_start_time", "asset_id", "start_time"),
+        Index(
+            "ix_machine_state_history_open_interval",
+            "asset_id",
+            postgresql_where=text("end_time IS NULL"),
+        ),
+    )
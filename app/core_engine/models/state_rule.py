@@ -0,0 +1,33 @@
+# /app/core_engine/models/state_rule.py
+import uuid
+from sqlalchemy import Column, String, Boolean, Float, ForeignKey, TIMESTAMP, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+from app.db.base_class import Base
+
+class StateRule(Base):
+    """
+    Regla de detección de estado de máquina (ver `app/core_engine/state_rules.py`).
+
+    Alcance: un activo (`asset_id`), un tipo de activo (`asset_type_id`) o, sin ninguno de
+    los dos, todo el tenant. Prevalece la regla más específica.
+    """
+    __tablename__ = "state_rules"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    # Aislamiento por Tenant
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False, index=True)
+
+    asset_id = Column(UUID(as_uuid=True), ForeignKey("assets.id"), nullable=True, index=True)
+    asset_type_id = Column(UUID(as_uuid=True), ForeignKey("asset_types.id"), nullable=True, index=True)
+
+    metric_name = Column(String, nullable=False)
+    default_state = Column(String, nullable=False, default="STOPPED")
+    # Bandas por estado en orden de prioridad: [{"state": "RUNNING", "min": 10, "max": 1500}, ...]
+    states = Column(JSONB, nullable=False)
+    hysteresis = Column(Float, nullable=False, default=0.0)
+    min_dwell_seconds = Column(Float, nullable=False, default=0.0)
+
+    is_active = Column(Boolean, default=True, index=True)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
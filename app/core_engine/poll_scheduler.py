@@ -0,0 +1,178 @@
+# /app/core_engine/poll_scheduler.py
+"""
+Planificador central de sondeos del Core Engine.
+
+En lugar de una tarea con `asyncio.sleep()` por conector, una única tarea recorre una rueda
+de tiempo (hashed timing wheel) con resolución `tick` y lanza los sondeos cuyo plazo vence.
+
+- Plazos sin deriva: cada fuente se planifica en `origen + k * intervalo`, no en
+  "fin del sondeo anterior + intervalo", así que la duración del sondeo no desplaza el ciclo.
+- Concurrencia de E/S acotada: un semáforo limita cuántos sondeos están en vuelo a la vez.
+- Plazos perdidos: si un sondeo sigue en vuelo cuando vence el siguiente, o el planificador
+  se retrasa más de un intervalo, el ciclo se salta y se cuenta en `poll_missed_deadlines`.
+- Las primeras ejecuciones se reparten aleatoriamente dentro del intervalo para que miles de
+  fuentes con el mismo periodo no se disparen en el mismo instante.
+"""
+
+import asyncio
+import logging
+import math
+import random
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger("app.core_engine.poll_scheduler")
+
+PollFunction = Callable[[], Awaitable[None]]
+
+
+class _Schedule:
+    __slots__ = ("key", "name", "interval", "poll", "deadline", "task", "cancelled")
+
+    def __init__(self, key: Hashable, name: str, interval: float, poll: PollFunction, deadline: float):
+        self.key = key
+        self.name = name
+        self.interval = interval
+        self.poll = poll
+        self.deadline = deadline
+        self.task: Optional[asyncio.Task] = None
+        self.cancelled = False
+
+
+class PollScheduler:
+    """Rueda de tiempo que dispara los sondeos de todas las fuentes de datos."""
+
+    def __init__(self, max_concurrent_polls: int, tick: float = 0.02, wheel_size: int = 512):
+        self.tick = tick
+        self.wheel_size = wheel_size
+        self._io_limit = asyncio.Semaphore(max_concurrent_polls)
+        self._slots: List[Set[_Schedule]] = [set() for _ in range(wheel_size)]
+        self._schedules: Dict[Hashable, _Schedule] = {}
+        self._origin = 0.0
+        self._tick_index = 0
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        self._origin = loop.time()
+        self._tick_index = 0
+        # Las fuentes registradas antes de arrancar se recolocan respecto al nuevo origen.
+        for slot in self._slots:
+            slot.clear()
+        for schedule in self._schedules.values():
+            schedule.deadline = max(schedule.deadline, self._origin)
+            self._insert(schedule)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Planificador de sondeos iniciado (tick={self.tick * 1000:.0f} ms, {len(self._schedules)} fuentes).")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for key in list(self._schedules):
+            await self.unschedule(key)
+        logger.info("Planificador de sondeos detenido.")
+
+    def schedule(self, key: Hashable, interval: float, poll: PollFunction, name: str = ""):
+        """Registra (o reemplaza) el sondeo periódico de una fuente."""
+        if interval <= 0:
+            raise ValueError("El intervalo de sondeo debe ser positivo.")
+        previous = self._schedules.pop(key, None)
+        if previous is not None:
+            previous.cancelled = True
+        loop = asyncio.get_running_loop()
+        first_deadline = loop.time() + random.uniform(0, interval)
+        schedule = _Schedule(key, name or str(key), interval, poll, first_deadline)
+        self._schedules[key] = schedule
+        if self.running:
+            self._insert(schedule)
+        metrics.set_gauge("poll_scheduler_sources", len(self._schedules))
+
+    async def unschedule(self, key: Hashable):
+        """Elimina el sondeo de una fuente y espera a que termine el que esté en vuelo."""
+        schedule = self._schedules.pop(key, None)
+        if schedule is None:
+            return
+        schedule.cancelled = True
+        metrics.set_gauge("poll_scheduler_sources", len(self._schedules))
+        if schedule.task is not None and not schedule.task.done():
+            schedule.task.cancel()
+            try:
+                await schedule.task
+            except asyncio.CancelledError:
+                pass
+
+    # --- Rueda de tiempo ---
+
+    def _insert(self, schedule: _Schedule):
+        tick = max(self._tick_index, math.ceil((schedule.deadline - self._origin) / self.tick))
+        self._slots[tick % self.wheel_size].add(schedule)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            next_tick_at = self._origin + self._tick_index * self.tick
+            delay = next_tick_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = loop.time()
+            # Si el bucle se retrasó, se procesan todos los ticks pendientes de una vez.
+            while self._origin + self._tick_index * self.tick <= now:
+                self._advance(self._origin + self._tick_index * self.tick, now)
+                self._tick_index += 1
+
+    def _advance(self, tick_time: float, now: float):
+        slot = self._slots[self._tick_index % self.wheel_size]
+        due = [s for s in slot if s.cancelled or s.deadline <= tick_time + 1e-9]
+        for schedule in due:
+            slot.discard(schedule)
+            if schedule.cancelled:
+                continue
+            self._fire(schedule, now)
+
+    def _fire(self, schedule: _Schedule, now: float):
+        deadline = schedule.deadline
+        if schedule.task is not None and not schedule.task.done():
+            # El sondeo anterior sigue en vuelo: este ciclo se pierde.
+            metrics.inc("poll_missed_deadlines", source=schedule.name)
+        else:
+            schedule.task = asyncio.create_task(self._execute(schedule, deadline))
+
+        schedule.deadline = deadline + schedule.interval
+        if schedule.deadline <= now:
+            skipped = math.floor((now - schedule.deadline) / schedule.interval) + 1
+            schedule.deadline += skipped * schedule.interval
+            metrics.inc("poll_missed_deadlines", skipped, source=schedule.name)
+        self._insert(schedule)
+
+    async def _execute(self, schedule: _Schedule, deadline: float):
+        async with self._io_limit:
+            loop = asyncio.get_running_loop()
+            metrics.observe("poll_start_delay_seconds", max(0.0, loop.time() - deadline), source=schedule.name)
+            self._in_flight += 1
+            metrics.set_gauge("poll_scheduler_in_flight", self._in_flight)
+            started = time.perf_counter()
+            try:
+                await schedule.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.inc("poll_errors", source=schedule.name)
+                logger.error(f"Error en el sondeo de {schedule.name}: {e}", exc_info=True)
+            finally:
+                self._in_flight -= 1
+                metrics.set_gauge("poll_scheduler_in_flight", self._in_flight)
+                metrics.observe("poll_seconds", time.perf_counter() - started, source=schedule.name)
@@ -2,10 +2,13 @@
 """
 Capa de Repositorio para el Core Engine.
 """
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 import uuid
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.assets.models.asset import Asset
 from app.core_engine import models, schemas
 
 class CoreEngineRepository:
@@ -50,3 +53,116 @@ class CoreEngineRepository:
         self.db.commit()
         self.db.refresh(db_obj)
         return db_obj
+
+    # --- Métodos para StateRule ---
+
+    def create_state_rule(self, rule_in: schemas.StateRuleCreate, tenant_id: uuid.UUID) -> models.StateRule:
+        db_obj = models.StateRule(**rule_in.model_dump(), tenant_id=tenant_id)
+        self.db.add(db_obj)
+        self.db.commit()
+        self.db.refresh(db_obj)
+        return db_obj
+
+    def get_state_rule(self, rule_id: uuid.UUID, tenant_id: uuid.UUID) -> Optional[models.StateRule]:
+        return self.db.query(models.StateRule).filter(
+            models.StateRule.id == rule_id,
+            models.StateRule.tenant_id == tenant_id
+        ).first()
+
+    def list_state_rules(self, tenant_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[models.StateRule]:
+        return self.db.query(models.StateRule).filter(
+            models.StateRule.tenant_id == tenant_id,
+            models.StateRule.is_active == True
+        ).offset(skip).limit(limit).all()
+
+    def update_state_rule(self, db_obj: models.StateRule, obj_in: schemas.StateRuleUpdate) -> models.StateRule:
+        update_data = obj_in.model_dump(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(db_obj, field, value)
+        self.db.add(db_obj)
+        self.db.commit()
+        self.db.refresh(db_obj)
+        return db_obj
+
+    def delete_state_rule(self, db_obj: models.StateRule) -> models.StateRule:
+        db_obj.is_active = False
+        self.db.add(db_obj)
+        self.db.commit()
+        self.db.refresh(db_obj)
+        return db_obj
+
+    def list_active_state_rules(self) -> List[models.StateRule]:
+        """Todas las reglas activas de todos los tenants (las carga la caché del detector)."""
+        return self.db.query(models.StateRule).filter(models.StateRule.is_active == True).all()
+
+    def get_asset_scopes(self, asset_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Tuple[uuid.UUID, uuid.UUID]]:
+        """Devuelve `{asset_id: (tenant_id, asset_type_id)}` de los activos indicados."""
+        rows = self.db.query(Asset.id, Asset.tenant_id, Asset.asset_type_id).filter(Asset.id.in_(asset_ids)).all()
+        return {row.id: (row.tenant_id, row.asset_type_id) for row in rows}
+
+    # --- Métodos para MachineStateHistory ---
+
+    def get_open_state_intervals(self) -> List:
+        """
+        Intervalo abierto (el más reciente) de cada activo:
+        `(id, asset_id, tenant_id, state, start_time)`.
+        """
+        return self.db.execute(
+            text(
+                """
+                SELECT DISTINCT ON (h.asset_id) h.id, h.asset_id, a.tenant_id, h.state, h.start_time
+                FROM machine_state_history h
+                JOIN assets a ON a.id = h.asset_id
+                WHERE h.end_time IS NULL
+                ORDER BY h.asset_id, h.start_time DESC
+                """
+            )
+        ).all()
+
+    def record_state_transitions(
+        self,
+        close_ids: List[uuid.UUID],
+        close_times: List[datetime],
+        close_durations: List[float],
+        ids: List[uuid.UUID],
+        asset_ids: List[uuid.UUID],
+        states: List[str],
+        start_times: List[datetime],
+        end_times: List[Optional[datetime]],
+    ) -> None:
+        """
+        Cierra por clave primaria los intervalos `close_ids` e inserta los nuevos intervalos en
+        una sola sentencia. No confirma la transacción.
+        """
+        self.db.execute(
+            text(
+                """
+                WITH closed AS (
+                    UPDATE machine_state_history h
+                    SET end_time = c.end_time, duration_seconds = c.duration_seconds
+                    FROM unnest(
+                        CAST(:close_ids AS uuid[]), CAST(:close_times AS timestamptz[]),
+                        CAST(:close_durations AS float8[])
+                    ) AS c(id, end_time, duration_seconds)
+                    WHERE h.id = c.id AND h.end_time IS NULL
+                )
+                INSERT INTO machine_state_history (id, asset_id, state, start_time, end_time, duration_seconds)
+                SELECT n.id, n.asset_id, n.state, n.start_time, n.end_time,
+                       EXTRACT(EPOCH FROM n.end_time - n.start_time)
+                FROM unnest(
+                    CAST(:ids AS uuid[]), CAST(:asset_ids AS uuid[]), CAST(:states AS varchar[]),
+                    CAST(:start_times AS timestamptz[]), CAST(:end_times AS timestamptz[])
+                ) AS n(id, asset_id, state, start_time, end_time)
+                """
+            ),
+            {
+                "close_ids": close_ids,
+                "close_times": close_times,
+                "close_durations": close_durations,
+                "ids": ids,
+                "asset_ids": asset_ids,
+                "states": states,
+                "start_times": start_times,
+                "end_times": end_times,
+            },
+        )
@@ -0,0 +1,138 @@
+# /app/core_engine/runner.py
+"""
+Runner del Core Engine: ejecuta los conectores fuera del proceso de la API.
+
+    python -m app.core_engine.runner --workers 4
+
+Lanza N procesos; cada uno es un miembro del grupo del Core Engine con su propio bucle de
+eventos, planificador de sondeos, cola de ingesta y spool en disco. Las fuentes de datos se
+reparten entre los procesos de todas las máquinas con hashing consistente y leases en Redis
+(ver `sharding.py`), así que se puede escalar en horizontal añadiendo procesos o réplicas.
+
+El proceso padre vigila a los hijos y relanza los que terminan de forma inesperada. Para que
+la API no ejecute también los conectores hay que configurar `CORE_ENGINE_RUN_IN_API=false`.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.core_engine.runner")
+
+
+async def run_worker(worker_id: str, spool_path: str):
+    """Ejecuta un miembro del grupo del Core Engine hasta recibir SIGTERM o SIGINT."""
+    from app.core.event_broker import EventBroker
+    from app.core.redis import get_redis_client
+    from app.core_engine.service import DATA_SOURCE_EVENTS_CHANNEL, CoreEngineService
+    from app.core_engine.sharding import MEMBERSHIP_CHANNEL, ShardCoordinator
+    from app.core_engine.supervisor import ConnectorSupervisor
+    from app.telemetry.pipeline import create_ingestion_pipeline
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    redis_client = get_redis_client()
+    event_broker = EventBroker(redis_client)
+    ingestion_queue, telemetry_spool = create_ingestion_pipeline(spool_path, event_broker)
+    core_engine_service = CoreEngineService(
+        db=None, telemetry_service=None, audit_service=None, ingestion_queue=ingestion_queue
+    )
+    coordinator = ShardCoordinator(
+        redis_client,
+        worker_id,
+        lease_ttl=settings.CORE_ENGINE_LEASE_TTL_SECONDS,
+        member_ttl=settings.CORE_ENGINE_MEMBER_TTL_SECONDS,
+    )
+    supervisor = ConnectorSupervisor(
+        core_engine_service,
+        reconcile_interval=settings.CORE_ENGINE_RECONCILE_INTERVAL_SECONDS,
+        failed_after_errors=settings.CORE_ENGINE_FAILED_AFTER_ERRORS,
+        backoff_max=settings.CORE_ENGINE_RESTART_BACKOFF_MAX_SECONDS,
+        max_concurrent_starts=settings.CORE_ENGINE_MAX_CONCURRENT_STARTS,
+        start_timeout=settings.CORE_ENGINE_START_TIMEOUT_SECONDS,
+        ownership=coordinator.ownership,
+        on_reconciled=coordinator.after_reconcile,
+    )
+    # Los cambios de miembros también despiertan la reconciliación (rebalanceo inmediato).
+    supervisor.subscribe(event_broker, channels=(DATA_SOURCE_EVENTS_CHANNEL, MEMBERSHIP_CHANNEL))
+    coordinator.on_lease_lost = supervisor.request_reconcile
+
+    event_broker.start_listening()
+    await ingestion_queue.start()
+    await coordinator.start()
+    await supervisor.start()
+    logger.info(f"Proceso del Core Engine {worker_id} iniciado.")
+
+    await stop.wait()
+
+    logger.info(f"Deteniendo el proceso del Core Engine {worker_id}...")
+    await supervisor.stop()
+    await coordinator.leave()
+    await ingestion_queue.stop()
+    if telemetry_spool is not None:
+        telemetry_spool.close()
+
+
+def _worker_main(worker_id: str, spool_path: str):
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [{worker_id}] %(name)s %(levelname)s %(message)s")
+    asyncio.run(run_worker(worker_id, spool_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runner de conectores del Core Engine.")
+    parser.add_argument("--workers", type=int, default=settings.CORE_ENGINE_RUNNER_WORKERS)
+    parser.add_argument("--worker-prefix", default=socket.gethostname(), help="Prefijo del identificador de cada proceso.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    # `spawn`: cada hijo crea desde cero sus conexiones (Redis, pool de BD) y su bucle de eventos.
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def _spawn(index: int):
+        worker_id = f"{args.worker_prefix}:{index}"
+        # Las réplicas comparten el volumen del spool: la ruta incluye el prefijo (hostname).
+        spool_path = os.path.join(settings.TELEMETRY_SPOOL_PATH, f"core-engine-{args.worker_prefix}-{index}")
+        process = context.Process(target=_worker_main, args=(worker_id, spool_path), name=worker_id)
+        process.start()
+        return process
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    processes = {index: _spawn(index) for index in range(args.workers)}
+    logger.info(f"Runner del Core Engine iniciado con {args.workers} procesos.")
+
+    while not stopping:
+        time.sleep(1)
+        for index, process in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                logger.error(f"El proceso {process.name} terminó (código {process.exitcode}); se relanza.")
+                processes[index] = _spawn(index)
+
+    logger.info("Deteniendo los procesos del Core Engine...")
+    for process in processes.values():
+        if process.is_alive():
+            process.terminate()  # SIGTERM: cada proceso detiene sus conectores y libera sus leases
+    for process in processes.values():
+        process.join(timeout=30)
+        if process.is_alive():
+            process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@
 Esquemas Pydantic para el Core Engine.
 """
 import uuid
-from typing import Optional, Dict, Any
+from datetime import datetime
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field
 
 # --- Esquemas para DataSource ---
@@ -29,3 +30,60 @@ class DataSourceRead(DataSourceBase):
 
     class Config:
         from_attributes = True
+
+
+# --- Esquemas para el estado de los conectores ---
+
+class ConnectorStatusRead(BaseModel):
+    data_source_id: uuid.UUID
+    name: str
+    protocol: str
+    state: str = Field(..., example="RUNNING")
+    since: datetime
+    last_success_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    consecutive_failures: int = 0
+    restarts: int = 0
+    next_retry_at: Optional[datetime] = None
+    start_seconds: Optional[float] = None  # Duración del último arranque del conector
+    worker_id: Optional[str] = None  # Proceso del runner que lo ejecuta (None si corre en la API)
+
+    class Config:
+        from_attributes = True
+
+
+# --- Esquemas para las reglas de estado de máquina ---
+
+class StateBandSchema(BaseModel):
+    state: str = Field(..., example="RUNNING")
+    min: Optional[float] = Field(None, example=10.0, description="Límite inferior (incluido). Sin límite si es nulo.")
+    max: Optional[float] = Field(None, example=1500.0, description="Límite superior (excluido). Sin límite si es nulo.")
+
+class StateRuleBase(BaseModel):
+    asset_id: Optional[uuid.UUID] = Field(None, description="Regla de un activo concreto.")
+    asset_type_id: Optional[uuid.UUID] = Field(None, description="Regla de un tipo de activo.")
+    metric_name: str = Field(..., example="process_speed")
+    default_state: str = Field("STOPPED", example="STOPPED")
+    states: List[StateBandSchema] = Field(..., description="Bandas por estado, en orden de prioridad.")
+    hysteresis: float = Field(0.0, ge=0, description="Margen para abandonar el estado actual.")
+    min_dwell_seconds: float = Field(0.0, ge=0, description="Permanencia mínima antes de confirmar un estado.")
+    is_active: bool = True
+
+class StateRuleCreate(StateRuleBase):
+    pass
+
+class StateRuleUpdate(BaseModel):
+    metric_name: Optional[str] = None
+    default_state: Optional[str] = None
+    states: Optional[List[StateBandSchema]] = None
+    hysteresis: Optional[float] = Field(None, ge=0)
+    min_dwell_seconds: Optional[float] = Field(None, ge=0)
+    is_active: Optional[bool] = None
+
+class StateRuleRead(StateRuleBase):
+    id: uuid.UUID
+    tenant_id: uuid.UUID
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
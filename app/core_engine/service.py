@@ -2,31 +2,67 @@
 """
 Capa de Servicio para el Core Engine.
 """
+import asyncio
+import functools
 import logging
 import uuid
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
 
 from sqlalchemy.orm import Session
 
 from app.core_engine import models, schemas
 from app.core_engine.repository import CoreEngineRepository
 from app.core_engine.connectors.modbus_connector import ModbusConnector
+from app.core_engine.connectors.opcua_connector import OpcUaConnector
+from app.core_engine.poll_scheduler import PollScheduler
+from app.core_engine.state_rules import CompiledStateRule
 from app.telemetry.service import TelemetryService
-from app.core.exceptions import NotFoundException, ConflictException
+from app.telemetry.schemas import SensorReadingCreate
+from app.telemetry.columnar import ColumnarReadings
+from app.telemetry.ingestion_queue import TelemetryIngestionQueue
+from app.core.config import settings
+from app.core.database import session_scope
+from app.core.event_broker import EventBroker
+from app.core.exceptions import NotFoundException, ConflictException, ValidationException
 from app.auditing.service import AuditService
 from app.identity.models import User
 
 logger = logging.getLogger("app.core_engine.service")
 
+# Canal del Event Broker en el que se anuncian los cambios de fuentes de datos (recarga en caliente).
+DATA_SOURCE_EVENTS_CHANNEL = "core_engine.data_sources"
+STATE_RULES_EVENTS_CHANNEL = "core_engine.state_rules"
+
 class CoreEngineService:
-    """Servicio de negocio para el Core Engine, gestionando DataSources y conectores."""
+    """
+    Servicio de negocio para el Core Engine, gestionando DataSources y conectores.
+
+    La instancia de larga vida creada en el `lifespan` no recibe sesión (`db=None`): cada
+    tarea de background (ingesta de respaldo) abre la suya con `session_scope()`, y qué
+    conectores deben estar activos lo decide el `ConnectorSupervisor`. Las instancias por
+    request sí reciben la sesión de la petición.
+    """
 
-    def __init__(self, db: Session, telemetry_service: TelemetryService, audit_service: AuditService):
+    def __init__(
+        self,
+        db: Optional[Session],
+        telemetry_service: Optional[TelemetryService],
+        audit_service: Optional[AuditService],
+        ingestion_queue: Optional[TelemetryIngestionQueue] = None,
+        poll_scheduler: Optional[PollScheduler] = None,
+        event_broker: Optional[EventBroker] = None,
+    ):
         self.db = db
         self.telemetry_service = telemetry_service
         self.audit_service = audit_service
+        self.ingestion_queue = ingestion_queue
+        self.event_broker = event_broker
+        self.poll_scheduler = poll_scheduler or PollScheduler(
+            max_concurrent_polls=settings.CORE_ENGINE_MAX_CONCURRENT_POLLS,
+            tick=settings.CORE_ENGINE_SCHEDULER_TICK_MS / 1000,
+        )
         self.core_engine_repo = CoreEngineRepository(self.db)
-        self.active_connectors: Dict[uuid.UUID, ModbusConnector] = {}
+        self.active_connectors: Dict[uuid.UUID, Union[ModbusConnector, OpcUaConnector]] = {}
 
     def create_data_source(self, ds_in: schemas.DataSourceCreate, tenant_id: uuid.UUID, user: User) -> models.DataSource:
         # Asumiendo que el repo tiene este método
@@ -36,6 +72,7 @@ class CoreEngineService:
         
         new_ds = self.core_engine_repo.create_data_source(ds_in, tenant_id)
         self.audit_service.log_operation(user, "CREATE_DATA_SOURCE", new_ds)
+        self._publish_change(new_ds, "created")
         return new_ds
 
     def get_data_source(self, ds_id: uuid.UUID, tenant_id: uuid.UUID) -> models.DataSource:
@@ -51,22 +88,117 @@ class CoreEngineService:
         db_ds = self.get_data_source(ds_id, tenant_id)
         updated_ds = self.core_engine_repo.update_data_source(db_ds, ds_in)
         self.audit_service.log_operation(user, "UPDATE_DATA_SOURCE", updated_ds, details=ds_in.model_dump(exclude_unset=True))
+        self._publish_change(updated_ds, "updated")
         return updated_ds
 
     def delete_data_source(self, ds_id: uuid.UUID, tenant_id: uuid.UUID, user: User) -> models.DataSource:
         db_ds = self.get_data_source(ds_id, tenant_id)
         deleted_ds = self.core_engine_repo.delete_data_source(db_ds)
         self.audit_service.log_operation(user, "DELETE_DATA_SOURCE", deleted_ds)
+        self._publish_change(deleted_ds, "deleted")
         return deleted_ds
 
+    def _publish_change(self, data_source: models.DataSource, action: str):
+        """Avisa al supervisor de conectores para que aplique el cambio sin esperar a su ciclo."""
+        if self.event_broker is None:
+            return
+        try:
+            self.event_broker.publish(
+                DATA_SOURCE_EVENTS_CHANNEL, {"data_source_id": str(data_source.id), "action": action}
+            )
+        except Exception as e:
+            # El cambio ya está confirmado; el supervisor lo recogerá en su reconciliación periódica.
+            logger.warning(f"No se pudo publicar el cambio de la fuente {data_source.id}: {e}")
+
+    # --- Reglas de estado de máquina ---
+
+    @staticmethod
+    def _validate_state_rule(rule: Dict):
+        if rule.get("asset_id") and rule.get("asset_type_id"):
+            raise ValidationException("Una regla de estado aplica a un activo o a un tipo de activo, no a ambos.")
+        try:
+            CompiledStateRule.from_config(rule)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValidationException(f"Regla de estado inválida: {e}")
+
+    def create_state_rule(self, rule_in: schemas.StateRuleCreate, tenant_id: uuid.UUID, user: User) -> models.StateRule:
+        self._validate_state_rule(rule_in.model_dump())
+        new_rule = self.core_engine_repo.create_state_rule(rule_in, tenant_id)
+        self.audit_service.log_operation(user, "CREATE_STATE_RULE", new_rule)
+        self._publish_state_rules_change(new_rule, "created")
+        return new_rule
+
+    def get_state_rule(self, rule_id: uuid.UUID, tenant_id: uuid.UUID) -> models.StateRule:
+        db_rule = self.core_engine_repo.get_state_rule(rule_id, tenant_id)
+        if not db_rule:
+            raise NotFoundException("Regla de estado no encontrada.")
+        return db_rule
+
+    def list_state_rules(self, tenant_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[models.StateRule]:
+        return self.core_engine_repo.list_state_rules(tenant_id, skip, limit)
+
+    def update_state_rule(self, rule_id: uuid.UUID, rule_in: schemas.StateRuleUpdate, tenant_id: uuid.UUID, user: User) -> models.StateRule:
+        db_rule = self.get_state_rule(rule_id, tenant_id)
+        merged = schemas.StateRuleCreate.model_validate(db_rule, from_attributes=True).model_dump()
+        merged.update(rule_in.model_dump(exclude_unset=True))
+        self._validate_state_rule(merged)
+        updated_rule = self.core_engine_repo.update_state_rule(db_rule, rule_in)
+        self.audit_service.log_operation(user, "UPDATE_STATE_RULE", updated_rule, details=rule_in.model_dump(exclude_unset=True))
+        self._publish_state_rules_change(updated_rule, "updated")
+        return updated_rule
+
+    def delete_state_rule(self, rule_id: uuid.UUID, tenant_id: uuid.UUID, user: User) -> models.StateRule:
+        db_rule = self.get_state_rule(rule_id, tenant_id)
+        deleted_rule = self.core_engine_repo.delete_state_rule(db_rule)
+        self.audit_service.log_operation(user, "DELETE_STATE_RULE", deleted_rule)
+        self._publish_state_rules_change(deleted_rule, "deleted")
+        return deleted_rule
+
+    def _publish_state_rules_change(self, rule: models.StateRule, action: str):
+        """Avisa a los detectores de estado para que recarguen sus reglas."""
+        if self.event_broker is None:
+            return
+        try:
+            self.event_broker.publish(STATE_RULES_EVENTS_CHANNEL, {"state_rule_id": str(rule.id), "action": action})
+        except Exception as e:
+            # Los detectores recargan igualmente sus reglas cada CORE_ENGINE_STATE_RULES_RELOAD_SECONDS.
+            logger.warning(f"No se pudo publicar el cambio de la regla de estado {rule.id}: {e}")
+
+    async def ingest_connector_readings(self, readings: List[SensorReadingCreate], source: Optional[str] = None):
+        """
+        Sink asíncrono de los conectores.
+
+        Con cola de ingesta, las lecturas se encolan (esperando si está llena) y los workers
+        de ingesta las persisten con sus propias sesiones. `source` identifica la fuente de
+        datos (se guarda con el lote en el spool en disco). Sin cola, se procesan en un hilo
+        con una sesión propia por lote para no bloquear el bucle de eventos.
+        """
+        if self.ingestion_queue is not None:
+            await self.ingestion_queue.put(ColumnarReadings.from_readings(readings, source=source))
+        else:
+            await asyncio.to_thread(self._ingest_in_own_session, readings)
+
+    @staticmethod
+    def _ingest_in_own_session(readings: List[SensorReadingCreate]):
+        with session_scope() as db:
+            TelemetryService(db, AuditService(db)).ingest_bulk_readings(readings)
+
+    def _sink_for(self, data_source: models.DataSource):
+        return functools.partial(self.ingest_connector_readings, source=str(data_source.id))
+
     async def start_connector(self, data_source: models.DataSource):
         """Inicia un conector para una fuente de datos específica."""
         if data_source.protocol == "modbus_tcp":
             # CORREGIDO: Pasamos el objeto data_source y el método de callback correcto
-            connector = ModbusConnector(data_source, self.telemetry_service.ingest_bulk_readings)
+            connector = ModbusConnector(data_source, self._sink_for(data_source), self.poll_scheduler)
             self.active_connectors[data_source.id] = connector
             await connector.start()
             logger.info(f"Conector Modbus TCP iniciado para {data_source.name}")
+        elif data_source.protocol == "opc_ua":
+            connector = OpcUaConnector(data_source, self._sink_for(data_source))
+            self.active_connectors[data_source.id] = connector
+            await connector.start()
+            logger.info(f"Conector OPC UA iniciado para {data_source.name}")
         else:
             logger.warning(f"Protocolo {data_source.protocol} no soportado para iniciar conector.")
 
@@ -77,17 +209,9 @@ class CoreEngineService:
             await connector.stop()
             logger.info(f"Conector detenido para {data_source_id}")
 
-    async def start_all_connectors(self):
-        """Inicia conectores para todas las fuentes de datos activas en la BD."""
-        logger.info("Iniciando todos los conectores de datos activos...")
-        active_data_sources = self.db.query(models.DataSource).filter(models.DataSource.is_active == True).all()
-        for ds in active_data_sources:
-            await self.start_connector(ds)
-        logger.info(f"{len(self.active_connectors)} conectores iniciados.")
-
     async def stop_all_connectors(self):
         """Detiene todos los conectores activos."""
         logger.info("Deteniendo todos los conectores de datos activos...")
-        for ds_id in list(self.active_connectors.keys()):
-            await self.stop_connector(ds_id)
+        await asyncio.gather(*(self.stop_connector(ds_id) for ds_id in list(self.active_connectors.keys())))
+        await self.poll_scheduler.stop()
         logger.info("Todos los conectores han sido detenidos.")
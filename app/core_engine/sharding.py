@@ -0,0 +1,297 @@
+# /app/core_engine/sharding.py
+"""
+Reparto de las fuentes de datos entre varios procesos del Core Engine.
+
+Cada proceso del runner (`app/core_engine/runner.py`) es un miembro identificado por un
+`worker_id`. El reparto tiene dos capas:
+
+- Hashing consistente: los miembros vivos (latido en el sorted set `core_engine:members`) forman
+  un anillo con nodos virtuales y cada fuente se asigna al miembro que sigue a `hash(id)`.
+  Cuando un proceso entra o sale solo cambian de dueño las fuentes de su tramo del anillo.
+- Lease en Redis: antes de arrancar un conector el proceso adquiere `core_engine:lease:<id>`
+  (SET NX con TTL) en una reconciliación. Así, durante un rebalanceo, el dueño
+  nuevo no arranca el conector hasta que el anterior lo ha detenido y liberado el lease (o
+  hasta que éste expira si el proceso murió): nunca hay dos procesos leyendo el mismo PLC.
+
+El latido y la renovación de los leases que ya se tienen corren en su propia tarea (`start()`),
+cada `keepalive_interval` segundos, aparte de la reconciliación: una reconciliación lenta
+(arranque de un conector, Redis lento) no saca al proceso del anillo ni deja caducar sus leases.
+Si un lease se pierde igualmente (otro proceso lo tomó), se pide una reconciliación con
+`on_lease_lost` para detener su conector.
+
+Si Redis no responde, el proceso conserva los leases que tenía mientras sigan vigentes y
+después detiene todos sus conectores.
+"""
+
+import asyncio
+import bisect
+import contextlib
+import dataclasses
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import redis
+
+from app.core.metrics import metrics
+from app.core_engine import models
+
+logger = logging.getLogger("app.core_engine.sharding")
+
+MEMBERS_KEY = "core_engine:members"
+LEASE_KEY_PREFIX = "core_engine:lease:"
+STATUS_KEY_PREFIX = "core_engine:connector_status:"
+MEMBERSHIP_CHANNEL = "core_engine.members"
+
+# Adquiere el lease si está libre o lo renueva si ya es nuestro.
+_ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Libera el lease solo si sigue siendo nuestro.
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Anillo de hashing consistente con nodos virtuales."""
+
+    def __init__(self, members: Iterable[str], vnodes: int = 128):
+        points = sorted((_hash(f"{member}#{i}"), member) for member in set(members) for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._members = [m for _, m in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._members[index]
+
+
+class ShardCoordinator:
+    """Pertenencia al grupo de procesos del Core Engine y leases de las fuentes de datos."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        worker_id: str,
+        lease_ttl: float = 15.0,
+        member_ttl: float = 10.0,
+        vnodes: int = 128,
+        keepalive_interval: Optional[float] = None,
+        on_lease_lost: Optional[Callable[[], None]] = None,
+    ):
+        self.redis = redis_client
+        self.worker_id = worker_id
+        self.lease_ttl = lease_ttl
+        self.member_ttl = member_ttl
+        self.vnodes = vnodes
+        self.keepalive_interval = keepalive_interval or min(lease_ttl, member_ttl) / 3
+        self.on_lease_lost = on_lease_lost
+        self._acquire = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+        self._lock = threading.Lock()  # `_held` se modifica desde hilos distintos
+        self._members: List[str] = []
+        self._held: Set[uuid.UUID] = set()
+        self._to_release: Set[uuid.UUID] = set()
+        self._last_renewed = 0.0
+        self._keepalive_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Arranca la tarea de latidos y renovación de leases."""
+        if self._keepalive_task is None:
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+
+    async def stop(self):
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._keepalive_task
+            self._keepalive_task = None
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                lost = await asyncio.to_thread(self._keepalive)
+            except redis.RedisError as e:
+                metrics.inc("core_engine_lease_errors")
+                logger.warning(f"[{self.worker_id}] No se pudo renovar el latido ni los leases: {e}")
+                continue
+            if lost and self.on_lease_lost is not None:
+                self.on_lease_lost()
+
+    def _keepalive(self) -> Set[uuid.UUID]:
+        """Renueva el latido y los leases que se tienen. Devuelve los leases perdidos."""
+        self._heartbeat()
+        with self._lock:
+            held = list(self._held)
+        if not held:
+            return set()
+        ttl_ms = int(self.lease_ttl * 1000)
+        pipe = self.redis.pipeline(transaction=False)
+        for ds_id in held:
+            self._acquire(keys=[f"{LEASE_KEY_PREFIX}{ds_id}"], args=[self.worker_id, ttl_ms], client=pipe)
+        lost = {ds_id for ds_id, ok in zip(held, pipe.execute()) if not ok}
+        with self._lock:
+            self._held -= lost
+            self._last_renewed = time.monotonic()
+        if lost:
+            metrics.inc("core_engine_leases_lost", len(lost))
+            logger.error(f"[{self.worker_id}] {len(lost)} leases caducaron y los tiene otro proceso.")
+        return lost
+
+    # --- Pertenencia ---
+
+    def _heartbeat(self) -> List[str]:
+        seconds, micros = self.redis.time()
+        now = seconds + micros / 1e6
+        pipe = self.redis.pipeline()
+        pipe.zadd(MEMBERS_KEY, {self.worker_id: now})
+        pipe.zremrangebyscore(MEMBERS_KEY, "-inf", now - self.member_ttl)
+        pipe.zrange(MEMBERS_KEY, 0, -1)
+        members = sorted(pipe.execute()[-1])
+        if members != self._members:
+            logger.info(f"[{self.worker_id}] Miembros del Core Engine: {members}")
+            if self._members:
+                self.redis.publish(MEMBERSHIP_CHANNEL, json.dumps({"members": members}))
+            self._members = members
+            metrics.set_gauge("core_engine_members", len(members))
+        return members
+
+    # --- Leases ---
+
+    def _claim(self, data_source_ids: List[uuid.UUID]) -> Set[uuid.UUID]:
+        ring = HashRing(self._heartbeat(), self.vnodes)
+        wanted = [ds_id for ds_id in data_source_ids if ring.owner(str(ds_id)) == self.worker_id]
+
+        ttl_ms = int(self.lease_ttl * 1000)
+        pipe = self.redis.pipeline(transaction=False)
+        for ds_id in wanted:
+            self._acquire(keys=[f"{LEASE_KEY_PREFIX}{ds_id}"], args=[self.worker_id, ttl_ms], client=pipe)
+        granted = {ds_id for ds_id, ok in zip(wanted, pipe.execute()) if ok}
+
+        # Los leases que ya no nos corresponden se liberan en `release_pending()`, después de
+        # que el supervisor haya detenido sus conectores.
+        with self._lock:
+            self._to_release |= self._held - granted
+            self._held = granted
+            self._last_renewed = time.monotonic()
+        waiting = len(wanted) - len(granted)
+        metrics.set_gauge("core_engine_owned_sources", len(granted), worker=self.worker_id)
+        metrics.set_gauge("core_engine_lease_waiting", waiting, worker=self.worker_id)
+        if waiting:
+            logger.info(f"[{self.worker_id}] {waiting} fuentes esperan a que su dueño anterior libere el lease.")
+        return granted
+
+    async def ownership(self, data_sources: List[models.DataSource]) -> Set[uuid.UUID]:
+        """
+        Devuelve las fuentes que este proceso debe ejecutar ahora (renovando sus leases).
+
+        Se usa como `ownership` del `ConnectorSupervisor`, que lo llama en cada reconciliación.
+        """
+        try:
+            return await asyncio.to_thread(self._claim, [ds.id for ds in data_sources])
+        except redis.RedisError as e:
+            metrics.inc("core_engine_lease_errors")
+            if time.monotonic() - self._last_renewed < self.lease_ttl:
+                logger.warning(f"[{self.worker_id}] Redis no disponible ({e}); se mantienen los leases vigentes.")
+                with self._lock:
+                    return set(self._held)
+            logger.error(f"[{self.worker_id}] Leases caducados sin poder renovarlos: se detienen los conectores.")
+            with self._lock:
+                self._held = set()
+            return set()
+
+    def _release_all(self, data_source_ids: Iterable[uuid.UUID]):
+        pipe = self.redis.pipeline(transaction=False)
+        for ds_id in data_source_ids:
+            self._release(keys=[f"{LEASE_KEY_PREFIX}{ds_id}"], args=[self.worker_id], client=pipe)
+        pipe.execute()
+
+    async def release_pending(self):
+        """Libera los leases de las fuentes que este proceso ya ha dejado de ejecutar."""
+        if not self._to_release:
+            return
+        pending, self._to_release = self._to_release, set()
+        try:
+            await asyncio.to_thread(self._release_all, pending)
+        except redis.RedisError as e:
+            # Si no se pueden liberar, expiran solos tras `lease_ttl`.
+            logger.warning(f"[{self.worker_id}] No se pudieron liberar {len(pending)} leases: {e}")
+
+    async def leave(self):
+        """Sale del grupo y libera todos los leases (los conectores ya deben estar detenidos)."""
+        await self.stop()
+        with self._lock:
+            pending = self._held | self._to_release
+            self._held, self._to_release = set(), set()
+
+        def _leave():
+            self._release_all(pending)
+            self.redis.zrem(MEMBERS_KEY, self.worker_id)
+            self.redis.delete(f"{STATUS_KEY_PREFIX}{self.worker_id}")
+            self.redis.publish(MEMBERSHIP_CHANNEL, json.dumps({"left": self.worker_id}))
+
+        try:
+            await asyncio.to_thread(_leave)
+        except redis.RedisError as e:
+            logger.warning(f"[{self.worker_id}] Error saliendo del grupo del Core Engine: {e}")
+
+    # --- Estado de los conectores ---
+
+    async def publish_statuses(self, statuses: List) -> None:
+        """Publica el estado de los conectores de este proceso para que la API lo consulte."""
+        key = f"{STATUS_KEY_PREFIX}{self.worker_id}"
+        mapping = {
+            str(s.data_source_id): json.dumps({**dataclasses.asdict(s), "worker_id": self.worker_id}, default=str)
+            for s in statuses
+        }
+
+        def _publish():
+            pipe = self.redis.pipeline()
+            pipe.delete(key)
+            if mapping:
+                pipe.hset(key, mapping=mapping)
+            pipe.expire(key, max(1, int(self.lease_ttl * 2)))
+            pipe.execute()
+
+        try:
+            await asyncio.to_thread(_publish)
+        except redis.RedisError as e:
+            logger.warning(f"[{self.worker_id}] No se pudo publicar el estado de los conectores: {e}")
+
+    async def after_reconcile(self, statuses: List) -> None:
+        """Callback `on_reconciled` del supervisor: libera leases y publica el estado."""
+        await self.release_pending()
+        await self.publish_statuses(statuses)
+
+
+def read_connector_statuses(redis_client: redis.Redis, tenant_id: Optional[uuid.UUID] = None) -> List[Dict]:
+    """Estado de los conectores publicado por todos los procesos del runner."""
+    statuses = []
+    for key in redis_client.scan_iter(match=f"{STATUS_KEY_PREFIX}*"):
+        for raw in redis_client.hvals(key):
+            status = json.loads(raw)
+            if tenant_id is None or status.get("tenant_id") == str(tenant_id):
+                statuses.append(status)
+    return statuses
@@ -1,15 +1,29 @@
 # /app/core_engine/state_detector.py
 """
 Módulo para la detección y gestión del estado operacional de los activos.
+
+La detección trabaja sobre lotes columnares completos: las lecturas de las métricas con regla se
+ordenan por (activo, timestamp), cada activo se evalúa con su regla de estado (bandas,
+histéresis y permanencia mínima, ver `state_rules.py`) y todas las transiciones del lote se
+escriben en una sola sentencia, dentro de la transacción de ingesta (un único commit por lote).
 """
 import logging
-from typing import Dict
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
 from uuid import UUID
-from datetime import datetime, timezone
 
+import numpy as np
+import redis
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from app.telemetry.schemas import SensorReadingCreate
-from app.core_engine.models import MachineStateHistory
+
+from app.core_engine.machine_state_store import MachineStateStore, StateChange
+from app.core_engine.repository import CoreEngineRepository
+from app.core_engine.state_rules import DEFAULT_STATE_RULE, CompiledStateRule, detect_transitions
+from app.telemetry.columnar import ColumnarReadings
 
 logger = logging.getLogger(__name__)
 
@@ -18,80 +32,368 @@ MACHINE_STATE_RUNNING = "RUNNING"
 MACHINE_STATE_STOPPED = "STOPPED"
 MACHINE_STATE_UNKNOWN = "UNKNOWN"
 
-# --- Reglas de Detección (Simplificadas) ---
-STOPPAGE_THRESHOLD = 10.0
-RELEVANT_METRIC_FOR_STATE = "process_speed"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_UNDO_KEY = "state_detector_undo"
+_PUBLISH_KEY = "state_detector_publish"
+_CLAIMS_KEY = "state_detector_claims"
+_NO_CODES = np.empty(0, dtype=np.int64)
+
+# Candidato pendiente de confirmar: (nombre del estado, timestamp ns de su primera lectura).
+_PendingState = Tuple[str, int]
+# Intervalo abierto de un activo en `machine_state_history`: (id, start_time en ns).
+_OpenInterval = Tuple[UUID, int]
+# Estado previo de un activo: (estado, candidato, intervalo abierto, timestamp ns de su última lectura).
+_Undo = Tuple[Optional[str], Optional[_PendingState], Optional[_OpenInterval], Optional[int]]
+
+
+def _ns_to_datetime(ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=ns // 1000)
+
+
+def _datetime_to_ns(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+class StateRuleCache:
+    """
+    Reglas de estado compiladas y resueltas por activo.
+
+    Se recargan enteras cuando se invalidan (evento `core_engine.state_rules`) o cada
+    `reload_interval` segundos. El alcance de cada activo (tenant y tipo) se consulta una vez
+    y se guarda hasta la siguiente recarga. Prioridad: activo > tipo de activo > tenant >
+    regla por defecto (`process_speed`).
+    """
+
+    def __init__(self, reload_interval: float = 60.0):
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._by_asset: Dict[UUID, CompiledStateRule] = {}
+        self._by_asset_type: Dict[Tuple[UUID, UUID], CompiledStateRule] = {}
+        self._by_tenant: Dict[UUID, CompiledStateRule] = {}
+        self._scopes: Dict[UUID, Optional[Tuple[UUID, UUID]]] = {}
+        self._metric_names: Set[str] = {DEFAULT_STATE_RULE.metric_name}
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _ensure_loaded(self, db: Session):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_interval:
+            return
+        by_asset, by_asset_type, by_tenant = {}, {}, {}
+        for rule in CoreEngineRepository(db).list_active_state_rules():
+            try:
+                compiled = CompiledStateRule.from_config({
+                    "metric_name": rule.metric_name,
+                    "states": rule.states,
+                    "default_state": rule.default_state,
+                    "hysteresis": rule.hysteresis,
+                    "min_dwell_seconds": rule.min_dwell_seconds,
+                })
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Regla de estado {rule.id} inválida, se ignora: {e}")
+                continue
+            if rule.asset_id:
+                by_asset[rule.asset_id] = compiled
+            elif rule.asset_type_id:
+                by_asset_type[(rule.tenant_id, rule.asset_type_id)] = compiled
+            else:
+                by_tenant[rule.tenant_id] = compiled
+
+        self._by_asset, self._by_asset_type, self._by_tenant = by_asset, by_asset_type, by_tenant
+        self._scopes = {}
+        self._metric_names = {DEFAULT_STATE_RULE.metric_name} | {
+            r.metric_name for rules in (by_asset, by_asset_type, by_tenant) for r in rules.values()
+        }
+        self._loaded_at = time.monotonic()
+        logger.info(f"Reglas de estado cargadas: {len(by_asset) + len(by_asset_type) + len(by_tenant)}.")
+
+    def metric_names(self, db: Session) -> Set[str]:
+        """Métricas (en minúsculas) que usa alguna regla, incluida la regla por defecto."""
+        with self._lock:
+            self._ensure_loaded(db)
+            return self._metric_names
+
+    def _resolve_scopes(self, db: Session, asset_ids: List[UUID]):
+        missing = [asset_id for asset_id in asset_ids if asset_id not in self._scopes]
+        if missing:
+            scopes = CoreEngineRepository(db).get_asset_scopes(missing)
+            for asset_id in missing:
+                self._scopes[asset_id] = scopes.get(asset_id)  # None: activo desconocido
+
+    def tenants_for(self, db: Session, asset_ids: List[UUID]) -> Dict[UUID, UUID]:
+        """Tenant de cada activo (los activos desconocidos no aparecen)."""
+        with self._lock:
+            self._ensure_loaded(db)
+            self._resolve_scopes(db, asset_ids)
+            return {asset_id: self._scopes[asset_id][0] for asset_id in asset_ids if self._scopes[asset_id]}
+
+    def rules_for(self, db: Session, asset_ids: List[UUID]) -> Dict[UUID, CompiledStateRule]:
+        with self._lock:
+            self._ensure_loaded(db)
+            if not (self._by_asset or self._by_asset_type or self._by_tenant):
+                return {asset_id: DEFAULT_STATE_RULE for asset_id in asset_ids}
+
+            self._resolve_scopes(db, asset_ids)
+            rules = {}
+            for asset_id in asset_ids:
+                rule = self._by_asset.get(asset_id)
+                scope = self._scopes[asset_id]
+                if rule is None and scope is not None:
+                    tenant_id, asset_type_id = scope
+                    rule = self._by_asset_type.get((tenant_id, asset_type_id)) or self._by_tenant.get(tenant_id)
+                rules[asset_id] = rule or DEFAULT_STATE_RULE
+            return rules
 
 
 class StateDetector:
     """
     Gestiona el estado operacional de los activos, persistiendo los cambios en la BD.
+
+    Una instancia se comparte entre lotes (y entre los workers de ingesta): el estado vive en
+    memoria y la sesión de cada lote se pasa a `process_batch`. Antes del primer lote se precarga
+    desde la BD el estado y el intervalo abierto de cada activo (`warm`), así un reinicio no
+    genera transiciones desde UNKNOWN y cerrar un intervalo es una actualización por clave
+    primaria. Cada activo debe procesarlo un único detector (el del proceso dueño de su fuente).
+
+    Dentro del detector, cada lote reserva sus activos hasta que su transacción termina: un
+    worker con lecturas de un activo reservado espera al commit (o rollback) del otro, así nunca
+    parte de un estado sin confirmar ni cierra un intervalo que aún no está en la BD. Las
+    lecturas de un activo no posteriores a la última ya procesada no cambian su estado, de modo
+    que los lotes se aplican en orden temporal aunque los workers terminen en otro orden.
+
+    Con `state_store`, los cambios se publican en Redis tras el commit del lote para que
+    todos los workers de la API lean el mismo estado.
     """
 
-    def __init__(self, db: Session):
-        self.db = db
+    def __init__(
+        self,
+        rules: Optional[StateRuleCache] = None,
+        state_store: Optional[MachineStateStore] = None,
+    ):
+        self.rules = rules or StateRuleCache()
+        self.state_store = state_store
         self._machine_states: Dict[UUID, str] = {}
-        logger.info("Detector de estado inicializado con sesión de BD.")
+        self._pending: Dict[UUID, _PendingState] = {}
+        self._open_intervals: Dict[UUID, _OpenInterval] = {}
+        self._last_seen: Dict[UUID, int] = {}
+        self._claims: Dict[UUID, Session] = {}
+        self._warmed = False
+        self._lock = threading.Lock()
+        self._claims_released = threading.Condition(self._lock)
+        logger.info("Detector de estado inicializado.")
+
+    def warm(self, db: Session):
+        """Carga con una sola consulta el estado y el intervalo abierto de todos los activos."""
+        rows = CoreEngineRepository(db).get_open_state_intervals()
+        if self.state_store is not None:
+            # Solo rellena los activos que no tienen estado en Redis (p. ej. tras vaciarlo).
+            self._publish([(row.tenant_id, row.asset_id, row.state, row.start_time) for row in rows], only_missing=True)
+        with self._lock:
+            # `setdefault`: si otro worker ya procesó un lote, su estado es más reciente.
+            for row in rows:
+                start_ns = _datetime_to_ns(row.start_time)
+                self._machine_states.setdefault(row.asset_id, row.state)
+                self._open_intervals.setdefault(row.asset_id, (row.id, start_ns))
+                self._last_seen.setdefault(row.asset_id, start_ns)
+            self._warmed = True
+        logger.info(f"Detector de estado precargado con {len(rows)} intervalos abiertos.")
+
+    def _publish(self, changes: List[StateChange], only_missing: bool = False):
+        try:
+            self.state_store.publish(changes, only_missing=only_missing)
+        except redis.RedisError as e:
+            # El estado en Redis se corrige con el siguiente cambio de cada activo.
+            logger.warning(f"No se pudo publicar el estado de {len(changes)} activos en Redis: {e}")
 
-    def process_reading(self, reading: SensorReadingCreate):
+    def on_rules_changed(self, data: dict):
+        """Manejador del Event Broker: las reglas se recargan en el siguiente lote."""
+        self.rules.invalidate()
+
+    def process_batch(self, batch: ColumnarReadings, db: Session) -> int:
         """
-        Procesa una lectura de sensor para detectar y persistir un cambio de estado.
+        Detecta las transiciones de estado de un lote y las escribe en la sesión (sin commit).
+
+        Devuelve el número de transiciones. Los activos del lote quedan reservados para esta
+        sesión hasta el fin de su transacción; el estado en memoria se actualiza al instante y
+        se restaura si la transacción termina en rollback.
         """
-        if reading.metric_name.lower() != RELEVANT_METRIC_FOR_STATE:
-            return
+        if not self._warmed:
+            self.warm(db)
+        rule_metrics = self.rules.metric_names(db)
+        codes_by_metric: Dict[str, List[int]] = {}
+        for code, name in enumerate(batch.metric_names):
+            if name.lower() in rule_metrics:
+                codes_by_metric.setdefault(name.lower(), []).append(code)
+        if not codes_by_metric:
+            return 0
+        relevant = [code for codes in codes_by_metric.values() for code in codes]
+        mask = np.isin(batch.metric_codes, relevant) & ~np.isnan(batch.values)
+        if not mask.any():
+            return 0
+
+        asset_codes = batch.asset_codes[mask]
+        timestamps = batch.timestamps_ns[mask]
+        order = np.lexsort((timestamps, asset_codes))
+        asset_codes, timestamps = asset_codes[order], timestamps[order]
+        metric_codes = batch.metric_codes[mask][order]
+        values = batch.values[mask][order]
+
+        group_starts = np.flatnonzero(np.r_[True, asset_codes[1:] != asset_codes[:-1]])
+        group_ends = np.r_[group_starts[1:], values.shape[0]]
+        assets: List[UUID] = [batch.asset_ids[code] for code in asset_codes[group_starts].tolist()]
+        rules = self.rules.rules_for(db, assets)
+        self._claim(db, assets)
 
-        new_state = (
-            MACHINE_STATE_RUNNING
-            if reading.value >= STOPPAGE_THRESHOLD
-            else MACHINE_STATE_STOPPED
+        ids: List[UUID] = []
+        asset_ids: List[UUID] = []
+        t_times: List[int] = []
+        t_states: List[str] = []
+        close_ids: List[UUID] = []
+        close_times: List[datetime] = []
+        close_durations: List[float] = []
+        undo: Dict[UUID, _Undo] = {}
+        with self._lock:
+            for asset_id, lo, hi in zip(assets, group_starts.tolist(), group_ends.tolist()):
+                rule = rules[asset_id]
+                selected = np.isin(metric_codes[lo:hi], codes_by_metric.get(rule.metric_name, _NO_CODES))
+                last_seen = self._last_seen.get(asset_id)
+                if last_seen is not None:
+                    selected &= timestamps[lo:hi] > last_seen
+                if not selected.any():
+                    continue
+                previous_state = self._machine_states.get(asset_id)
+                previous_pending = self._pending.get(asset_id)
+                pending = None
+                if previous_pending is not None and previous_pending[0] in rule.state_names:
+                    pending = (rule.code(previous_pending[0]), previous_pending[1])
+
+                transitions, state, pending = detect_transitions(
+                    rule, values[lo:hi][selected], timestamps[lo:hi][selected], rule.code(previous_state), pending
+                )
+                new_pending = (rule.state_names[pending[0]], pending[1]) if pending is not None else None
+                previous_interval = self._open_intervals.get(asset_id)
+                undo[asset_id] = (previous_state, previous_pending, previous_interval, last_seen)
+                self._last_seen[asset_id] = int(timestamps[lo:hi][selected][-1])
+                if new_pending is None:
+                    self._pending.pop(asset_id, None)
+                else:
+                    self._pending[asset_id] = new_pending
+                if not transitions:
+                    continue
+
+                # La primera transición cierra el intervalo abierto del activo (por su id).
+                if previous_interval is not None:
+                    interval_id, interval_start = previous_interval
+                    end_us = max(transitions[0][0], interval_start) // 1000
+                    close_ids.append(interval_id)
+                    close_times.append(_ns_to_datetime(end_us * 1000))
+                    close_durations.append((end_us - interval_start // 1000) / 1e6)
+                new_ids = [uuid.uuid4() for _ in transitions]
+                self._machine_states[asset_id] = rule.state_names[state]
+                self._open_intervals[asset_id] = (new_ids[-1], transitions[-1][0])
+                for interval_id, (ns, code) in zip(new_ids, transitions):
+                    ids.append(interval_id)
+                    asset_ids.append(asset_id)
+                    t_times.append(ns)
+                    t_states.append(rule.state_names[code])
+
+        if not asset_ids:
+            self._remember_undo(db, undo, [])
+            return 0
+
+        # Estado vigente de cada activo con cambios: el de su última transición.
+        last = {asset_id: (state, ns) for asset_id, ns, state in zip(asset_ids, t_times, t_states)}
+        tenants = self.rules.tenants_for(db, list(last)) if self.state_store is not None else {}
+        changes = [
+            (tenants[asset_id], asset_id, state, _ns_to_datetime(ns))
+            for asset_id, (state, ns) in last.items() if asset_id in tenants
+        ]
+        self._remember_undo(db, undo, changes)
+
+        # Cada transición abre un intervalo que termina en la siguiente transición del mismo
+        # activo dentro del lote; la última de cada activo queda abierta.
+        same_next = [a == b for a, b in zip(asset_ids, asset_ids[1:])] + [False]
+        start_times = [_ns_to_datetime(ns) for ns in t_times]
+        end_times = [start_times[i + 1] if same_next[i] else None for i in range(len(start_times))]
+        CoreEngineRepository(db).record_state_transitions(
+            close_ids=close_ids,
+            close_times=close_times,
+            close_durations=close_durations,
+            ids=ids,
+            asset_ids=asset_ids,
+            states=t_states,
+            start_times=start_times,
+            end_times=end_times,
         )
-        previous_state = self._machine_states.get(reading.asset_id, MACHINE_STATE_UNKNOWN)
+        logger.info(f"{len(asset_ids)} cambios de estado detectados en {len(set(asset_ids))} activos.")
+        return len(asset_ids)
+
+    def _track(self, db: Session):
+        """Registra (una vez por sesión) los eventos que cierran el lote al terminar la transacción."""
+        if _UNDO_KEY not in db.info:
+            db.info[_UNDO_KEY] = {}
+            db.info[_PUBLISH_KEY] = []
+            db.info[_CLAIMS_KEY] = set()
+            event.listen(db, "after_commit", self._on_commit)
+            event.listen(db, "after_rollback", self._restore)
+            event.listen(db, "after_transaction_end", self._on_transaction_end)
 
-        if new_state != previous_state:
-            self._machine_states[reading.asset_id] = new_state
-            logger.info(
-                f"STATE CHANGE DETECTED for asset {reading.asset_id}: "
-                f"'{previous_state}' -> '{new_state}' (based on value: {reading.value})"
-            )
-            self._persist_state_change(reading.asset_id, new_state)
+    def _claim(self, db: Session, assets: List[UUID]):
+        """Reserva los activos para la transacción de `db`, esperando a que otra sesión los libere."""
+        self._track(db)
+        # Con la transacción ya iniciada, su fin (commit, rollback o cierre) libera la reserva.
+        db.connection()
+        with self._claims_released:
+            while any(self._claims.get(asset_id, db) is not db for asset_id in assets):
+                self._claims_released.wait()
+            for asset_id in assets:
+                self._claims[asset_id] = db
+            db.info[_CLAIMS_KEY].update(assets)
 
-    def _persist_state_change(self, asset_id: UUID, new_state: str):
+    def _on_transaction_end(self, session: Session, transaction):
+        """Libera los activos reservados por la sesión al terminar su transacción principal."""
+        claimed = session.info.get(_CLAIMS_KEY)
+        if transaction.parent is not None or not claimed:
+            return
+        with self._claims_released:
+            for asset_id in claimed:
+                if self._claims.get(asset_id) is session:
+                    del self._claims[asset_id]
+            claimed.clear()
+            self._claims_released.notify_all()
+
+    def _remember_undo(self, db: Session, undo: Dict[UUID, _Undo], changes: List[StateChange]):
         """
-        Cierra el registro de estado anterior y crea uno nuevo.
+        Guarda el estado previo de los activos para restaurarlo si la transacción falla, y los
+        cambios a publicar en Redis cuando se confirme.
         """
-        now = datetime.now(timezone.utc)
-
-        # 1. Encontrar y cerrar el registro de estado anterior (el que no tiene end_time)
-        last_state_record = (
-            self.db.query(MachineStateHistory)
-            .filter(
-                MachineStateHistory.asset_id == asset_id,
-                MachineStateHistory.end_time == None,
-            )
-            .order_by(MachineStateHistory.start_time.desc())
-            .first()
-        )
+        pending = db.info[_UNDO_KEY]
+        for asset_id, previous in undo.items():
+            pending.setdefault(asset_id, previous)
+        db.info[_PUBLISH_KEY].extend(changes)
 
-        if last_state_record:
-            last_state_record.end_time = now
-            duration = now - last_state_record.start_time
-            last_state_record.duration_seconds = duration.total_seconds()
-            self.db.add(last_state_record)
-
-        # 2. Crear el nuevo registro de estado
-        new_state_record = MachineStateHistory(
-            asset_id=asset_id,
-            state=new_state,
-            start_time=now,
-        )
-        self.db.add(new_state_record)
-        
-        try:
-            self.db.commit()
-        except Exception as e:
-            logger.error(f"Error al persistir cambio de estado para el activo {asset_id}: {e}")
-            self.db.rollback()
+    def _on_commit(self, session: Session):
+        session.info.get(_UNDO_KEY, {}).clear()
+        changes = session.info.get(_PUBLISH_KEY)
+        if changes:
+            self._publish(list(changes))
+            changes.clear()
 
+    def _restore(self, session: Session):
+        session.info.get(_PUBLISH_KEY, []).clear()
+        pending = session.info.get(_UNDO_KEY) or {}
+        if pending:
+            logger.warning(f"Rollback de la ingesta: se restaura el estado de {len(pending)} activos.")
+            with self._lock:
+                stores = (self._machine_states, self._pending, self._open_intervals, self._last_seen)
+                for asset_id, previous in pending.items():
+                    for store, value in zip(stores, previous):
+                        if value is None:
+                            store.pop(asset_id, None)
+                        else:
+                            store[asset_id] = value
+            pending.clear()
 
     def get_current_state(self, asset_id: UUID) -> str:
         """Devuelve el último estado conocido de un activo."""
@@ -0,0 +1,190 @@
+# /app/core_engine/state_rules.py
+"""
+Reglas de detección de estado de máquina y su evaluación sobre series de lecturas.
+
+Una regla define, para una métrica, bandas de valores por estado en orden de prioridad
+(la primera que contiene el valor gana) y un estado por defecto cuando ninguna lo contiene:
+
+    {"metric_name": "process_speed", "default_state": "STOPPED",
+     "states": [{"state": "FAULT", "min": 1500},
+                {"state": "RUNNING", "min": 10, "max": 1500},
+                {"state": "IDLE", "min": 2, "max": 10}],
+     "hysteresis": 1.0, "min_dwell_seconds": 5}
+
+- Histéresis: para abandonar el estado actual el valor debe salir de su banda más de
+  `hysteresis` unidades (y, desde el estado por defecto, entrar en otra banda con ese margen).
+  Una señal con ruido alrededor de un umbral deja de oscilar entre estados.
+- Permanencia mínima: el estado candidato debe mantenerse `min_dwell_seconds` (tiempo de las
+  lecturas) antes de confirmarse; la transición se fecha en la primera lectura del candidato.
+  Desde UNKNOWN el primer estado se confirma al instante.
+
+La clasificación y la histéresis se calculan con NumPy sobre toda la serie; el bucle de
+`detect_transitions` avanza de salida en salida, no lectura a lectura.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+UNKNOWN_CODE = -1
+
+Pending = Tuple[int, int]  # (código del estado candidato, timestamp ns de su primera lectura)
+
+
+@dataclass(frozen=True)
+class StateBand:
+    state: str
+    low: float = -np.inf
+    high: float = np.inf
+
+
+class CompiledStateRule:
+    """Regla de estado preparada para evaluarse con arrays."""
+
+    def __init__(
+        self,
+        metric_name: str,
+        bands: Sequence[StateBand],
+        default_state: str,
+        hysteresis: float = 0.0,
+        min_dwell_seconds: float = 0.0,
+    ):
+        if not bands:
+            raise ValueError("Una regla de estado necesita al menos una banda.")
+        self.metric_name = metric_name.lower()
+        self.state_names: Tuple[str, ...] = tuple(dict.fromkeys([b.state for b in bands] + [default_state]))
+        self.default_code = self.state_names.index(default_state)
+        self.band_codes = np.array([self.state_names.index(b.state) for b in bands], dtype=np.int16)
+        self.low = np.array([b.low for b in bands], dtype=np.float64)
+        self.high = np.array([b.high for b in bands], dtype=np.float64)
+        self.hysteresis = float(hysteresis or 0)
+        self.dwell_ns = int(float(min_dwell_seconds or 0) * 1e9)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CompiledStateRule":
+        bands = [
+            StateBand(
+                state=band["state"],
+                low=-np.inf if band.get("min") is None else float(band["min"]),
+                high=np.inf if band.get("max") is None else float(band["max"]),
+            )
+            for band in config["states"]
+        ]
+        return cls(
+            metric_name=config["metric_name"],
+            bands=bands,
+            default_state=config["default_state"],
+            hysteresis=config.get("hysteresis", 0.0),
+            min_dwell_seconds=config.get("min_dwell_seconds", 0.0),
+        )
+
+    def code(self, state: Optional[str]) -> int:
+        return self.state_names.index(state) if state in self.state_names else UNKNOWN_CODE
+
+    def _in_bands(self, values: np.ndarray, margin: float) -> np.ndarray:
+        """Matriz (bandas x lecturas): valor dentro de cada banda ampliada `margin` unidades."""
+        v = values[np.newaxis, :]
+        return (v >= self.low[:, np.newaxis] - margin) & (v < self.high[:, np.newaxis] + margin)
+
+    def classify(self, values: np.ndarray) -> np.ndarray:
+        """Estado de cada lectura sin histéresis (la primera banda que lo contiene)."""
+        inside = self._in_bands(values, 0.0)
+        first = np.argmax(inside, axis=0)
+        return np.where(inside.any(axis=0), self.band_codes[first], self.default_code).astype(np.int16)
+
+    def stay_mask(self, code: int, values: np.ndarray) -> np.ndarray:
+        """Lecturas con las que, estando en `code`, se permanece en él (con histéresis)."""
+        own = self.band_codes == code
+        stay = self._in_bands(values, self.hysteresis)[own].any(axis=0)
+        if code == self.default_code:
+            # Se sigue en el estado por defecto salvo que el valor entre con margen en otra banda.
+            stay |= ~self._in_bands(values, -self.hysteresis)[~own].any(axis=0)
+        return stay
+
+
+DEFAULT_STATE_RULE = CompiledStateRule(
+    metric_name="process_speed",
+    bands=[StateBand("RUNNING", low=10.0)],
+    default_state="STOPPED",
+)
+
+
+def detect_transitions(
+    rule: CompiledStateRule,
+    values: np.ndarray,
+    timestamps_ns: np.ndarray,
+    state: int = UNKNOWN_CODE,
+    pending: Optional[Pending] = None,
+) -> Tuple[List[Tuple[int, int]], int, Optional[Pending]]:
+    """
+    Recorre una serie ordenada por tiempo de un activo.
+
+    Devuelve las transiciones `(timestamp ns, código de estado)`, el estado final y el
+    candidato pendiente de confirmar (permanencia mínima no alcanzada al final de la serie).
+    """
+    n = values.shape[0]
+    raw = rule.classify(values)
+    run_starts = np.flatnonzero(raw[1:] != raw[:-1]) + 1
+    exits: Dict[int, np.ndarray] = {}
+    transitions: List[Tuple[int, int]] = []
+
+    i = 0
+    if pending is not None and state != UNKNOWN_CODE and n:
+        # El candidato del lote anterior sigue vivo mientras dure su racha de lecturas (igual que
+        # dentro de un lote, aunque alguna caiga en la banda de histéresis del estado actual).
+        candidate, since = pending
+        run_end = int(run_starts[0]) if run_starts.shape[0] else n
+        if raw[0] != candidate:
+            pending = None
+        else:
+            confirm = max(0, int(np.searchsorted(timestamps_ns, since + rule.dwell_ns)))
+            if confirm < run_end:
+                transitions.append((since, candidate))
+                state, pending = candidate, None
+                i = confirm + 1
+            elif run_end < n:
+                pending = None
+                i = run_end
+            else:
+                return transitions, state, pending
+    pending = None
+
+    while i < n:
+        if state == UNKNOWN_CODE:
+            j = i
+        else:
+            if state not in exits:
+                exits[state] = np.flatnonzero(~rule.stay_mask(state, values))
+            k = np.searchsorted(exits[state], i)
+            if k == exits[state].shape[0]:
+                # La serie vuelve (o sigue) dentro del estado actual: el candidato se descarta.
+                pending = None
+                break
+            j = int(exits[state][k])
+
+        candidate = int(raw[j])
+        if candidate == state:
+            i = j + 1
+            continue
+        since = int(timestamps_ns[j])
+        k = np.searchsorted(run_starts, j, side="right")
+        run_end = int(run_starts[k]) if k < run_starts.shape[0] else n
+
+        if state == UNKNOWN_CODE or rule.dwell_ns == 0:
+            confirm = j
+        else:
+            confirm = max(j, int(np.searchsorted(timestamps_ns, since + rule.dwell_ns)))
+            confirm = confirm if confirm < run_end else None
+
+        if confirm is not None:
+            transitions.append((since, candidate))
+            state, pending = candidate, None
+            i = confirm + 1
+        elif run_end < n:
+            pending = None
+            i = run_end
+        else:
+            pending = (candidate, since)
+            break
+    return transitions, state, pending
@@ -0,0 +1,316 @@
+# /app/core_engine/supervisor.py
+"""
+Supervisor de conectores del Core Engine.
+
+Reconcilia periódicamente los conectores activos con la tabla `data_sources`:
+
+- Inicia los conectores de fuentes nuevas, detiene los de fuentes borradas o desactivadas y
+  reinicia los de fuentes cuya configuración cambió (recarga en caliente).
+- Evalúa la salud de cada conector y mantiene su estado:
+    CONNECTING  iniciado, todavía sin un ciclo correcto
+    RUNNING     el último ciclo fue correcto
+    DEGRADED    hubo ciclos correctos pero los últimos fallan
+    FAILED      demasiados fallos consecutivos o error fatal; se reinicia con backoff
+- Los reinicios usan backoff exponencial con jitter para que muchos PLCs caídos a la vez no
+  reconecten en el mismo instante.
+- Los arranques y paradas de una reconciliación se hacen en paralelo (como mucho
+  `max_concurrent_starts` a la vez y con `start_timeout` por conector), de modo que el arranque
+  con una flota grande tarda segundos. Cada reconciliación con arranques deja un informe con la
+  duración de cada fuente (`last_startup_report`).
+
+Los cambios hechos desde la API se publican en el Event Broker y despiertan la reconciliación
+de inmediato; el intervalo periódico cubre cambios hechos fuera de este proceso.
+
+Con varios procesos del runner, `ownership` (ver `sharding.ShardCoordinator`) restringe en cada
+reconciliación las fuentes que ejecuta este proceso.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app.core.database import session_scope
+from app.core.event_broker import EventBroker
+from app.core.metrics import metrics
+from app.core_engine import models
+from app.core_engine.service import DATA_SOURCE_EVENTS_CHANNEL, CoreEngineService
+
+logger = logging.getLogger("app.core_engine.supervisor")
+
+CONNECTING = "CONNECTING"
+RUNNING = "RUNNING"
+DEGRADED = "DEGRADED"
+FAILED = "FAILED"
+CONNECTOR_STATES = (CONNECTING, RUNNING, DEGRADED, FAILED)
+_START_TIMEOUT_ERROR = "TimeoutError: el conector no arrancó a tiempo"
+
+
+def _fingerprint(data_source: models.DataSource) -> str:
+    """Huella de la configuración que, si cambia, obliga a reiniciar el conector."""
+    raw = json.dumps(
+        [data_source.name, data_source.protocol, data_source.connection_params], sort_keys=True, default=str
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+@dataclass
+class StartupReport:
+    """Resultado del arranque de los conectores de una reconciliación."""
+
+    started_at: datetime
+    total_seconds: float
+    durations: Dict[str, float]  # nombre de la fuente -> segundos
+    failed: List[str]
+    timed_out: List[str]
+
+
+@dataclass
+class ConnectorStatus:
+    """Estado supervisado de una fuente de datos."""
+
+    data_source_id: uuid.UUID
+    tenant_id: uuid.UUID
+    name: str
+    protocol: str
+    fingerprint: str
+    state: str = CONNECTING
+    since: datetime = None
+    last_error: Optional[str] = None
+    last_success_at: Optional[datetime] = None
+    consecutive_failures: int = 0
+    restarts: int = 0
+    attempt: int = 0
+    next_retry_at: Optional[datetime] = None
+    start_seconds: Optional[float] = None
+
+    def __post_init__(self):
+        self.since = self.since or datetime.now(timezone.utc)
+
+
+class ConnectorSupervisor:
+    """Mantiene los conectores de `CoreEngineService` alineados con la BD y vigila su salud."""
+
+    def __init__(
+        self,
+        core_engine_service: CoreEngineService,
+        reconcile_interval: float = 5.0,
+        failed_after_errors: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 300.0,
+        max_concurrent_starts: int = 64,
+        start_timeout: float = 10.0,
+        ownership: Optional[Callable[[List[models.DataSource]], Awaitable[Set[uuid.UUID]]]] = None,
+        on_reconciled: Optional[Callable[[List["ConnectorStatus"]], Awaitable[None]]] = None,
+    ):
+        self.service = core_engine_service
+        self.reconcile_interval = reconcile_interval
+        self.failed_after_errors = failed_after_errors
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrent_starts = max_concurrent_starts
+        self.start_timeout = start_timeout
+        self.last_startup_report: Optional[StartupReport] = None
+        self.ownership = ownership
+        self.on_reconciled = on_reconciled
+        self.statuses: Dict[uuid.UUID, ConnectorStatus] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # --- Ciclo de vida ---
+
+    def subscribe(self, event_broker: EventBroker, channels: Iterable[str] = (DATA_SOURCE_EVENTS_CHANNEL,)):
+        """Reconcilia en cuanto la API crea, modifica o borra una fuente de datos."""
+        for channel in channels:
+            event_broker.subscribe(channel, self._on_data_source_event)
+
+    def _on_data_source_event(self, data: Dict[str, Any]):
+        # Se invoca desde el hilo del Event Broker.
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def request_reconcile(self):
+        self._wake.set()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self.service.poll_scheduler.start()
+        await self.reconcile()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.service.stop_all_connectors()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.reconcile_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Error reconciliando conectores: {e}", exc_info=True)
+
+    # --- Reconciliación ---
+
+    @staticmethod
+    def _load_desired() -> List[models.DataSource]:
+        with session_scope() as db:
+            data_sources = db.query(models.DataSource).filter(models.DataSource.is_active == True).all()
+            db.expunge_all()
+            return data_sources
+
+    async def reconcile(self):
+        """Alinea los conectores con la BD y actualiza el estado de salud de cada uno."""
+        data_sources = await asyncio.to_thread(self._load_desired)
+        if self.ownership is not None:
+            owned = await self.ownership(data_sources)
+            data_sources = [ds for ds in data_sources if ds.id in owned]
+        desired = {ds.id: ds for ds in data_sources}
+
+        removed = [i for i in self.statuses if i not in desired]
+        for ds_id in removed:
+            logger.info(f"Fuente {self.statuses[ds_id].name} eliminada o desactivada: se detiene su conector.")
+        await asyncio.gather(*(self.service.stop_connector(ds_id) for ds_id in removed))
+        for ds_id in removed:
+            del self.statuses[ds_id]
+            metrics.remove_gauge("connector_state", source=str(ds_id))
+
+        to_start: List[tuple] = []
+        to_restart: List[uuid.UUID] = []
+        for ds_id, data_source in desired.items():
+            status = self.statuses.get(ds_id)
+            fingerprint = _fingerprint(data_source)
+            if status is None:
+                status = self.statuses[ds_id] = ConnectorStatus(
+                    data_source_id=ds_id,
+                    tenant_id=data_source.tenant_id,
+                    name=data_source.name,
+                    protocol=data_source.protocol,
+                    fingerprint=fingerprint,
+                )
+                to_start.append((status, data_source))
+            elif status.fingerprint != fingerprint:
+                logger.info(f"Configuración de {data_source.name} modificada: se reinicia su conector.")
+                to_restart.append(ds_id)
+                status.fingerprint = fingerprint
+                status.name, status.protocol = data_source.name, data_source.protocol
+                status.attempt = 0
+                to_start.append((status, data_source))
+            elif status.state == FAILED:
+                if status.next_retry_at and datetime.now(timezone.utc) >= status.next_retry_at:
+                    status.restarts += 1
+                    to_start.append((status, data_source))
+            else:
+                await self._evaluate(status)
+
+        await asyncio.gather(*(self.service.stop_connector(ds_id) for ds_id in to_restart))
+        if to_start:
+            await self._start_many(to_start)
+
+        for state in CONNECTOR_STATES:
+            metrics.set_gauge("connectors_by_state", sum(s.state == state for s in self.statuses.values()), state=state)
+        if self.on_reconciled is not None:
+            await self.on_reconciled(list(self.statuses.values()))
+
+    async def _start_many(self, jobs: List[tuple]):
+        """Arranca varios conectores en paralelo y registra el informe de arranque."""
+        semaphore = asyncio.Semaphore(self.max_concurrent_starts)
+        started_at = datetime.now(timezone.utc)
+        t0 = time.perf_counter()
+
+        async def _bounded(status: ConnectorStatus, data_source: models.DataSource):
+            async with semaphore:
+                await self._start(status, data_source)
+
+        await asyncio.gather(*(_bounded(status, data_source) for status, data_source in jobs))
+
+        statuses = [status for status, _ in jobs]
+        report = StartupReport(
+            started_at=started_at,
+            total_seconds=time.perf_counter() - t0,
+            durations={s.name: s.start_seconds for s in statuses},
+            failed=[s.name for s in statuses if s.state == FAILED],
+            timed_out=[s.name for s in statuses if s.state == FAILED and s.last_error == _START_TIMEOUT_ERROR],
+        )
+        self.last_startup_report = report
+        slowest = sorted(report.durations.items(), key=lambda item: item[1], reverse=True)[:5]
+        logger.info(
+            f"Arranque de {len(jobs)} conectores en {report.total_seconds:.2f}s "
+            f"({len(report.failed)} fallidos, {len(report.timed_out)} por timeout). "
+            f"Más lentos: " + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in slowest)
+        )
+
+    async def _start(self, status: ConnectorStatus, data_source: models.DataSource):
+        status.next_retry_at = None
+        self._set_state(status, CONNECTING)
+        error = None
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.service.start_connector(data_source), timeout=self.start_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"El conector de {data_source.name} no arrancó en {self.start_timeout}s.")
+            error = _START_TIMEOUT_ERROR
+        except Exception as e:
+            logger.error(f"No se pudo iniciar el conector de {data_source.name}: {e}", exc_info=True)
+            error = f"{type(e).__name__}: {e}"
+        status.start_seconds = time.perf_counter() - t0
+        metrics.observe("connector_start_seconds", status.start_seconds, protocol=data_source.protocol)
+
+        if error is None and data_source.id not in self.service.active_connectors:
+            error = f"Protocolo '{data_source.protocol}' no soportado."
+        if error is not None:
+            status.last_error = error
+            await self._fail(status)
+
+    async def _evaluate(self, status: ConnectorStatus):
+        connector = self.service.active_connectors.get(status.data_source_id)
+        if connector is None:
+            return
+        health = connector.health
+        status.last_error = health.last_error or status.last_error
+        status.last_success_at = health.last_success_at
+        status.consecutive_failures = health.consecutive_failures
+
+        if health.fatal or health.consecutive_failures >= self.failed_after_errors:
+            await self._fail(status)
+        elif health.consecutive_failures:
+            self._set_state(status, DEGRADED if health.last_success_at else CONNECTING)
+        elif health.last_success_at:
+            self._set_state(status, RUNNING)
+            status.attempt = 0
+
+    async def _fail(self, status: ConnectorStatus):
+        """Detiene el conector y programa el reintento con backoff exponencial y jitter."""
+        await self.service.stop_connector(status.data_source_id)
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** status.attempt))
+        delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        status.attempt += 1
+        status.next_retry_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        self._set_state(status, FAILED)
+        logger.warning(f"Conector de {status.name} en FAILED ({status.last_error}); reintento en {delay:.1f}s")
+
+    @staticmethod
+    def _set_state(status: ConnectorStatus, state: str):
+        if status.state != state:
+            status.state = state
+            status.since = datetime.now(timezone.utc)
+        metrics.set_gauge("connector_state", CONNECTOR_STATES.index(state), source=str(status.data_source_id))
+
+    def snapshot(self, tenant_id: Optional[uuid.UUID] = None) -> List[ConnectorStatus]:
+        return [s for s in self.statuses.values() if tenant_id is None or s.tenant_id == tenant_id]
@@ -53,6 +53,7 @@ from app.telemetry.models.sensor_reading import SensorReading
 # 11. Core Engine
 from app.core_engine.models.data_source import DataSource
 from app.core_engine.models.machine_state_history import MachineStateHistory
+from app.core_engine.models.state_rule import StateRule
 
 # 12. Media
 from app.media.models import MediaItem
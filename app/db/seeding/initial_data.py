@@ -40,7 +40,10 @@ ALL_PERMISSIONS = [
     p.SECTOR_READ, p.SECTOR_CREATE, p.SECTOR_UPDATE, p.SECTOR_DELETE,
     p.CONFIG_PARAM_READ, p.CONFIG_PARAM_CREATE, p.CONFIG_PARAM_UPDATE, p.CONFIG_PARAM_DELETE,
     p.DATA_SOURCE_READ, p.DATA_SOURCE_CREATE, p.DATA_SOURCE_UPDATE, p.DATA_SOURCE_DELETE,
+    p.STATE_RULE_READ, p.STATE_RULE_CREATE, p.STATE_RULE_UPDATE, p.STATE_RULE_DELETE,
     p.AUDIT_LOG_READ, p.APPROVAL_READ, p.APPROVAL_DECIDE,
+    # Plataforma
+    p.SYSTEM_METRICS_READ,
     # Identity
     p.USER_READ, p.USER_CREATE, p.USER_UPDATE, p.USER_DELETE,
     p.USER_READ_ALL, p.USER_CREATE_ANY, p.USER_UPDATE_ANY, p.USER_DELETE_ANY,
@@ -3,6 +3,8 @@
 Dependency Injection for the services of Astruxa's modules.
 """
 
+from typing import Optional
+
 import redis
 from fastapi import Depends, Request
 from sqlalchemy.orm import Session
@@ -16,7 +18,9 @@ from app.configuration.service import ConfigurationService
 # --- Import core dependency getters ---
 from app.core.database import get_db
 from app.core.redis import get_redis_client
+from app.core_engine.machine_state_store import MachineStateStore
 from app.core_engine.service import CoreEngineService
+from app.core_engine.supervisor import ConnectorSupervisor
 # --- Import services from Astruxa's modules ---
 from app.identity.auth_service import AuthService
 from app.identity.role_service import RoleService
@@ -36,6 +40,7 @@ from app.procurement.service import ProcurementService
 from app.procurement.service_evaluation import EvaluationService
 from app.sectors.service import SectorService
 from app.telemetry.service import TelemetryService
+from app.telemetry.ingestion_queue import TelemetryIngestionQueue
 from app.reporting.service import ReportingService # <-- Nuevo import
 from app.reporting.stoppage_service import StoppageService # <-- Nuevo import
 
@@ -114,13 +119,15 @@ def get_media_service(db: Session = Depends(get_db)) -> MediaService:
 
 
 def get_alarming_service(
+        request: Request,
         db: Session = Depends(get_db),
         notification_service: NotificationService = Depends(get_notification_service),
         audit_service: AuditService = Depends(get_audit_service)
 ) -> AlarmingService:
     asset_repo = AssetRepository(db)
     return AlarmingService(db=db, notification_service=notification_service, asset_repo=asset_repo,
-                           audit_service=audit_service)
+                           audit_service=audit_service,
+                           event_broker=getattr(request.app.state, "event_broker", None))
 
 
 def get_role_service(db: Session = Depends(get_db)) -> RoleService:
@@ -145,8 +152,8 @@ def get_evaluation_service(db: Session = Depends(get_db)) -> EvaluationService:
     return EvaluationService(db)
 
 # --- Reporting Services ---
-def get_reporting_service(db: Session = Depends(get_db)) -> ReportingService: # <-- Nueva función
-    return ReportingService(db=db)
+def get_reporting_service(redis_client: redis.Redis = Depends(get_redis_client)) -> ReportingService:
+    return ReportingService(state_store=MachineStateStore(redis_client))
 
 def get_stoppage_service(db: Session = Depends(get_db)) -> StoppageService: # <-- Nueva función
     return StoppageService(db=db)
@@ -163,17 +170,36 @@ def get_telemetry_service(
     return TelemetryService(db=db, audit_service=audit_service)
 
 
+def get_telemetry_ingestion_queue(request: Request) -> TelemetryIngestionQueue:
+    """Devuelve la cola de ingesta creada en el `lifespan` de la aplicación."""
+    return request.app.state.telemetry_ingestion_queue
+
+
 def get_maintenance_service(db: Session = Depends(get_db),
                             audit_service: AuditService = Depends(get_audit_service)) -> MaintenanceService:
     return MaintenanceService(db=db, audit_service=audit_service)
 
 
 def get_core_engine_service(
+        request: Request,
         db: Session = Depends(get_db),
         telemetry_service: TelemetryService = Depends(get_telemetry_service),
         audit_service: AuditService = Depends(get_audit_service)
 ) -> CoreEngineService:
-    return CoreEngineService(db=db, telemetry_service=telemetry_service, audit_service=audit_service)
+    return CoreEngineService(
+        db=db,
+        telemetry_service=telemetry_service,
+        audit_service=audit_service,
+        event_broker=getattr(request.app.state, "event_broker", None),
+    )
+
+
+def get_connector_supervisor(request: Request) -> Optional[ConnectorSupervisor]:
+    """
+    Devuelve el supervisor de conectores creado en el `lifespan` de la aplicación, o None si
+    los conectores los ejecuta el runner del Core Engine (`CORE_ENGINE_RUN_IN_API=false`).
+    """
+    return getattr(request.app.state, "connector_supervisor", None)
 
 
 def get_sector_service(db: Session = Depends(get_db),
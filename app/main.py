@@ -9,21 +9,19 @@ from starlette.middleware.cors import CORSMiddleware
 
 from app.api.v1.routers import api_router
 from app.core.config import settings
-from app.core.database import SessionLocal
 from app.core.exception_handlers import add_exception_handlers
 from app.core.redis import get_redis_client
 from app.core.limiter import limiter
+from app.core.loop_monitor import EventLoopLagMonitor
 # from app.core.middlewares.tenant_middleware import TenantMiddleware # DESACTIVADA
 from app.core.event_broker import EventBroker
 from app.core_engine.service import CoreEngineService
-from app.telemetry.service import TelemetryService
-from app.auditing.service import AuditService
-from app.alarming.service import AlarmingService
-from app.notifications.service import NotificationService
-from app.assets.repository import AssetRepository
+from app.core_engine.supervisor import ConnectorSupervisor
+from app.telemetry.pipeline import create_ingestion_pipeline
 
 logger = logging.getLogger("app.main")
 
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -31,28 +29,49 @@ async def lifespan(app: FastAPI):
     """
     logger.info("Iniciando aplicación Astruxa...")
     
-    db = SessionLocal()
+    # Nota: no se crea una sesión de BD compartida. Los componentes de background toman
+    # una sesión del pool por lote/tarea con `session_scope()`.
     redis_client = get_redis_client()
     
     # --- Inicialización del Event Broker (EDA) ---
     event_broker = EventBroker(redis_client)
     app.state.event_broker = event_broker
     
-    # --- Inicialización de Servicios ---
-    notification_service = NotificationService(db) # CORRECCIÓN: Solo db
-    audit_service = AuditService(db)
-    asset_repo = AssetRepository(db)
-    
-    # Nota: Verificaremos si AlarmingService necesita corrección también
-    alarming_service = AlarmingService(db, notification_service, asset_repo, audit_service) 
+    # --- Cola de ingesta de telemetría (micro-batching + pool de workers) ---
+    # La comparten la API HTTP y los conectores del Core Engine. Los lotes que fallan se
+    # guardan en el spool en disco y se reenvían cuando la BD se recupera.
+    ingestion_queue, telemetry_spool = create_ingestion_pipeline(settings.TELEMETRY_SPOOL_PATH, event_broker)
+    app.state.telemetry_ingestion_queue = ingestion_queue
 
-    telemetry_service = TelemetryService(db, audit_service)
-    core_engine_service = CoreEngineService(db, telemetry_service, audit_service)
+    core_engine_service = CoreEngineService(
+        db=None, telemetry_service=None, audit_service=None, ingestion_queue=ingestion_queue
+    )
     app.state.core_engine_service = core_engine_service
-    
+
+    # El supervisor decide qué conectores corren (según la BD) y los reinicia si fallan.
+    # Con CORE_ENGINE_RUN_IN_API=False los conectores los ejecuta el runner del Core Engine
+    # (`python -m app.core_engine.runner`) en procesos aparte.
+    connector_supervisor = None
+    if settings.CORE_ENGINE_RUN_IN_API:
+        connector_supervisor = ConnectorSupervisor(
+            core_engine_service,
+            reconcile_interval=settings.CORE_ENGINE_RECONCILE_INTERVAL_SECONDS,
+            failed_after_errors=settings.CORE_ENGINE_FAILED_AFTER_ERRORS,
+            backoff_max=settings.CORE_ENGINE_RESTART_BACKOFF_MAX_SECONDS,
+            max_concurrent_starts=settings.CORE_ENGINE_MAX_CONCURRENT_STARTS,
+            start_timeout=settings.CORE_ENGINE_START_TIMEOUT_SECONDS,
+        )
+        connector_supervisor.subscribe(event_broker)
+    app.state.connector_supervisor = connector_supervisor
+
+    loop_lag_monitor = EventLoopLagMonitor(interval=settings.EVENT_LOOP_LAG_SAMPLE_SECONDS)
+
     # --- Iniciar procesos de background ---
     event_broker.start_listening()
-    await core_engine_service.start_all_connectors()
+    await loop_lag_monitor.start()
+    await ingestion_queue.start()
+    if connector_supervisor is not None:
+        await connector_supervisor.start()
     
     logger.info("Handler de logs de Astruxa para acciones automáticas activado.")
     logger.info("Motor de comunicación (Core Engine) y Event Broker iniciados.")
@@ -60,9 +79,13 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("Apagando aplicación...")
-    await app.state.core_engine_service.stop_all_connectors()
+    if connector_supervisor is not None:
+        await connector_supervisor.stop()
     logger.info("Motor de comunicación (Core Engine) detenido.")
-    db.close()
+    await ingestion_queue.stop()
+    if telemetry_spool is not None:
+        telemetry_spool.close()
+    await loop_lag_monitor.stop()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -0,0 +1,21 @@
+# /app/monitoring/api.py
+"""
+API Router para la monitorización interna del proceso.
+
+Expone el registro de métricas en proceso (cola de ingesta, lag del bucle de eventos, etc.).
+"""
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends
+
+from app.core import permissions as p
+from app.core.metrics import metrics
+from app.dependencies.permissions import require_permission
+
+router = APIRouter(prefix="/monitoring", tags=["Monitoring"])
+
+
+@router.get("/metrics", summary="Métricas internas del proceso", dependencies=[Depends(require_permission(p.SYSTEM_METRICS_READ))])
+def get_metrics() -> Dict[str, Any]:
+    """Devuelve una instantánea de contadores, gauges y resúmenes (p50/p95/p99) del worker que atiende la petición."""
+    return metrics.snapshot()
@@ -4,6 +4,7 @@ API Router para el módulo de Reporting.
 """
 from uuid import UUID
 from datetime import datetime, timedelta
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query
 
 from app.reporting.schemas import MachineStateDTO, StoppageKpisDTO
@@ -11,11 +12,29 @@ from app.reporting.service import ReportingService
 from app.reporting.stoppage_service import StoppageService
 from app.dependencies.services import get_reporting_service, get_stoppage_service
 from app.dependencies.auth import get_current_active_user
+from app.dependencies.tenant import get_tenant_id
 from app.identity.models import User
 
 router = APIRouter(prefix="/reporting", tags=["Reporting"])
 
 
+@router.get(
+    "/machine-state",
+    summary="Obtener el estado actual de todas las máquinas del tenant",
+    response_model=List[MachineStateDTO],
+)
+def get_machine_states(
+    reporting_service: ReportingService = Depends(get_reporting_service),
+    tenant_id: UUID = Depends(get_tenant_id),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Devuelve el estado operacional actual y el instante del último cambio de todas las
+    máquinas del tenant en una sola consulta (pensado para los paneles de planta).
+    """
+    return reporting_service.get_machine_states(tenant_id)
+
+
 @router.get(
     "/machine-state/{asset_id}",
     summary="Obtener el estado actual de una máquina",
@@ -24,13 +43,14 @@ router = APIRouter(prefix="/reporting", tags=["Reporting"])
 def get_machine_state(
     asset_id: UUID,
     reporting_service: ReportingService = Depends(get_reporting_service),
+    tenant_id: UUID = Depends(get_tenant_id),
     current_user: User = Depends(get_current_active_user),
 ):
     """
     Devuelve el estado operacional actual (RUNNING/STOPPED) de una máquina específica.
     Requiere autenticación.
     """
-    return reporting_service.get_machine_state(asset_id)
+    return reporting_service.get_machine_state(tenant_id, asset_id)
 
 
 @router.get(
@@ -4,14 +4,15 @@ Esquemas Pydantic para el módulo de Reporting.
 """
 from uuid import UUID
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
 class MachineStateDTO(BaseModel):
     """Representa el estado operacional actual de una máquina."""
     asset_id: UUID = Field(..., description="ID único del activo.")
-    state: str = Field(..., description="Estado actual (RUNNING, STOPPED, UNKNOWN).")
+    state: str = Field(..., description="Estado actual (RUNNING, STOPPED, UNKNOWN o el de su regla de estado).")
+    since: Optional[datetime] = Field(None, description="Inicio del estado actual (último cambio).")
     
     class Config:
         from_attributes = True
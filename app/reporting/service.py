@@ -2,8 +2,10 @@
 """
 Servicio de Reporting para exponer información de estado y KPIs.
 """
+from typing import List
 from uuid import UUID
-from app.core_engine.state_detector import StateDetector
+from app.core_engine.machine_state_store import MachineStateStore
+from app.core_engine.state_detector import MACHINE_STATE_UNKNOWN
 from app.reporting.schemas import MachineStateDTO
 
 
@@ -12,10 +14,19 @@ class ReportingService:
     Provee acceso a los datos de estado y reportes.
     """
 
-    def __init__(self, state_detector: StateDetector):
-        self.state_detector = state_detector
+    def __init__(self, state_store: MachineStateStore):
+        self.state_store = state_store
 
-    def get_machine_state(self, asset_id: UUID) -> MachineStateDTO:
-        """Obtiene el estado actual de una máquina desde el detector de estado."""
-        current_state = self.state_detector.get_current_state(asset_id)
-        return MachineStateDTO(asset_id=asset_id, state=current_state)
+    def get_machine_state(self, tenant_id: UUID, asset_id: UUID) -> MachineStateDTO:
+        """Obtiene el estado actual de una máquina desde el almacén compartido en Redis."""
+        current = self.state_store.get(tenant_id, asset_id)
+        if current is None:
+            return MachineStateDTO(asset_id=asset_id, state=MACHINE_STATE_UNKNOWN)
+        return MachineStateDTO(asset_id=asset_id, **current)
+
+    def get_machine_states(self, tenant_id: UUID) -> List[MachineStateDTO]:
+        """Estado actual de todas las máquinas del tenant (una sola lectura a Redis)."""
+        return [
+            MachineStateDTO(asset_id=asset_id, **current)
+            for asset_id, current in self.state_store.get_all(tenant_id).items()
+        ]
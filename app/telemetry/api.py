@@ -10,11 +10,26 @@ import uuid
 from datetime import datetime, timedelta
 from typing import List
 
-from fastapi import APIRouter, Depends, status, Query
+from fastapi import APIRouter, Depends, Request, status, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 
+from app.core.config import settings
+from app.core.database import is_data_error
+from app.core.error_messages import ErrorMessages
+from app.core.exceptions import ServiceUnavailableException, ValidationException
 from app.telemetry import schemas
+from app.telemetry.columnar import (
+    MSGPACK_CONTENT_TYPES,
+    ColumnarPayloadError,
+    ColumnarReadings,
+    decode_msgpack_payload,
+)
+from app.telemetry.ingestion_queue import TelemetryIngestionQueue
 from app.telemetry.service import TelemetryService
-from app.dependencies.services import get_telemetry_service
+from app.telemetry.stream_parser import NdjsonReadingParser
+from app.dependencies.services import get_telemetry_service, get_telemetry_ingestion_queue
 # --- MEJORA: Importar dependencias de autenticación y el modelo de usuario ---
 from app.dependencies.auth import get_current_active_user
 from app.identity.models import User
@@ -24,21 +39,173 @@ logger = logging.getLogger("app.telemetry.api")
 router = APIRouter(prefix="/telemetry", tags=["Telemetry"])
 
 
+async def get_readings_batch(request: Request) -> ColumnarReadings:
+    """
+    Decodifica el cuerpo de la ingesta según su Content-Type.
+
+    - `application/json`: `BulkSensorReadingCreate`, validado con Pydantic lectura a lectura.
+    - `application/msgpack`: formato columnar compacto, decodificado directamente a arrays
+      de NumPy sin construir modelos por lectura (ver `app.telemetry.columnar`).
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+
+    if content_type in MSGPACK_CONTENT_TYPES:
+        try:
+            return decode_msgpack_payload(body)
+        except ColumnarPayloadError as e:
+            raise ValidationException(str(e))
+
+    def _parse_json() -> ColumnarReadings:
+        bulk_readings_in = schemas.BulkSensorReadingCreate.model_validate_json(body)
+        return ColumnarReadings.from_readings(bulk_readings_in.readings)
+
+    try:
+        # La validación de JSON es costosa en CPU: se hace fuera del bucle de eventos.
+        return await run_in_threadpool(_parse_json)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
 @router.post(
     "/readings",
     summary="Ingesta masiva de lecturas de sensores",
     status_code=status.HTTP_202_ACCEPTED,
     response_model=schemas.BulkIngestionResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": schemas.BulkSensorReadingCreate.model_json_schema()},
+                "application/msgpack": {
+                    "schema": {"type": "string", "format": "binary"},
+                    "description": "Formato columnar MessagePack (ver app/telemetry/columnar.py).",
+                },
+            },
+        }
+    },
+)
+async def ingest_sensor_readings(
+    batch: ColumnarReadings = Depends(get_readings_batch),
+    ingestion_queue: TelemetryIngestionQueue = Depends(get_telemetry_ingestion_queue),
+):
+    """
+    Encola un lote de lecturas de sensores para su procesamiento asíncrono.
+
+    La detección de estado, la evaluación de alarmas y la escritura en BD las realiza
+    el flusher de la cola en lotes agrupados. Si la cola está llena se responde 503
+    con la cabecera Retry-After.
+    """
+    if not ingestion_queue.offer(batch):
+        logger.warning(f"Cola de ingesta llena ({ingestion_queue.depth} lecturas). Lote de {len(batch)} rechazado.")
+        raise ServiceUnavailableException(
+            ErrorMessages.TELEMETRY_QUEUE_FULL,
+            retry_after=settings.TELEMETRY_QUEUE_RETRY_AFTER_SECONDS,
+        )
+    message = f"{len(batch)} lecturas recibidas y encoladas para procesamiento."
+    logger.debug(message)
+    return schemas.BulkIngestionResponse(message=message, received_count=len(batch))
+
+
+@router.post(
+    "/readings/stream",
+    summary="Ingesta por streaming de lecturas en NDJSON (gzip opcional) para backfills",
+    response_model=schemas.StreamIngestionSummary,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string", "format": "binary"}},
+                "application/gzip": {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
 )
-def ingest_sensor_readings(
-    bulk_readings_in: schemas.BulkSensorReadingCreate,
+async def stream_sensor_readings(
+    request: Request,
     telemetry_service: TelemetryService = Depends(get_telemetry_service),
 ):
-    """Recibe un lote de lecturas de sensores para su procesamiento."""
-    processed_count = telemetry_service.ingest_bulk_readings(bulk_readings_in.readings)
-    message = f"{processed_count} lecturas recibidas y encoladas para procesamiento."
-    logger.info(message)
-    return schemas.BulkIngestionResponse(message=message, received_count=processed_count)
+    """
+    Ingesta un flujo de lecturas, una por línea (`SensorReadingCreate` en JSON), opcionalmente
+    comprimido con gzip.
+
+    El cuerpo se parsea de forma incremental con memoria acotada y las lecturas válidas se
+    escriben en lotes de tamaño fijo a medida que llegan. Las líneas inválidas no detienen
+    la carga: se devuelven en el resumen con su número de línea. Si la BD falla, los lotes
+    anteriores ya están confirmados y el error indica hasta qué línea se persistió: 422 con la
+    línea de la primera lectura que la BD rechaza por sus datos (p. ej. un activo inexistente)
+    y 503 si el error es de la propia BD.
+    """
+    parser = NdjsonReadingParser(max_line_bytes=settings.TELEMETRY_STREAM_MAX_LINE_BYTES)
+    summary = schemas.StreamIngestionSummary(accepted_count=0, rejected_count=0)
+    batch: List[schemas.SensorReadingCreate] = []
+    batch_lines: List[int] = []
+
+    def _collect(parsed):
+        readings, errors = parsed
+        for line, reading in readings:
+            batch.append(reading)
+            batch_lines.append(line)
+        summary.rejected_count += len(errors)
+        room = settings.TELEMETRY_STREAM_MAX_REPORTED_ERRORS - len(summary.rejected_lines)
+        summary.rejected_lines.extend(schemas.RejectedLineDTO(line=l, error=e) for l, e in errors[:max(room, 0)])
+        summary.rejected_lines_truncated |= len(errors) > room
+
+    def _persist(readings: List[schemas.SensorReadingCreate], lines: List[int]):
+        """
+        Escribe `readings`; si la BD rechaza sus datos, las divide por mitades (en orden) hasta
+        confirmar todas las anteriores a la primera inválida y la señala con su línea.
+        """
+        try:
+            summary.accepted_count += telemetry_service.ingest_backfill_batch(readings)
+            return
+        except Exception as e:
+            telemetry_service.db.rollback()
+            if not is_data_error(e):
+                raise
+            if len(readings) == 1:
+                error = str(getattr(e, "orig", e)).splitlines()[0]
+                raise ValidationException(
+                    f"La BD rechazó la lectura de la línea {lines[0]}: {error}. "
+                    f"{summary.accepted_count} lecturas válidas confirmadas en orden; "
+                    f"corrija esa línea y reanude la carga a partir de ella."
+                )
+        middle = len(readings) // 2
+        _persist(readings[:middle], lines[:middle])
+        _persist(readings[middle:], lines[middle:])
+
+    async def _flush(final: bool = False):
+        """Escribe lotes de tamaño fijo; con `final=True` también el resto incompleto."""
+        batch_rows = settings.TELEMETRY_STREAM_BATCH_ROWS
+        while batch and (final or len(batch) >= batch_rows):
+            try:
+                await run_in_threadpool(_persist, batch[:batch_rows], batch_lines[:batch_rows])
+            except ValidationException:
+                raise
+            except Exception as e:
+                logger.error(f"Error persistiendo un lote del backfill (última línea leída: {batch_lines[-1]}): {e}")
+                raise ServiceUnavailableException(
+                    f"Error de base de datos. {summary.accepted_count} lecturas válidas confirmadas en orden; "
+                    f"reanude la carga a partir de la siguiente lectura válida."
+                )
+            del batch[:batch_rows]
+            del batch_lines[:batch_rows]
+
+    try:
+        async for chunk in request.stream():
+            _collect(await run_in_threadpool(parser.feed, chunk))
+            await _flush()
+        _collect(parser.close())
+    except ValueError as e:
+        # Compresión corrupta: se conserva lo ya leído y se informa al cliente.
+        await _flush(final=True)
+        raise ValidationException(f"{e} {summary.accepted_count} lecturas confirmadas hasta la línea {parser.line_number}.")
+    await _flush(final=True)
+
+    logger.info(
+        f"Backfill por streaming completado: {summary.accepted_count} aceptadas, {summary.rejected_count} rechazadas."
+    )
+    return summary
 
 
 @router.get(
@@ -0,0 +1,244 @@
+# /app/telemetry/columnar.py
+"""
+Representación columnar de lotes de lecturas de telemetría.
+
+Un `ColumnarReadings` guarda un lote como arrays de NumPy (códigos de activo y de métrica,
+timestamps en nanosegundos epoch y valores) más dos diccionarios (IDs de activo y nombres
+de métrica). Es el formato interno de la ruta de ingesta: evita construir un objeto por
+lectura y permite escribir en la BD directamente desde los arrays.
+
+También implementa el formato binario compacto de ingesta (MessagePack con columnas):
+
+    {
+        "assets":     ["<uuid>", ...],          # diccionario de activos (str o bin de 16 bytes)
+        "metrics":    ["temperature", ...],     # diccionario de métricas
+        "asset_idx":  bin <u4 | [int, ...],     # código de activo por lectura
+        "metric_idx": bin <u4 | [int, ...],     # código de métrica por lectura
+        "ts_ns":      bin <i8 | [int, ...],     # timestamp epoch en nanosegundos (UTC)
+        "values":     bin <f8 | [float, ...],   # valor de la lectura
+    }
+
+Las columnas en binario son buffers little-endian que se decodifican sin copia con `np.frombuffer`.
+"""
+
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import msgpack
+import numpy as np
+
+from app.telemetry import schemas
+
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+ASSET_CODE_DTYPE = np.dtype("<u4")
+METRIC_CODE_DTYPE = np.dtype("<u4")
+TIMESTAMP_DTYPE = np.dtype("<i8")
+VALUE_DTYPE = np.dtype("<f8")
+
+MAX_METRIC_NAME_LENGTH = 100  # Debe coincidir con SensorReading.metric_name (String(100))
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+class ColumnarPayloadError(ValueError):
+    """El payload columnar está mal formado o es inconsistente."""
+
+
+@dataclass
+class ColumnarReadings:
+    """Lote de lecturas en formato columnar (struct of arrays)."""
+
+    asset_ids: List[uuid.UUID]
+    metric_names: List[str]
+    asset_codes: np.ndarray
+    metric_codes: np.ndarray
+    timestamps_ns: np.ndarray
+    values: np.ndarray
+    source: Optional[str] = None  # Fuente de datos que produjo el lote (None para la API)
+
+    def __len__(self) -> int:
+        return int(self.values.shape[0])
+
+    @classmethod
+    def empty(cls) -> "ColumnarReadings":
+        return cls(
+            asset_ids=[],
+            metric_names=[],
+            asset_codes=np.empty(0, ASSET_CODE_DTYPE),
+            metric_codes=np.empty(0, METRIC_CODE_DTYPE),
+            timestamps_ns=np.empty(0, TIMESTAMP_DTYPE),
+            values=np.empty(0, VALUE_DTYPE),
+        )
+
+    @classmethod
+    def from_readings(
+        cls, readings: Sequence[schemas.SensorReadingCreate], source: Optional[str] = None
+    ) -> "ColumnarReadings":
+        """Convierte lecturas ya validadas (JSON, conectores) al formato columnar."""
+        asset_index: Dict[uuid.UUID, int] = {}
+        metric_index: Dict[str, int] = {}
+        n = len(readings)
+        asset_codes = np.empty(n, ASSET_CODE_DTYPE)
+        metric_codes = np.empty(n, METRIC_CODE_DTYPE)
+        timestamps_ns = np.empty(n, TIMESTAMP_DTYPE)
+        values = np.empty(n, VALUE_DTYPE)
+
+        for i, reading in enumerate(readings):
+            asset_codes[i] = asset_index.setdefault(reading.asset_id, len(asset_index))
+            metric_codes[i] = metric_index.setdefault(reading.metric_name, len(metric_index))
+            timestamps_ns[i] = _datetime_to_ns(reading.timestamp)
+            values[i] = reading.value
+
+        return cls(
+            asset_ids=list(asset_index),
+            metric_names=list(metric_index),
+            asset_codes=asset_codes,
+            metric_codes=metric_codes,
+            timestamps_ns=timestamps_ns,
+            values=values,
+            source=source,
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence["ColumnarReadings"]) -> "ColumnarReadings":
+        """Une varios lotes remapeando sus diccionarios a uno común (conserva `source` si es común)."""
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+
+        asset_index: Dict[uuid.UUID, int] = {}
+        metric_index: Dict[str, int] = {}
+        asset_codes, metric_codes = [], []
+        for batch in batches:
+            asset_map = np.array(
+                [asset_index.setdefault(a, len(asset_index)) for a in batch.asset_ids], ASSET_CODE_DTYPE
+            )
+            metric_map = np.array(
+                [metric_index.setdefault(m, len(metric_index)) for m in batch.metric_names], METRIC_CODE_DTYPE
+            )
+            asset_codes.append(asset_map[batch.asset_codes])
+            metric_codes.append(metric_map[batch.metric_codes])
+
+        return cls(
+            asset_ids=list(asset_index),
+            metric_names=list(metric_index),
+            asset_codes=np.concatenate(asset_codes),
+            metric_codes=np.concatenate(metric_codes),
+            timestamps_ns=np.concatenate([b.timestamps_ns for b in batches]),
+            values=np.concatenate([b.values for b in batches]),
+            source=batches[0].source if len({b.source for b in batches}) == 1 else None,
+        )
+
+    def take(self, indices: np.ndarray) -> "ColumnarReadings":
+        """Devuelve un sub-lote (máscara booleana o índices) que comparte los diccionarios."""
+        return ColumnarReadings(
+            asset_ids=self.asset_ids,
+            metric_names=self.metric_names,
+            asset_codes=self.asset_codes[indices],
+            metric_codes=self.metric_codes[indices],
+            timestamps_ns=self.timestamps_ns[indices],
+            values=self.values[indices],
+            source=self.source,
+        )
+
+    def to_readings(self) -> List[schemas.SensorReadingCreate]:
+        """Materializa el lote como objetos `SensorReadingCreate` (sin revalidar)."""
+        return [
+            schemas.SensorReadingCreate.model_construct(
+                asset_id=self.asset_ids[a],
+                timestamp=_EPOCH + timedelta(microseconds=ts // 1000),
+                metric_name=self.metric_names[m],
+                value=v,
+            )
+            for a, m, ts, v in zip(
+                self.asset_codes.tolist(),
+                self.metric_codes.tolist(),
+                self.timestamps_ns.tolist(),
+                self.values.tolist(),
+            )
+        ]
+
+
+def _datetime_to_ns(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return ((value - _EPOCH) // _ONE_MICROSECOND) * 1000
+
+
+def _column(payload: Dict[str, Any], key: str, dtype: np.dtype) -> np.ndarray:
+    raw = payload.get(key)
+    if raw is None:
+        raise ColumnarPayloadError(f"Falta la columna '{key}'.")
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        if len(raw) % dtype.itemsize:
+            raise ColumnarPayloadError(f"La columna '{key}' no es múltiplo de {dtype.itemsize} bytes.")
+        return np.frombuffer(raw, dtype=dtype)
+    try:
+        return np.asarray(raw, dtype=dtype)
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ColumnarPayloadError(f"La columna '{key}' no es válida: {e}")
+
+
+def _parse_asset_id(raw: Any) -> uuid.UUID:
+    if isinstance(raw, (bytes, bytearray)) and len(raw) == 16:
+        return uuid.UUID(bytes=bytes(raw))
+    return uuid.UUID(str(raw))
+
+
+def decode_msgpack_payload(body: bytes) -> ColumnarReadings:
+    """Decodifica un payload MessagePack columnar en arrays de NumPy, validando su coherencia."""
+    try:
+        payload = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise ColumnarPayloadError(f"MessagePack inválido: {e}")
+    if not isinstance(payload, dict):
+        raise ColumnarPayloadError("El payload debe ser un mapa MessagePack.")
+
+    try:
+        asset_ids = [_parse_asset_id(a) for a in payload.get("assets") or []]
+    except (TypeError, ValueError) as e:
+        raise ColumnarPayloadError(f"Diccionario de activos inválido: {e}")
+    metric_names = [str(m) for m in payload.get("metrics") or []]
+    if any(not m or len(m) > MAX_METRIC_NAME_LENGTH for m in metric_names):
+        raise ColumnarPayloadError(f"Los nombres de métrica deben tener entre 1 y {MAX_METRIC_NAME_LENGTH} caracteres.")
+
+    asset_codes = _column(payload, "asset_idx", ASSET_CODE_DTYPE)
+    metric_codes = _column(payload, "metric_idx", METRIC_CODE_DTYPE)
+    timestamps_ns = _column(payload, "ts_ns", TIMESTAMP_DTYPE)
+    values = _column(payload, "values", VALUE_DTYPE)
+
+    n = values.shape[0]
+    if not (asset_codes.shape[0] == metric_codes.shape[0] == timestamps_ns.shape[0] == n):
+        raise ColumnarPayloadError("Todas las columnas deben tener la misma longitud.")
+    if n and (int(asset_codes.max()) >= len(asset_ids) or int(metric_codes.max()) >= len(metric_names)):
+        raise ColumnarPayloadError("Hay códigos fuera de rango respecto a los diccionarios.")
+
+    return ColumnarReadings(
+        asset_ids=asset_ids,
+        metric_names=metric_names,
+        asset_codes=asset_codes,
+        metric_codes=metric_codes,
+        timestamps_ns=timestamps_ns,
+        values=values,
+    )
+
+
+def encode_msgpack_payload(batch: ColumnarReadings) -> bytes:
+    """Serializa un lote al formato MessagePack columnar (útil para gateways y simuladores)."""
+    return msgpack.packb(
+        {
+            "assets": [str(a) for a in batch.asset_ids],
+            "metrics": list(batch.metric_names),
+            "asset_idx": np.ascontiguousarray(batch.asset_codes, ASSET_CODE_DTYPE).tobytes(),
+            "metric_idx": np.ascontiguousarray(batch.metric_codes, METRIC_CODE_DTYPE).tobytes(),
+            "ts_ns": np.ascontiguousarray(batch.timestamps_ns, TIMESTAMP_DTYPE).tobytes(),
+            "values": np.ascontiguousarray(batch.values, VALUE_DTYPE).tobytes(),
+        },
+        use_bin_type=True,
+    )
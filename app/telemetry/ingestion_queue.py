@@ -0,0 +1,333 @@
+# /app/telemetry/ingestion_queue.py
+"""
+Cola de ingesta en proceso para la telemetría.
+
+Desacopla el throughput HTTP de la latencia de escritura en TimescaleDB: los endpoints
+encolan lotes de lecturas y un flusher en segundo plano los agrupa en lotes grandes
+(por tamaño o por antigüedad) antes de procesarlos fuera del bucle de eventos.
+
+Los conectores del Core Engine usan la misma cola como canal: `put()` espera a que haya
+capacidad (backpressure) y un pool de workers la vacía, cada uno en su propio hilo y con
+su propia sesión de BD, de modo que un commit lento nunca bloquea el bucle de eventos.
+
+Con un `TelemetrySpool`, los lotes que fallan por un error transitorio (BD caída o lenta) se
+guardan en disco y una tarea de reenvío los reescribe cuando la BD se recupera. El reenvío solo
+avanza mientras la cola en vivo está por debajo de un lote completo, así que nunca le quita
+capacidad. Reenvía con `replay_handler`, que solo escribe las lecturas: como en un backfill, los
+datos atrasados no pasan por la detección de estado ni por las alarmas. Los lotes que fallan por
+otros motivos (o que siguen fallando al reenviarlos) se apartan a la cuarentena del spool.
+
+Un lote agrupa chunks de productores distintos. Si la BD lo rechaza por sus datos (p. ej. un
+`asset_id` inexistente), se reintenta chunk a chunk y solo se descartan los chunks inválidos.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Sequence, Tuple
+
+import redis
+
+from app.core.database import is_data_error, is_transient_db_error
+from app.core.metrics import metrics
+from app.telemetry.columnar import ColumnarReadings
+from app.telemetry.spool import SpoolBatch, TelemetrySpool
+
+logger = logging.getLogger("app.telemetry.ingestion_queue")
+
+# Un "chunk" es cualquier secuencia de lecturas encolada por un productor.
+BatchHandler = Callable[[List[Sequence]], int]
+
+
+class TelemetryIngestionQueue:
+    """
+    Cola acotada (en número de lecturas) con micro-batching.
+
+    - `offer()` nunca bloquea: devuelve False si la cola está llena para que el llamador
+      pueda responder con 429/503.
+    - `put()` espera a que haya capacidad; lo usan los productores internos (conectores).
+    - `workers` flushers vacían la cola cuando se acumulan `batch_max_rows` lecturas o cuando
+      el chunk más antiguo supera `batch_max_delay` segundos, y entregan los chunks agrupados
+      a `batch_handler` en un hilo del pool por defecto.
+    - Los lotes del spool se reescriben con `replay_handler` (por defecto, `batch_handler`).
+    """
+
+    def __init__(
+        self,
+        batch_handler: BatchHandler,
+        max_rows: int,
+        batch_max_rows: int,
+        batch_max_delay: float,
+        workers: int = 1,
+        spool: Optional[TelemetrySpool] = None,
+        replay_batch_rows: int = 20_000,
+        replay_interval: float = 1.0,
+        replay_max_backoff: float = 30.0,
+        replay_handler: Optional[BatchHandler] = None,
+        replay_max_attempts: int = 5,
+    ):
+        self.batch_handler = batch_handler
+        self.replay_handler = replay_handler or batch_handler
+        self.replay_max_attempts = replay_max_attempts
+        self.max_rows = max_rows
+        self.batch_max_rows = batch_max_rows
+        self.batch_max_delay = batch_max_delay
+        self.workers = workers
+        self.spool = spool
+        self.replay_batch_rows = replay_batch_rows
+        self.replay_interval = replay_interval
+        self.replay_max_backoff = replay_max_backoff
+
+        self._chunks: Deque[Tuple[float, Sequence]] = deque()
+        self._rows = 0
+        self._not_empty = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._replay_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def depth(self) -> int:
+        """Número de lecturas actualmente encoladas."""
+        return self._rows
+
+    def offer(self, chunk: Sequence) -> bool:
+        """Encola un chunk de lecturas si hay capacidad. Devuelve False si la cola está llena."""
+        if self._try_enqueue(chunk):
+            return True
+        metrics.inc("telemetry_ingest_rejected_rows", len(chunk))
+        return False
+
+    async def put(self, chunk: Sequence) -> bool:
+        """
+        Encola un chunk esperando a que haya capacidad.
+
+        Devuelve False solo si la cola se está cerrando. Un chunk mayor que la capacidad
+        total se acepta cuando la cola está vacía para que nunca quede bloqueado para siempre.
+        """
+        while not self._try_enqueue(chunk, allow_oversized=True):
+            if self._closing:
+                return False
+            self._space_available.clear()
+            await self._space_available.wait()
+        return True
+
+    def _try_enqueue(self, chunk: Sequence, allow_oversized: bool = False) -> bool:
+        size = len(chunk)
+        if size == 0:
+            return True
+        if self._closing:
+            return False
+        fits = self._rows + size <= self.max_rows or (allow_oversized and self._rows == 0)
+        if not fits:
+            return False
+        self._chunks.append((asyncio.get_running_loop().time(), chunk))
+        self._rows += size
+        metrics.set_gauge("telemetry_ingest_queue_rows", self._rows)
+        self._not_empty.set()
+        if self._rows >= self.batch_max_rows:
+            self._batch_ready.set()
+        return True
+
+    async def start(self):
+        logger.info(
+            f"Iniciando cola de ingesta (capacidad={self.max_rows}, lote={self.batch_max_rows}, "
+            f"espera máx={self.batch_max_delay * 1000:.0f} ms, workers={self.workers})"
+        )
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        if self.spool is not None:
+            self._replay_task = asyncio.create_task(self._replay())
+
+    async def stop(self):
+        """Deja de aceptar lecturas y vacía lo pendiente antes de terminar."""
+        logger.info(f"Deteniendo cola de ingesta ({self._rows} lecturas pendientes)...")
+        self._closing = True
+        self._batch_ready.set()
+        self._not_empty.set()
+        self._space_available.set()
+        if self._replay_task:
+            self._replay_task.cancel()
+            try:
+                await self._replay_task
+            except asyncio.CancelledError:
+                pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+        logger.info("Cola de ingesta detenida.")
+
+    def _take_batch(self) -> List[Sequence]:
+        """Extrae chunks completos hasta `batch_max_rows` lecturas (al menos uno)."""
+        batch: List[Sequence] = []
+        taken = 0
+        while self._chunks:
+            chunk = self._chunks[0][1]
+            if batch and taken + len(chunk) > self.batch_max_rows:
+                break
+            self._chunks.popleft()
+            batch.append(chunk)
+            taken += len(chunk)
+        self._rows -= taken
+        metrics.set_gauge("telemetry_ingest_queue_rows", self._rows)
+        self._space_available.set()
+        if not self._chunks:
+            self._not_empty.clear()
+        if self._rows < self.batch_max_rows:
+            self._batch_ready.clear()
+        return batch
+
+    async def _wait_for_batch(self):
+        """Espera hasta que haya un lote lleno o el chunk más antiguo alcance su edad máxima."""
+        loop = asyncio.get_running_loop()
+        deadline = self._chunks[0][0] + self.batch_max_delay
+        while not self._closing and self._rows < self.batch_max_rows:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def _run(self):
+        while True:
+            if self._closing and not self._chunks:
+                return
+            await self._not_empty.wait()
+            if not self._chunks:
+                if not self._closing:
+                    self._not_empty.clear()
+                continue
+
+            await self._wait_for_batch()
+            batch = self._take_batch()
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: List[Sequence]):
+        """Procesa un lote; si la BD rechaza sus datos, lo reintenta chunk a chunk."""
+        rows = sum(len(chunk) for chunk in batch)
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.batch_handler, batch)
+        except Exception as e:
+            if is_data_error(e) and len(batch) > 1:
+                logger.warning(
+                    f"La BD rechazó un lote de {rows} lecturas ({len(batch)} chunks) por sus datos; "
+                    f"se reintenta chunk a chunk para descartar solo los inválidos: {e}"
+                )
+                for chunk in batch:
+                    await self._write([chunk])
+            elif is_data_error(e):
+                _discard_invalid(batch[0], e)
+            else:
+                metrics.inc("telemetry_ingest_failed_rows", rows)
+                logger.error(f"Error procesando un lote de {rows} lecturas de la cola de ingesta: {e}", exc_info=True)
+                if _is_transient(e):
+                    await self._spool_failed(batch)
+                else:
+                    await self._quarantine(batch)
+            return
+        metrics.inc("telemetry_ingest_flushed_rows", rows)
+        metrics.observe("telemetry_ingest_batch_rows", rows)
+        metrics.observe("telemetry_ingest_batch_seconds", time.perf_counter() - started)
+
+    async def _spool_failed(self, batch: List[Sequence]):
+        """Guarda en disco un lote que no se pudo escribir para reenviarlo más tarde."""
+        if self.spool is None:
+            return
+        try:
+            for chunk in batch:
+                await asyncio.to_thread(self.spool.append, _columnar(chunk))
+        except Exception as e:
+            logger.critical(f"No se pudo guardar el lote fallido en el spool; las lecturas se pierden: {e}", exc_info=True)
+
+    async def _quarantine(self, batch: List[Sequence]):
+        """Aparta un lote que falla por un motivo no transitorio (reintentarlo fallaría igual)."""
+        if self.spool is None:
+            return
+        try:
+            for chunk in batch:
+                await asyncio.to_thread(self.spool.quarantine, _columnar(chunk))
+            logger.error(f"{sum(len(chunk) for chunk in batch)} lecturas apartadas a la cuarentena del spool.")
+        except Exception as e:
+            logger.critical(f"No se pudo apartar el lote a la cuarentena; las lecturas se pierden: {e}", exc_info=True)
+
+    async def _replay(self):
+        """Reenvía lo acumulado en el spool sin competir con la ingesta en vivo."""
+        delay = self.replay_interval
+        spool_batch: Optional[SpoolBatch] = None  # Leído del spool y aún sin confirmar
+        attempts = 0
+        while True:
+            await asyncio.sleep(delay)
+            if self._rows >= self.batch_max_rows or (spool_batch is None and not self.spool.has_pending()):
+                delay = self.replay_interval
+                continue
+            if spool_batch is None:
+                spool_batch = await asyncio.to_thread(self.spool.read, self.replay_batch_rows)
+                attempts = 0
+                if spool_batch is None:
+                    continue
+            rows = spool_batch.rows
+            try:
+                await self._replay_batch(spool_batch)
+            except Exception as e:
+                attempts += 1
+                if _is_transient(e) or attempts < self.replay_max_attempts:
+                    delay = min(max(delay, self.replay_interval) * 2, self.replay_max_backoff)
+                    logger.warning(f"Reenvío del spool fallido ({rows} lecturas); reintento en {delay:.0f}s: {e}")
+                    continue
+                logger.error(f"El reenvío de {rows} lecturas del spool falló {attempts} veces; se aparta a cuarentena: {e}")
+                await self._quarantine(spool_batch.batches)
+                spool_batch.batches = []
+            await asyncio.to_thread(self.spool.commit, spool_batch)
+            spool_batch = None
+            logger.info(f"Reenviadas {rows} lecturas desde el spool de telemetría.")
+            # Mientras quede atraso se sigue sin esperar, cediendo el bucle entre lotes.
+            delay = 0 if self.spool.has_pending() else self.replay_interval
+
+    async def _replay_batch(self, spool_batch: SpoolBatch):
+        """
+        Reescribe un lote del spool. Si la BD rechaza sus datos, lo reintenta chunk a chunk
+        descartando los inválidos; los chunks ya escritos salen de `spool_batch.batches` para no
+        duplicarlos si un fallo posterior obliga a reintentar el resto.
+        """
+        chunks = list(spool_batch.batches)
+        if not chunks:
+            return
+        try:
+            await asyncio.to_thread(self.replay_handler, chunks)
+            metrics.inc("telemetry_spool_replayed_rows", sum(len(chunk) for chunk in chunks))
+            return
+        except Exception as e:
+            if not is_data_error(e):
+                raise
+            if len(chunks) == 1:
+                _discard_invalid(chunks[0], e)
+                spool_batch.batches.clear()
+                return
+            logger.warning(f"La BD rechazó un lote del spool por sus datos; se reintenta chunk a chunk: {e}")
+        for chunk in chunks:
+            try:
+                await asyncio.to_thread(self.replay_handler, [chunk])
+                metrics.inc("telemetry_spool_replayed_rows", len(chunk))
+            except Exception as e:
+                if not is_data_error(e):
+                    raise
+                _discard_invalid(chunk, e)
+            spool_batch.batches.remove(chunk)
+
+
+def _discard_invalid(chunk: Sequence, error: BaseException):
+    metrics.inc("telemetry_ingest_invalid_rows", len(chunk))
+    logger.error(f"Chunk de {len(chunk)} lecturas descartado por datos inválidos: {error}")
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Fallo de disponibilidad (BD o Redis) que se resuelve reintentando más tarde."""
+    return is_transient_db_error(error) or isinstance(error, (redis.ConnectionError, redis.TimeoutError))
+
+
+def _columnar(chunk: Sequence) -> ColumnarReadings:
+    return chunk if isinstance(chunk, ColumnarReadings) else ColumnarReadings.from_readings(chunk)
@@ -0,0 +1,134 @@
+# /app/telemetry/pipeline.py
+"""
+Construcción de la ruta de ingesta en segundo plano (cola + workers + spool en disco).
+
+La usan tanto el proceso de la API (`app/main.py`) como los procesos del runner del Core
+Engine (`app/core_engine/runner.py`), cada uno con su propia cola y su propio spool.
+"""
+
+import functools
+import logging
+import os
+from typing import Optional, Tuple
+
+from app.alarming.active_alarms import ACTIVE_ALARMS_EVENTS_CHANNEL, active_alarm_store
+from app.alarming.rule_index import ALARM_RULES_EVENTS_CHANNEL, alarm_rule_index
+from app.alarming.service import AlarmingService
+from app.alarming.stream import AlarmStreamPublisher
+from app.assets.repository import AssetRepository
+from app.auditing.service import AuditService
+from app.core.config import settings
+from app.core.database import session_scope
+from app.core.event_broker import EventBroker
+from app.core.redis import get_redis_binary_client, get_redis_client
+from app.core_engine.machine_state_store import MachineStateStore
+from app.core_engine.service import STATE_RULES_EVENTS_CHANNEL
+from app.core_engine.state_detector import StateDetector, StateRuleCache
+from app.notifications.service import NotificationService
+from app.telemetry.columnar import ColumnarReadings
+from app.telemetry.ingestion_queue import TelemetryIngestionQueue
+from app.telemetry.service import TelemetryService
+from app.telemetry.spool import SpoolLockedError, TelemetrySpool
+
+logger = logging.getLogger("app.telemetry.pipeline")
+
+# Directorios `worker-<n>` que se prueban bajo la ruta del spool (procesos por máquina).
+_SPOOL_SLOTS = 64
+
+
+def ingest_telemetry_batch(
+    chunks, state_detector: Optional[StateDetector] = None, alarm_stream: Optional[AlarmStreamPublisher] = None
+) -> int:
+    """
+    Procesa un lote agrupado por la cola de ingesta (se ejecuta fuera del bucle de eventos).
+
+    Cada lote usa su propia sesión para no compartir la conexión con las peticiones HTTP
+    ni con los demás workers de ingesta. Lecturas, cambios de estado y alarmas se confirman juntos.
+    Con `alarm_stream`, las alarmas no se evalúan aquí: el lote se publica una vez confirmado
+    para el evaluador de alarmas dedicado.
+    """
+    batch = ColumnarReadings.concat(chunks)
+    with session_scope() as db:
+        audit_service = AuditService(db)
+        alarming_service = None
+        if alarm_stream is None:
+            alarming_service = AlarmingService(db, NotificationService(db), AssetRepository(db), audit_service)
+        rows = TelemetryService(
+            db, audit_service, alarming_service=alarming_service, state_detector=state_detector
+        ).ingest_columnar(batch)
+    if alarm_stream is not None:
+        alarm_stream.publish(batch)
+    return rows
+
+
+def replay_telemetry_batch(chunks) -> int:
+    """
+    Reescribe un lote reenviado desde el spool. Solo lo persiste: son datos atrasados y, como
+    en un backfill, no deben alterar el estado actual de las máquinas ni disparar alarmas.
+    """
+    with session_scope() as db:
+        return TelemetryService(db, AuditService(db)).ingest_backfill_columnar(ColumnarReadings.concat(chunks))
+
+
+def open_telemetry_spool(spool_path: str) -> Optional[TelemetrySpool]:
+    """
+    Abre el spool del proceso en el primer `spool_path/worker-<n>` que no use otro proceso.
+
+    Los workers de uvicorn/gunicorn (y los procesos del runner) comparten `spool_path`, pero cada
+    uno escribe y reenvía solo su directorio. Un proceso que se reinicia recupera un directorio
+    libre, y con él lo que otro proceso terminado dejara pendiente. Si no queda ninguno libre, el
+    proceso funciona sin spool.
+    """
+    for slot in range(_SPOOL_SLOTS):
+        try:
+            return TelemetrySpool(
+                os.path.join(spool_path, f"worker-{slot}"),
+                max_bytes=settings.TELEMETRY_SPOOL_MAX_MB * 1024 * 1024,
+                segment_bytes=settings.TELEMETRY_SPOOL_SEGMENT_MB * 1024 * 1024,
+            )
+        except SpoolLockedError:
+            continue
+    logger.error(f"Los {_SPOOL_SLOTS} directorios del spool en {spool_path} están en uso; este proceso no tendrá spool.")
+    return None
+
+
+def create_ingestion_pipeline(
+    spool_path: str, event_broker: Optional[EventBroker] = None
+) -> Tuple[TelemetryIngestionQueue, Optional[TelemetrySpool]]:
+    """
+    Crea la cola de ingesta configurada y, si está habilitado, su spool bajo `spool_path`
+    (ver `open_telemetry_spool`).
+
+    Con `event_broker`, el detector de estado y el índice de reglas de alarma se recargan en
+    cuanto se modifican sus reglas, y las alarmas reconocidas dejan de contar como activas (debe
+    llamarse antes de `event_broker.start_listening()`). Con `ALARM_STREAM_ENABLED` las alarmas
+    las evalúa `app/alarming/runner.py` y la ingesta solo publica los lotes.
+    """
+    spool = open_telemetry_spool(spool_path) if settings.TELEMETRY_SPOOL_ENABLED else None
+    # El detector guarda el estado de los activos entre lotes: uno por cola de ingesta.
+    state_detector = StateDetector(
+        rules=StateRuleCache(settings.CORE_ENGINE_STATE_RULES_RELOAD_SECONDS),
+        state_store=MachineStateStore(get_redis_client()),
+    )
+    alarm_stream = None
+    if settings.ALARM_STREAM_ENABLED:
+        alarm_stream = AlarmStreamPublisher(
+            get_redis_binary_client(), settings.ALARM_STREAM_PARTITIONS, settings.ALARM_STREAM_MAXLEN
+        )
+    if event_broker is not None:
+        event_broker.subscribe(STATE_RULES_EVENTS_CHANNEL, state_detector.on_rules_changed)
+        if alarm_stream is None:
+            event_broker.subscribe(ALARM_RULES_EVENTS_CHANNEL, alarm_rule_index.on_rules_changed)
+            event_broker.subscribe(ACTIVE_ALARMS_EVENTS_CHANNEL, active_alarm_store.on_alarms_changed)
+    queue = TelemetryIngestionQueue(
+        batch_handler=functools.partial(ingest_telemetry_batch, state_detector=state_detector, alarm_stream=alarm_stream),
+        max_rows=settings.TELEMETRY_QUEUE_MAX_ROWS,
+        batch_max_rows=settings.TELEMETRY_BATCH_MAX_ROWS,
+        batch_max_delay=settings.TELEMETRY_BATCH_MAX_DELAY_MS / 1000,
+        workers=settings.TELEMETRY_INGEST_WORKERS,
+        spool=spool,
+        replay_batch_rows=settings.TELEMETRY_SPOOL_REPLAY_BATCH_ROWS,
+        replay_handler=replay_telemetry_batch,
+        replay_max_attempts=settings.TELEMETRY_SPOOL_REPLAY_MAX_ATTEMPTS,
+    )
+    return queue, spool
@@ -5,14 +5,74 @@ Capa de Repositorio para el módulo de Telemetría.
 Optimizado para la inserción masiva y la consulta agregada de datos de series temporales.
 """
 
-from typing import List, Any
+from typing import List, Any, Iterable, Iterator, Tuple
+import struct
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 
+import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy import func, label
 
 from app.telemetry import models, schemas
+from app.telemetry.columnar import ColumnarReadings
+
+# Orden de columnas usado por las rutas COPY (coincide con el orden físico de la tabla).
+SENSOR_READING_COPY_COLUMNS = ("timestamp", "asset_id", "metric_name", "value")
+SENSOR_READING_COPY_TYPES = ("timestamptz", "uuid", "text", "float8")
+
+# --- Formato binario de COPY de PostgreSQL ---
+_PG_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_PG_COPY_TRAILER = struct.pack("!h", -1)
+_PG_EPOCH_OFFSET_US = 946_684_800_000_000  # 2000-01-01 - 1970-01-01 en microsegundos
+_COPY_ENCODE_CHUNK_ROWS = 50_000
+
+
+def _iter_binary_copy(batch: ColumnarReadings) -> Iterator[bytes]:
+    """
+    Codifica un lote columnar en el formato binario de COPY sin iterar fila a fila.
+
+    Cada tupla tiene ancho fijo salvo `metric_name`; agrupando las filas por métrica, todas
+    las tuplas de un grupo tienen la misma longitud y pueden construirse como un array
+    estructurado de NumPy. El orden de inserción no importa para la tabla.
+    """
+    yield _PG_COPY_HEADER
+    uuid_bytes = np.frombuffer(b"".join(a.bytes for a in batch.asset_ids), dtype="V16")
+    encoded_names = [name.encode("utf-8") for name in batch.metric_names]
+
+    for start in range(0, len(batch), _COPY_ENCODE_CHUNK_ROWS):
+        chunk = slice(start, start + _COPY_ENCODE_CHUNK_ROWS)
+        metric_codes = batch.metric_codes[chunk]
+        order = np.argsort(metric_codes, kind="stable")
+        boundaries = np.flatnonzero(np.diff(metric_codes[order])) + 1
+        for group in np.split(order, boundaries):
+            if not group.size:
+                continue
+            name = encoded_names[int(metric_codes[group[0]])]
+            fields = [
+                ("n_fields", ">i2"),
+                ("ts_len", ">i4"), ("ts", ">i8"),
+                ("asset_len", ">i4"), ("asset", "V16"),
+                ("metric_len", ">i4"),
+            ]
+            if name:
+                fields.append(("metric", f"S{len(name)}"))
+            fields += [("value_len", ">i4"), ("value", ">f8")]
+
+            rows = np.empty(group.size, dtype=np.dtype(fields))
+            rows["n_fields"] = len(SENSOR_READING_COPY_COLUMNS)
+            rows["ts_len"] = 8
+            rows["ts"] = batch.timestamps_ns[chunk][group] // 1000 - _PG_EPOCH_OFFSET_US
+            rows["asset_len"] = 16
+            rows["asset"] = uuid_bytes[batch.asset_codes[chunk][group]]
+            rows["metric_len"] = len(name)
+            if name:
+                rows["metric"] = name
+            rows["value_len"] = 8
+            rows["value"] = batch.values[chunk][group]
+            yield rows.tobytes()
+
+    yield _PG_COPY_TRAILER
 
 
 class TelemetryRepository:
@@ -29,6 +89,60 @@ class TelemetryRepository:
         self.db.commit()
         return len(db_objects)
 
+    def copy_bulk_readings(self, readings_in: List[schemas.SensorReadingCreate]) -> int:
+        """
+        Inserta un lote de lecturas mediante `COPY ... FROM STDIN` en formato binario.
+
+        Evita por completo la construcción de objetos ORM y el unit-of-work de la sesión:
+        las filas se envían directamente al servidor a través de la conexión psycopg 3
+        subyacente, dentro de la transacción de la sesión actual.
+        """
+        rows = ((r.timestamp, r.asset_id, r.metric_name, r.value) for r in readings_in)
+        count = self.copy_rows(rows)
+        self.db.commit()
+        return count
+
+    def copy_rows(self, rows: Iterable[Tuple[datetime, uuid.UUID, str, float]]) -> int:
+        """
+        Escribe tuplas (timestamp, asset_id, metric_name, value) en `sensor_readings` con COPY.
+
+        No confirma la transacción; el llamador decide cuándo hacer commit. Los timestamps sin
+        zona horaria se interpretan como UTC (igual que en la ruta columnar).
+        """
+        columns = ", ".join(SENSOR_READING_COPY_COLUMNS)
+        statement = f"COPY {models.SensorReading.__tablename__} ({columns}) FROM STDIN (FORMAT BINARY)"
+        count = 0
+        with self._raw_connection().cursor() as cursor:
+            with cursor.copy(statement) as copy:
+                copy.set_types(list(SENSOR_READING_COPY_TYPES))
+                for timestamp, asset_id, metric_name, value in rows:
+                    if timestamp.tzinfo is None:
+                        timestamp = timestamp.replace(tzinfo=timezone.utc)
+                    copy.write_row((timestamp, asset_id, metric_name, value))
+                    count += 1
+        return count
+
+    def copy_columnar_readings(self, batch: ColumnarReadings) -> int:
+        """
+        Inserta un lote columnar con COPY binario codificado directamente desde los arrays.
+
+        Es la ruta de escritura principal de la ingesta: no crea objetos por lectura.
+        """
+        if not len(batch):
+            return 0
+        columns = ", ".join(SENSOR_READING_COPY_COLUMNS)
+        statement = f"COPY {models.SensorReading.__tablename__} ({columns}) FROM STDIN (FORMAT BINARY)"
+        with self._raw_connection().cursor() as cursor:
+            with cursor.copy(statement) as copy:
+                for block in _iter_binary_copy(batch):
+                    copy.write(block)
+        self.db.commit()
+        return len(batch)
+
+    def _raw_connection(self):
+        """Devuelve la conexión psycopg 3 nativa ligada a la transacción de la sesión."""
+        return self.db.connection().connection.driver_connection
+
     def get_aggregated_readings_for_asset(
         self,
         asset_id: uuid.UUID,
@@ -40,6 +40,24 @@ class BulkIngestionResponse(BaseModel):
     received_count: int = Field(..., example=25)
 
 
+# --- Esquemas para Ingesta por Streaming (Backfills) ---
+
+class RejectedLineDTO(BaseModel):
+    """Una línea del flujo NDJSON que no pudo ingestarse."""
+    line: int = Field(..., example=42, description="Número de línea (empezando en 1).")
+    error: str = Field(..., example="value: Input should be a valid number")
+
+
+class StreamIngestionSummary(BaseModel):
+    """Resumen de una ingesta por streaming."""
+    accepted_count: int = Field(..., example=1_000_000)
+    rejected_count: int = Field(..., example=3)
+    rejected_lines: List[RejectedLineDTO] = Field(default_factory=list)
+    rejected_lines_truncated: bool = Field(
+        False, description="True si hubo más líneas erróneas de las detalladas en `rejected_lines`."
+    )
+
+
 # --- DTO para Consultas de Dashboard (Salida) ---
 
 class AggregatedReadingDTO(BaseModel):
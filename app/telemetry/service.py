@@ -12,6 +12,7 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 
 from app.telemetry import schemas
+from app.telemetry.columnar import ColumnarReadings
 from app.telemetry.repository import TelemetryRepository
 from app.auditing.service import AuditService
 from app.identity.models import User
@@ -36,24 +37,40 @@ class TelemetryService:
         self.telemetry_repo = TelemetryRepository(self.db)
 
     def ingest_bulk_readings(self, readings_in: List[schemas.SensorReadingCreate]) -> int:
+        """Ingesta una lista de lecturas ya validadas convirtiéndola al formato columnar."""
+        return self.ingest_columnar(ColumnarReadings.from_readings(readings_in))
+
+    def ingest_columnar(self, batch: ColumnarReadings) -> int:
         """
-        Ingesta un lote de lecturas de sensores, las procesa para detectar cambios de estado
+        Ingesta un lote columnar de lecturas, las procesa para detectar cambios de estado
         y las evalúa contra las reglas de alarma.
         """
-        # 1. Detección de estado en tiempo real
+        # 1. Detección de estado en tiempo real (vectorizada; se confirma con el COPY)
         if self.state_detector:
-            for reading in readings_in:
-                self.state_detector.process_reading(reading)
+            self.state_detector.process_batch(batch, self.db)
 
         # 2. Evaluación de reglas de alarma
         if self.alarming_service:
-            self.alarming_service.evaluate_readings(readings_in)
-            
-        # 3. Persistir en la base de datos (TimescaleDB)
-        count = self.telemetry_repo.create_bulk_readings(readings_in)
-        
+            self.alarming_service.evaluate_batch(batch)
+
+        # 3. Persistir en la base de datos (TimescaleDB) vía COPY binario desde los arrays
+        count = self.telemetry_repo.copy_columnar_readings(batch)
+
         return count
 
+    def ingest_backfill_batch(self, readings_in: List[schemas.SensorReadingCreate]) -> int:
+        """
+        Persiste un lote de lecturas históricas (backfill).
+
+        No pasa por la detección de estado ni por las alarmas: son datos del pasado y
+        no deben alterar el estado actual de las máquinas ni disparar notificaciones.
+        """
+        return self.ingest_backfill_columnar(ColumnarReadings.from_readings(readings_in))
+
+    def ingest_backfill_columnar(self, batch: ColumnarReadings) -> int:
+        """Persiste un lote columnar de lecturas atrasadas (backfill o reenvío del spool) solo con el COPY."""
+        return self.telemetry_repo.copy_columnar_readings(batch)
+
     def get_aggregated_readings(
         self,
         asset_id: uuid.UUID,
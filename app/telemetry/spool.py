@@ -0,0 +1,320 @@
+# /app/telemetry/spool.py
+"""
+Buffer local de almacenamiento y reenvío (store-and-forward) para la telemetría.
+
+Cuando un lote de la cola de ingesta no se puede escribir (PostgreSQL caído o saturado), se
+persiste en disco en lugar de perderse, y se reenvía en lotes grandes cuando la BD vuelve.
+
+Formato en disco: segmentos `segment-<n>.spool` de tamaño fijo, preasignados y mapeados en
+memoria (mmap), en los que solo se añade al final. Cada registro es:
+
+    cabecera <4sIIH>: magia b"ASF1", longitud del payload, CRC32 del payload, longitud de la fuente
+    fuente (utf-8) + payload (MessagePack columnar, ver `columnar.encode_msgpack_payload`)
+
+Un registro con la magia a cero marca el final de los datos de un segmento. El cursor de
+lectura (segmento, desplazamiento) se guarda en `state.json` (escritura atómica).
+
+Un directorio de spool es de un solo proceso: al abrirlo se toma un `flock` exclusivo sobre
+`spool.lock` y, si otro proceso lo tiene, se lanza `SpoolLockedError` (ver
+`pipeline.open_telemetry_spool`, que reparte un directorio por proceso).
+
+- Uso de disco acotado: si un segmento nuevo superaría `max_bytes`, se descarta el más antiguo
+  (aunque no se haya reenviado) y se contabiliza en `telemetry_spool_dropped_segments`.
+- Cuarentena: los lotes que fallan de forma persistente (no por una caída de la BD) se apartan,
+  con el mismo formato de registro, en `quarantine.spool` para revisarlos a mano en lugar de
+  bloquear el reenvío de todo lo posterior.
+- Lo ya reenviado se reconoce solo por su posición en el spool (el cursor), nunca por los
+  timestamps de las lecturas: con varios workers de ingesta los lotes fallidos llegan al spool
+  desordenados, y cada nodo OPC UA trae su propio timestamp de origen. Si el proceso muere
+  entre el commit en la BD y la actualización del cursor, el último lote leído se reenvía otra
+  vez (entrega al menos una vez).
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.core.metrics import metrics
+from app.telemetry.columnar import ColumnarReadings, decode_msgpack_payload, encode_msgpack_payload
+
+logger = logging.getLogger("app.telemetry.spool")
+
+RECORD_MAGIC = b"ASF1"
+_HEADER = struct.Struct("<4sIIH")
+_STATE_FILE = "state.json"
+_LOCK_FILE = "spool.lock"
+_QUARANTINE_FILE = "quarantine.spool"
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".spool"
+
+Position = Tuple[int, int]  # (número de segmento, desplazamiento)
+
+
+class SpoolLockedError(RuntimeError):
+    """El directorio del spool ya lo usa otro proceso."""
+
+
+@dataclass
+class SpoolBatch:
+    """Lote leído del spool pendiente de confirmar con `commit()`."""
+
+    batches: List[ColumnarReadings]
+    end: Position
+
+    @property
+    def rows(self) -> int:
+        return sum(len(b) for b in self.batches)
+
+
+class _Segment:
+    """Un fichero de segmento mapeado en memoria."""
+
+    def __init__(self, path: str, size: int, create: bool):
+        self.path = path
+        self._file = open(path, "w+b" if create else "r+b")
+        if create:
+            self._file.truncate(size)
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.map = mmap.mmap(self._file.fileno(), self.size)
+
+    def close(self):
+        self.map.close()
+        self._file.close()
+
+
+class TelemetrySpool:
+    """Spool en disco de lotes columnares. Thread-safe (lo usan los workers de ingesta)."""
+
+    def __init__(self, directory: str, max_bytes: int, segment_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._open: Dict[int, _Segment] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, _LOCK_FILE), "a")
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise SpoolLockedError(f"El spool {directory} ya lo usa otro proceso.")
+
+        state = self._load_state()
+        self._segments: List[int] = sorted(self._list_segments())
+        self._read: Position = tuple(state.get("read", (self._segments[0] if self._segments else 0, 0)))
+
+        # Los segmentos anteriores al cursor ya se reenviaron.
+        for seq in [s for s in self._segments if s < self._read[0]]:
+            self._delete_segment(seq)
+        if not self._segments:
+            self._read = (self._read[0], 0)
+        elif self._read[0] not in self._segments:
+            self._read = (self._segments[0], 0)
+
+        if self._segments:
+            self._write_seq = self._segments[-1]
+            self._write_pos = self._scan_end(self._segment(self._write_seq))
+        else:
+            self._write_seq = self._read[0]
+            self._write_pos = 0
+            self._create_segment(self._write_seq, self.segment_bytes)
+        self._update_gauges()
+        if self.has_pending():
+            logger.warning(f"Spool de telemetría con datos pendientes de reenviar en {directory}.")
+
+    # --- Estado y segmentos ---
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{seq:010d}{_SEGMENT_SUFFIX}")
+
+    def _list_segments(self) -> List[int]:
+        seqs = []
+        for name in os.listdir(self.directory):
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+                seqs.append(int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]))
+        return seqs
+
+    def _load_state(self) -> dict:
+        try:
+            with open(os.path.join(self.directory, _STATE_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Estado del spool ilegible, se reenvía desde el primer segmento: {e}")
+            return {}
+
+    def _save_state(self):
+        path = os.path.join(self.directory, _STATE_FILE)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"read": list(self._read)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _segment(self, seq: int) -> _Segment:
+        segment = self._open.get(seq)
+        if segment is None:
+            segment = self._open[seq] = _Segment(self._segment_path(seq), 0, create=False)
+        return segment
+
+    def _create_segment(self, seq: int, size: int):
+        self._open[seq] = _Segment(self._segment_path(seq), size, create=True)
+        if seq not in self._segments:
+            self._segments.append(seq)
+
+    def _delete_segment(self, seq: int):
+        segment = self._open.pop(seq, None)
+        if segment is not None:
+            segment.close()
+        try:
+            os.remove(self._segment_path(seq))
+        except FileNotFoundError:
+            pass
+        if seq in self._segments:
+            self._segments.remove(seq)
+
+    def _disk_bytes(self) -> int:
+        return sum(os.path.getsize(self._segment_path(seq)) for seq in self._segments)
+
+    @staticmethod
+    def _record_at(segment: _Segment, offset: int) -> Optional[Tuple[str, bytes, int]]:
+        """Devuelve (fuente, payload, siguiente offset) o None si no hay un registro válido."""
+        if offset + _HEADER.size > segment.size:
+            return None
+        magic, length, crc, source_len = _HEADER.unpack_from(segment.map, offset)
+        start = offset + _HEADER.size
+        end = start + source_len + length
+        if magic != RECORD_MAGIC or end > segment.size:
+            return None
+        source = bytes(segment.map[start:start + source_len]).decode()
+        payload = bytes(segment.map[start + source_len:end])
+        if zlib.crc32(payload) != crc:
+            return None
+        return source, payload, end
+
+    def _scan_end(self, segment: _Segment) -> int:
+        """Recorre un segmento hasta el primer registro inválido (fin de datos o escritura truncada)."""
+        offset = 0
+        while True:
+            record = self._record_at(segment, offset)
+            if record is None:
+                return offset
+            offset = record[2]
+
+    def _update_gauges(self):
+        metrics.set_gauge("telemetry_spool_segments", len(self._segments))
+        metrics.set_gauge("telemetry_spool_pending", int(self.has_pending()))
+
+    # --- API pública ---
+
+    def has_pending(self) -> bool:
+        return self._read < (self._write_seq, self._write_pos)
+
+    def append(self, batch: ColumnarReadings):
+        """Persiste un lote al final del spool."""
+        if not len(batch):
+            return
+        record = _encode_record(batch)
+
+        with self._lock:
+            segment = self._segment(self._write_seq)
+            if self._write_pos + len(record) + _HEADER.size > segment.size:
+                self._roll(len(record) + _HEADER.size)
+                segment = self._segment(self._write_seq)
+            segment.map[self._write_pos:self._write_pos + len(record)] = record
+            segment.map.flush()
+            self._write_pos += len(record)
+            metrics.inc("telemetry_spool_appended_rows", len(batch))
+            self._update_gauges()
+
+    def quarantine(self, batch: ColumnarReadings):
+        """Aparta un lote que no se puede escribir en la BD al fichero de cuarentena."""
+        if not len(batch):
+            return
+        record = _encode_record(batch)
+        with self._lock:
+            with open(os.path.join(self.directory, _QUARANTINE_FILE), "ab") as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+        metrics.inc("telemetry_spool_quarantined_rows", len(batch))
+
+    def _roll(self, needed: int):
+        """Abre un segmento nuevo, descartando los más antiguos si se supera el límite de disco."""
+        size = max(self.segment_bytes, needed)
+        while len(self._segments) > 1 and self._disk_bytes() + size > self.max_bytes:
+            oldest = self._segments[0]
+            logger.error(f"Spool de telemetría lleno: se descarta el segmento {oldest} sin reenviar.")
+            metrics.inc("telemetry_spool_dropped_segments")
+            self._delete_segment(oldest)
+            if self._read[0] <= oldest:
+                self._read = (self._segments[0], 0)
+                self._save_state()
+        self._write_seq += 1
+        self._write_pos = 0
+        self._create_segment(self._write_seq, size)
+
+    def read(self, max_rows: int) -> Optional[SpoolBatch]:
+        """Lee registros desde el cursor hasta reunir `max_rows` lecturas (sin avanzar el cursor)."""
+        with self._lock:
+            if not self.has_pending():
+                return None
+            seq, offset = self._read
+            result = SpoolBatch(batches=[], end=self._read)
+            rows = 0
+            while rows < max_rows and (seq, offset) < (self._write_seq, self._write_pos):
+                record = self._record_at(self._segment(seq), offset)
+                if record is None:
+                    # Fin de los datos de este segmento: se pasa al siguiente.
+                    following = [s for s in self._segments if s > seq]
+                    if not following:
+                        break
+                    seq, offset = following[0], 0
+                    result.end = (seq, offset)
+                    continue
+                source, payload, offset = record
+                result.end = (seq, offset)
+                batch = decode_msgpack_payload(payload)
+                batch.source = source or None
+                result.batches.append(batch)
+                rows += len(batch)
+            return result
+
+    def commit(self, spool_batch: SpoolBatch):
+        """Confirma un lote ya escrito en la BD (o apartado): avanza el cursor hasta su final."""
+        with self._lock:
+            # Si el límite de disco descartó el segmento mientras se reenviaba, el cursor ya está después.
+            self._read = max(self._read, spool_batch.end)
+            for seq in [s for s in self._segments if s < self._read[0]]:
+                self._delete_segment(seq)
+            if not self.has_pending() and self._read[1] and self._read[0] == self._write_seq:
+                # Todo reenviado: el segmento actual se recicla desde el principio.
+                self._delete_segment(self._write_seq)
+                self._write_seq += 1
+                self._write_pos = 0
+                self._create_segment(self._write_seq, self.segment_bytes)
+                self._read = (self._write_seq, 0)
+            self._save_state()
+            self._update_gauges()
+
+    def close(self):
+        with self._lock:
+            for segment in self._open.values():
+                segment.close()
+            self._open.clear()
+            self._lock_file.close()  # Libera el flock
+
+
+def _encode_record(batch: ColumnarReadings) -> bytes:
+    source = (batch.source or "").encode()
+    payload = encode_msgpack_payload(batch)
+    return _HEADER.pack(RECORD_MAGIC, len(payload), zlib.crc32(payload), len(source)) + source + payload
@@ -0,0 +1,130 @@
+# /app/telemetry/stream_parser.py
+"""
+Parser incremental de lecturas en NDJSON (opcionalmente comprimido con gzip).
+
+Pensado para backfills de varios GB: el cuerpo se procesa por fragmentos a medida que
+llega, con memoria acotada (cada fragmento se descomprime en pasos de 1 MiB que se parten en
+líneas al momento, y las líneas tienen longitud máxima), y cada línea se valida de forma
+independiente para poder informar las filas erróneas. Admite varios miembros gzip seguidos
+(salida de `pigz` o `cat a.gz b.gz`).
+"""
+
+import zlib
+from typing import List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.telemetry import schemas
+
+GZIP_MAGIC = b"\x1f\x8b"
+_DECOMPRESS_STEP_BYTES = 1024 * 1024
+
+ParsedChunk = Tuple[List[Tuple[int, schemas.SensorReadingCreate]], List[Tuple[int, str]]]
+
+
+class NdjsonReadingParser:
+    """
+    Convierte fragmentos de bytes en lecturas validadas y errores por número de línea.
+
+    `feed()` y `close()` devuelven `(lecturas, errores)`, donde las lecturas son pares
+    `(línea, SensorReadingCreate)` y los errores pares `(línea, mensaje)`. La compresión gzip
+    se detecta automáticamente por la firma de los primeros bytes. Lo que devuelve `feed()`
+    crece con el fragmento recibido (y su descompresión completa): el llamante debe pasar
+    fragmentos de tamaño acotado.
+    """
+
+    def __init__(self, max_line_bytes: int):
+        self.max_line_bytes = max_line_bytes
+        self.line_number = 0
+        self._buffer = bytearray()
+        self._decompressor: Optional["zlib._Decompress"] = None
+        self._started = False
+        self._discarding_long_line = False
+
+    def feed(self, data: bytes) -> ParsedChunk:
+        readings: List[Tuple[int, schemas.SensorReadingCreate]] = []
+        errors: List[Tuple[int, str]] = []
+        if not data:
+            return readings, errors
+
+        if not self._started:
+            # La firma gzip puede llegar partida entre el primer fragmento y el siguiente.
+            data = bytes(self._buffer) + data
+            self._buffer.clear()
+            if len(data) < len(GZIP_MAGIC):
+                self._buffer += data
+                return readings, errors
+            self._started = True
+            if data[:2] == GZIP_MAGIC:
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        if self._decompressor is None:
+            self._consume(data, readings, errors)
+            return readings, errors
+
+        pending = data
+        while pending:
+            try:
+                plain = self._decompressor.decompress(pending, _DECOMPRESS_STEP_BYTES)
+            except zlib.error as e:
+                raise ValueError(f"Flujo gzip inválido: {e}")
+            self._consume(plain, readings, errors)
+            if self._decompressor.eof:
+                # Fin de un miembro gzip: lo que sigue es el siguiente miembro, con su propia cabecera.
+                pending = self._decompressor.unused_data
+                if pending:
+                    self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                pending = self._decompressor.unconsumed_tail
+        return readings, errors
+
+    def close(self) -> ParsedChunk:
+        """Procesa la última línea (si no terminaba en salto de línea) y valida el fin del gzip."""
+        readings: List[Tuple[int, schemas.SensorReadingCreate]] = []
+        errors: List[Tuple[int, str]] = []
+        if self._decompressor is not None:
+            self._consume(self._decompressor.flush(), readings, errors)
+            if not self._decompressor.eof:
+                raise ValueError("Flujo gzip truncado.")
+        if self._buffer or self._discarding_long_line:
+            self._parse_line(bytes(self._buffer), readings, errors)
+            self._buffer.clear()
+        return readings, errors
+
+    def _consume(self, data: bytes, readings, errors):
+        start = 0
+        while True:
+            newline = data.find(b"\n", start)
+            if newline == -1:
+                self._append(data[start:])
+                return
+            self._append(data[start:newline])
+            self._parse_line(bytes(self._buffer), readings, errors)
+            self._buffer.clear()
+            start = newline + 1
+
+    def _append(self, fragment: bytes):
+        if self._discarding_long_line:
+            return
+        if len(self._buffer) + len(fragment) > self.max_line_bytes:
+            # La línea se descarta sin seguir acumulándola para mantener la memoria acotada.
+            self._discarding_long_line = True
+            self._buffer.clear()
+            return
+        self._buffer += fragment
+
+    def _parse_line(self, line: bytes, readings, errors):
+        self.line_number += 1
+        if self._discarding_long_line:
+            self._discarding_long_line = False
+            errors.append((self.line_number, f"La línea supera el máximo de {self.max_line_bytes} bytes."))
+            return
+        line = line.strip()
+        if not line:
+            return
+        try:
+            readings.append((self.line_number, schemas.SensorReadingCreate.model_validate_json(line)))
+        except ValidationError as e:
+            first = e.errors()[0]
+            location = ".".join(str(part) for part in first.get("loc", ())) or "línea"
+            errors.append((self.line_number, f"{location}: {first.get('msg')}"))
@@ -0,0 +1,118 @@
+# /scripts/benchmark_alarm_evaluation.py
+"""
+Benchmark de la evaluación de reglas de alarma por lotes (`app/alarming/evaluator.py`).
+
+Genera un conjunto de reglas sintéticas (de umbral y, en la fracción `--windowed-ratio`, de
+ventana) y lotes columnares con lecturas aleatorias, y mide cuánto CPU cuesta evaluar todas las
+reglas contra el flujo objetivo (por defecto 10.000 reglas y 100.000 lecturas/s). No necesita
+base de datos.
+
+Uso:
+    python scripts/benchmark_alarm_evaluation.py
+    python scripts/benchmark_alarm_evaluation.py --rules 50000 --rate 200000 --batch-rows 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.alarming.evaluator import find_breaches
+from app.alarming.rule_index import CompiledAlarmRules
+from app.alarming.windows import RULE_THRESHOLD, RingBufferStore, WINDOWED_RULE_TYPES
+from app.telemetry.columnar import ASSET_CODE_DTYPE, METRIC_CODE_DTYPE, ColumnarReadings
+
+
+def build_rules(count: int, asset_ids, metric_names, breach_ratio: float, windowed_ratio: float, rng: np.random.Generator):
+    """Reglas `>` y `<` sobre pares (activo, métrica) aleatorios; valores de lectura en [0, 100)."""
+    tenant_id = uuid.uuid4()
+    windowed_types = sorted(WINDOWED_RULE_TYPES)
+    rules = []
+    for i in range(count):
+        upper = i % 2 == 0
+        windowed = rng.random() < windowed_ratio
+        rules.append(SimpleNamespace(
+            id=uuid.uuid4(),
+            tenant_id=tenant_id,
+            asset_id=asset_ids[rng.integers(len(asset_ids))],
+            metric_name=metric_names[rng.integers(len(metric_names))],
+            condition=">" if upper else "<",
+            threshold=100.0 * (1 - breach_ratio) if upper else 100.0 * breach_ratio,
+            severity="warning",
+            rule_type=windowed_types[rng.integers(len(windowed_types))] if windowed else RULE_THRESHOLD,
+            window_seconds=60.0 if windowed else None,
+            rearm_seconds=None,
+            shelved_until=None,
+        ))
+    return CompiledAlarmRules(rules)
+
+
+def build_batch(rows: int, asset_ids, metric_names, start_ns: int, rng: np.random.Generator) -> ColumnarReadings:
+    return ColumnarReadings(
+        asset_ids=asset_ids,
+        metric_names=metric_names,
+        asset_codes=rng.integers(len(asset_ids), size=rows).astype(ASSET_CODE_DTYPE),
+        metric_codes=rng.integers(len(metric_names), size=rows).astype(METRIC_CODE_DTYPE),
+        timestamps_ns=start_ns + np.arange(rows, dtype=np.int64) * 10_000,
+        values=rng.uniform(0, 100, size=rows),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la evaluación de alarmas por lotes.")
+    parser.add_argument("--rules", type=int, default=10_000)
+    parser.add_argument("--assets", type=int, default=2_000)
+    parser.add_argument("--metrics", type=int, default=10)
+    parser.add_argument("--rate", type=int, default=100_000, help="Lecturas por segundo objetivo.")
+    parser.add_argument("--batch-rows", type=int, default=5_000, help="Filas por lote (como TELEMETRY_BATCH_MAX_ROWS).")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Segundos de flujo simulado.")
+    parser.add_argument("--breach-ratio", type=float, default=0.001, help="Fracción de lecturas que incumple cada regla.")
+    parser.add_argument("--windowed-ratio", type=float, default=0.1, help="Fracción de reglas de ventana.")
+    parser.add_argument("--buffer-samples", type=int, default=256, help="Como ALARM_WINDOW_BUFFER_SAMPLES.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    asset_ids = [uuid.uuid4() for _ in range(args.assets)]
+    metric_names = [f"metric_{i}" for i in range(args.metrics)]
+
+    started = time.perf_counter()
+    rules = build_rules(args.rules, asset_ids, metric_names, args.breach_ratio, args.windowed_ratio, rng)
+    print(f"Reglas compiladas: {len(rules)} en {len(rules.spans)} pares (activo, métrica), "
+          f"{len(rules.windowed)} con reglas de ventana, en {(time.perf_counter() - started) * 1000:.1f} ms")
+    buffers = RingBufferStore(capacity=args.buffer_samples)
+
+    n_batches = max(1, int(args.rate * args.seconds / args.batch_rows))
+    batches = [build_batch(args.batch_rows, asset_ids, metric_names, i * 10**9, rng) for i in range(n_batches)]
+    find_breaches(rules, batches[0], buffers)  # calentamiento
+
+    timings = []
+    breached = occurrences = 0
+    for batch in batches:
+        t0 = time.perf_counter()
+        result = find_breaches(rules, batch, buffers)
+        timings.append(time.perf_counter() - t0)
+        breached += len(result)
+        occurrences += int(result.occurrences.sum())
+
+    timings = np.array(timings)
+    total_rows = n_batches * args.batch_rows
+    throughput = total_rows / timings.sum()
+    print(f"Lotes: {n_batches} x {args.batch_rows} filas ({total_rows} lecturas)")
+    print(f"Tiempo por lote: p50 {np.percentile(timings, 50) * 1000:.2f} ms, "
+          f"p99 {np.percentile(timings, 99) * 1000:.2f} ms, máx {timings.max() * 1000:.2f} ms")
+    print(f"Capacidad: {throughput:,.0f} lecturas/s en un núcleo")
+    print(f"CPU necesaria a {args.rate:,} lecturas/s: {args.rate / throughput * 100:.1f}% de un núcleo")
+    print(f"Incumplimientos: {occurrences} lecturas agrupadas en {breached} alarmas candidatas "
+          f"({occurrences / max(breached, 1):.1f} por alarma)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# /scripts/benchmark_telemetry_formats.py
+"""
+Benchmark del coste de parseo de los formatos de ingesta de telemetría.
+
+Compara el CPU necesario para convertir un cuerpo de petición en un lote `ColumnarReadings`:
+- JSON (`BulkSensorReadingCreate` validado por Pydantic lectura a lectura).
+- MessagePack columnar (decodificado directamente a arrays de NumPy).
+
+No necesita base de datos.
+
+Uso:
+    python scripts/benchmark_telemetry_formats.py
+    python scripts/benchmark_telemetry_formats.py --readings 10000 --repeat 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.telemetry.columnar import ColumnarReadings, decode_msgpack_payload, encode_msgpack_payload
+from app.telemetry.schemas import BulkSensorReadingCreate, SensorReadingCreate
+
+
+def build_readings(count: int, assets: int, metrics: int):
+    asset_ids = [uuid.uuid4() for _ in range(assets)]
+    metric_names = [f"metric_{i}" for i in range(metrics)]
+    base = datetime.now(timezone.utc)
+    return [
+        SensorReadingCreate(
+            asset_id=asset_ids[i % assets],
+            timestamp=base + timedelta(milliseconds=i),
+            metric_name=metric_names[i % metrics],
+            value=i * 0.5,
+        )
+        for i in range(count)
+    ]
+
+
+def parse_json(body: bytes) -> ColumnarReadings:
+    return ColumnarReadings.from_readings(BulkSensorReadingCreate.model_validate_json(body).readings)
+
+
+def measure(func, body: bytes, repeat: int) -> float:
+    """Devuelve el mejor tiempo de CPU (segundos) de `repeat` ejecuciones."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        func(body)
+        best = min(best, time.process_time() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de parseo JSON vs MessagePack columnar.")
+    parser.add_argument("--readings", type=int, default=10_000, help="Lecturas por petición.")
+    parser.add_argument("--assets", type=int, default=50, help="Activos distintos en el lote.")
+    parser.add_argument("--metrics", type=int, default=20, help="Métricas distintas en el lote.")
+    parser.add_argument("--repeat", type=int, default=20, help="Repeticiones por formato.")
+    args = parser.parse_args()
+
+    readings = build_readings(args.readings, args.assets, args.metrics)
+    json_body = json.dumps({"readings": [r.model_dump(mode="json") for r in readings]}).encode()
+    msgpack_body = encode_msgpack_payload(ColumnarReadings.from_readings(readings))
+
+    json_cpu = measure(parse_json, json_body, args.repeat)
+    msgpack_cpu = measure(decode_msgpack_payload, msgpack_body, args.repeat)
+
+    print(f"🏁 Parseo de {args.readings} lecturas (mejor de {args.repeat})")
+    print(f"{'formato':>10} | {'bytes':>10} | {'CPU (ms)':>9}")
+    print("-" * 36)
+    print(f"{'JSON':>10} | {len(json_body):>10,} | {json_cpu * 1000:>9.2f}")
+    print(f"{'MsgPack':>10} | {len(msgpack_body):>10,} | {msgpack_cpu * 1000:>9.2f}")
+    print(f"Speedup: {json_cpu / max(msgpack_cpu, 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# /scripts/benchmark_telemetry_ingest.py
+"""
+Benchmark de las rutas de inserción masiva de telemetría.
+
+Compara filas/segundo entre la ruta ORM original (`create_bulk_readings`: dicts ->
+objetos `SensorReading` -> `add_all` -> `commit`) y la ruta COPY binaria
+(`copy_bulk_readings`) para distintos tamaños de lote.
+
+Uso:
+    python scripts/benchmark_telemetry_ingest.py
+    python scripts/benchmark_telemetry_ingest.py --sizes 100 10000 --asset-id <uuid>
+
+Las filas se escriben en una ventana de tiempo aislada y se eliminan al terminar cada medición.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal
+from app.telemetry.repository import TelemetryRepository
+from app.telemetry.schemas import SensorReadingCreate
+
+DEFAULT_SIZES = [100, 10_000, 1_000_000]
+# Ventana de tiempo dedicada para no colisionar con datos reales.
+BENCHMARK_EPOCH = datetime(1999, 1, 1, tzinfo=timezone.utc)
+
+
+def build_readings(asset_id: uuid.UUID, size: int, base: datetime):
+    """Genera lecturas sintéticas con timestamps únicos (la PK es timestamp + asset_id)."""
+    return [
+        SensorReadingCreate(
+            asset_id=asset_id,
+            timestamp=base + timedelta(microseconds=i),
+            metric_name="benchmark_metric",
+            value=float(i % 1000),
+        )
+        for i in range(size)
+    ]
+
+
+def cleanup(db, asset_id: uuid.UUID, base: datetime, size: int):
+    db.execute(
+        text("DELETE FROM sensor_readings WHERE asset_id = :asset_id AND timestamp >= :start AND timestamp <= :end"),
+        {"asset_id": asset_id, "start": base, "end": base + timedelta(microseconds=size)},
+    )
+    db.commit()
+
+
+def run_case(method_name: str, asset_id: uuid.UUID, size: int, base: datetime) -> float:
+    """Ejecuta una inserción y devuelve las filas/segundo medidas (sin contar la generación de datos)."""
+    readings = build_readings(asset_id, size, base)
+    db = SessionLocal()
+    try:
+        repo = TelemetryRepository(db)
+        started = time.perf_counter()
+        getattr(repo, method_name)(readings)
+        elapsed = time.perf_counter() - started
+        cleanup(db, asset_id, base, size)
+        return size / elapsed
+    finally:
+        db.close()
+
+
+def resolve_asset_id(explicit: str | None) -> uuid.UUID:
+    if explicit:
+        return uuid.UUID(explicit)
+    db = SessionLocal()
+    try:
+        asset_id = db.execute(text("SELECT id FROM assets LIMIT 1")).scalar()
+    finally:
+        db.close()
+    if not asset_id:
+        raise SystemExit("❌ No hay activos en la base de datos. Ejecuta el sembrado o usa --asset-id.")
+    return asset_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ORM vs COPY para sensor_readings.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Tamaños de lote a medir.")
+    parser.add_argument("--asset-id", help="Activo existente al que asociar las lecturas sintéticas.")
+    args = parser.parse_args()
+
+    asset_id = resolve_asset_id(args.asset_id)
+    print(f"🏁 Benchmark de ingesta de telemetría (asset_id={asset_id})")
+    print(f"{'filas':>10} | {'ORM (filas/s)':>15} | {'COPY (filas/s)':>15} | {'speedup':>8}")
+    print("-" * 58)
+
+    for index, size in enumerate(args.sizes):
+        # Cada caso usa su propia ventana de tiempo para que las PK nunca colisionen.
+        orm_base = BENCHMARK_EPOCH + timedelta(days=2 * index)
+        copy_base = orm_base + timedelta(days=1)
+        orm_rate = run_case("create_bulk_readings", asset_id, size, orm_base)
+        copy_rate = run_case("copy_bulk_readings", asset_id, size, copy_base)
+        print(f"{size:>10} | {orm_rate:>15,.0f} | {copy_rate:>15,.0f} | {copy_rate / orm_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
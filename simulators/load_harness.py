@@ -0,0 +1,347 @@
+# /simulators/load_harness.py
+"""
+Generador de carga para medir el Core Engine y la API de ingesta de extremo a extremo.
+
+Dos modos, cada uno en un único proceso asyncio:
+
+- `modbus`: levanta cientos de esclavos Modbus TCP simulados (uno por puerto) con un número
+  configurable de registros y un patrón de valores (`sine`, `ramp`, `random`, `constant`).
+  Informa de las peticiones y registros servidos por segundo (lo que el Core Engine lee) y
+  puede generar las definiciones de `DataSource` para registrarlas en la API.
+
+      python simulators/load_harness.py --asset-id <uuid> --duration 0 \\
+          modbus --slaves 300 --registers 200 --emit-data-sources /tmp/data_sources.json
+
+- `gateway`: simula gateways de planta que envían lotes a `POST /telemetry/readings` a un
+  ritmo objetivo (lecturas/s), en MessagePack columnar o JSON. Informa del throughput
+  aceptado, los rechazos por backpressure (503) y la latencia p50/p95/p99. La latencia se
+  mide desde el instante en que el lote debía enviarse, así que incluye la espera si el
+  generador no da abasto (sin omisión coordinada).
+
+      python simulators/load_harness.py --asset-id <uuid> --duration 60 --json-report /tmp/gateway.json \\
+          gateway --rate 50000 --batch-size 1000
+
+Ambos modos imprimen un informe cada `--report-interval` segundos y un resumen al terminar.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+_logger = logging.getLogger("load_harness")
+
+PATTERNS = ("sine", "ramp", "random", "constant")
+DEFAULT_API_URL = "http://localhost:8071/api/v1/telemetry/readings"
+
+
+def pattern_values(pattern: str, t: float, phases: np.ndarray, period: float, rng: np.random.Generator) -> np.ndarray:
+    """Valores (0-1000) de un patrón para el instante `t`, uno por fase."""
+    if pattern == "sine":
+        return 500 + 400 * np.sin(2 * np.pi * (t / period + phases))
+    if pattern == "ramp":
+        return (t / period + phases) % 1.0 * 1000
+    if pattern == "random":
+        return rng.uniform(0, 1000, phases.shape[0])
+    return np.full(phases.shape[0], 500.0)
+
+
+class LatencyStats:
+    """Contadores y latencias de un intervalo de informe y del total de la prueba."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total: Dict[str, float] = {}
+        self.window: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self.window_latencies: List[float] = []
+        self.window_started = self.started
+
+    def inc(self, name: str, amount: float = 1):
+        self.total[name] = self.total.get(name, 0) + amount
+        self.window[name] = self.window.get(name, 0) + amount
+
+    def observe(self, seconds: float):
+        self.latencies.append(seconds)
+        self.window_latencies.append(seconds)
+
+    @staticmethod
+    def _percentiles(values: List[float]) -> Dict[str, float]:
+        if not values:
+            return {}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000, "max_ms": max(values) * 1000}
+
+    def _report(self, counts: Dict[str, float], latencies: List[float], elapsed: float) -> Dict[str, float]:
+        report = {"elapsed_s": elapsed}
+        for name, value in counts.items():
+            report[name] = value
+            report[f"{name}_per_s"] = value / elapsed if elapsed else 0.0
+        report.update(self._percentiles(latencies))
+        return report
+
+    def flush_window(self) -> Dict[str, float]:
+        now = time.perf_counter()
+        report = self._report(self.window, self.window_latencies, now - self.window_started)
+        self.window, self.window_latencies, self.window_started = {}, [], now
+        return report
+
+    def summary(self) -> Dict[str, float]:
+        return self._report(self.total, self.latencies, time.perf_counter() - self.started)
+
+
+def _format(report: Dict[str, float]) -> str:
+    return "  ".join(f"{k}={v:,.1f}" for k, v in report.items() if k != "elapsed_s")
+
+
+async def _report_loop(stats: LatencyStats, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        _logger.info(_format(stats.flush_window()))
+
+
+def _finish(stats: LatencyStats, json_report: Optional[str], extra: Dict):
+    summary = stats.summary()
+    _logger.info(f"RESUMEN ({summary['elapsed_s']:.1f}s): {_format(summary)}")
+    if json_report:
+        with open(json_report, "w") as f:
+            json.dump({**extra, "summary": summary}, f, indent=2)
+        _logger.info(f"Informe guardado en {json_report}")
+
+
+# --- Modo Modbus ---
+
+async def run_modbus(args):
+    from pymodbus.datastore import ModbusSequentialDataBlock, ModbusServerContext, ModbusSlaveContext
+    from pymodbus.server import ModbusTcpServer
+
+    stats = LatencyStats()
+
+    class CountingDataBlock(ModbusSequentialDataBlock):
+        """Bloque de registros que contabiliza las lecturas servidas."""
+
+        def getValues(self, address, count=1):
+            stats.inc("requests")
+            stats.inc("registers", count)
+            return super().getValues(address, count)
+
+    rng = np.random.default_rng(args.seed)
+    slaves = []
+    for i in range(args.slaves):
+        # Dirección inicial 1: el contexto del esclavo suma 1 a la dirección pedida (zero_mode=False).
+        block = CountingDataBlock(1, [0] * args.registers)
+        store = ModbusSlaveContext(hr=block, ir=block)
+        server = ModbusTcpServer(context=ModbusServerContext(slaves=store, single=True), address=(args.host, args.base_port + i))
+        slaves.append((store, server, rng.uniform(0, 1, args.registers)))
+
+    tasks = [asyncio.create_task(server.serve_forever()) for _, server, _ in slaves]
+    _logger.info(
+        f"{args.slaves} esclavos Modbus en los puertos {args.base_port}-{args.base_port + args.slaves - 1}, "
+        f"{args.registers} registros cada uno, patrón '{args.pattern}'."
+    )
+    if args.emit_data_sources:
+        _emit_data_sources(args)
+
+    reporter = asyncio.create_task(_report_loop(stats, args.report_interval))
+    deadline = time.monotonic() + args.duration if args.duration else math.inf
+    try:
+        while time.monotonic() < deadline:
+            t = time.time()
+            for store, _, phases in slaves:
+                values = pattern_values(args.pattern, t, phases, args.period, rng)
+                store.setValues(3, 0, np.rint(values).astype(np.uint16).tolist())
+            await asyncio.sleep(args.update_interval)
+    finally:
+        reporter.cancel()
+        for _, server, _ in slaves:
+            await server.shutdown()
+        for task in tasks:
+            task.cancel()
+        _finish(stats, args.json_report, {"mode": "modbus", "slaves": args.slaves, "registers": args.registers})
+
+
+def _emit_data_sources(args):
+    """Escribe las definiciones de `DataSource` (cuerpo de `POST /sys-mgt/data-sources/`)."""
+    if not args.asset_id:
+        raise SystemExit("--emit-data-sources requiere al menos un --asset-id")
+    data_sources = []
+    for i in range(args.slaves):
+        asset_id = args.asset_id[i % len(args.asset_id)]
+        data_sources.append({
+            "name": f"load-harness-modbus-{i:04d}",
+            "protocol": "modbus_tcp",
+            "connection_params": {
+                "host": args.advertise_host,
+                "port": args.base_port + i,
+                "polling_interval_seconds": args.poll_interval,
+                "registers": [
+                    {"address": r, "asset_id": asset_id, "metric_name": f"slave{i:04d}_reg{r:03d}"}
+                    for r in range(args.registers)
+                ],
+            },
+        })
+    with open(args.emit_data_sources, "w") as f:
+        json.dump(data_sources, f, indent=2)
+    _logger.info(f"{len(data_sources)} definiciones de DataSource escritas en {args.emit_data_sources}")
+
+
+# --- Modo gateway HTTP ---
+
+class BatchFactory:
+    """Genera lotes sintéticos con timestamps únicos (la PK incluye el timestamp)."""
+
+    def __init__(self, asset_ids: List[uuid.UUID], metrics_per_asset: int, batch_size: int, pattern: str, period: float, seed: int):
+        from app.telemetry.columnar import ColumnarReadings
+
+        self._columnar = ColumnarReadings
+        self.asset_ids = asset_ids
+        self.metric_names = [f"load_metric_{m:03d}" for m in range(metrics_per_asset)]
+        series = np.arange(batch_size)
+        self.asset_codes = (series % len(asset_ids)).astype(np.int32)
+        self.metric_codes = ((series // len(asset_ids)) % metrics_per_asset).astype(np.int32)
+        self.rng = np.random.default_rng(seed)
+        self.phases = self.rng.uniform(0, 1, batch_size)
+        self.pattern, self.period = pattern, period
+        self.batch_size = batch_size
+        self._last_ns = 0
+
+    def build(self):
+        # Cada lectura usa un microsegundo distinto para que ninguna colisione con otra.
+        span_ns = self.batch_size * 1_000
+        now_ns = max(time.time_ns() // 1_000 * 1_000, self._last_ns + span_ns)
+        self._last_ns = now_ns
+        return self._columnar(
+            asset_ids=self.asset_ids,
+            metric_names=self.metric_names,
+            asset_codes=self.asset_codes,
+            metric_codes=self.metric_codes,
+            timestamps_ns=now_ns - np.arange(self.batch_size, dtype=np.int64) * 1_000,
+            values=pattern_values(self.pattern, time.time(), self.phases, self.period, self.rng),
+        )
+
+
+def _to_json(batch) -> bytes:
+    timestamps = (batch.timestamps_ns // 1_000).astype("datetime64[us]").astype(str)
+    readings = [
+        {
+            "asset_id": str(batch.asset_ids[a]),
+            "metric_name": batch.metric_names[m],
+            "timestamp": f"{ts}Z",
+            "value": float(v),
+        }
+        for a, m, ts, v in zip(batch.asset_codes, batch.metric_codes, timestamps, batch.values)
+    ]
+    return json.dumps({"readings": readings}).encode()
+
+
+async def run_gateway(args):
+    import httpx
+
+    from app.telemetry.columnar import encode_msgpack_payload
+
+    if not args.asset_id:
+        raise SystemExit("El modo gateway requiere al menos un --asset-id")
+    factory = BatchFactory(
+        [uuid.UUID(a) for a in args.asset_id], args.metrics, args.batch_size, args.pattern, args.period, args.seed
+    )
+    encode, content_type = (
+        (encode_msgpack_payload, "application/msgpack") if args.format == "msgpack" else (_to_json, "application/json")
+    )
+    stats = LatencyStats()
+    period = args.batch_size / args.rate  # segundos entre lotes para alcanzar el ritmo objetivo
+    start = time.perf_counter() + 0.5
+    end = start + args.duration
+    next_index = 0
+
+    async def _sender(client: httpx.AsyncClient):
+        nonlocal next_index
+        while True:
+            scheduled = start + next_index * period
+            next_index += 1
+            if scheduled >= end:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            body = encode(factory.build())
+            try:
+                response = await client.post(args.url, content=body, headers={"Content-Type": content_type})
+            except httpx.HTTPError as e:
+                stats.inc("errors")
+                _logger.debug(f"Error de conexión: {e}")
+                continue
+            stats.observe(time.perf_counter() - scheduled)
+            if response.status_code == 202:
+                stats.inc("accepted_rows", args.batch_size)
+                stats.inc("requests")
+            elif response.status_code == 503:
+                stats.inc("rejected_503")
+            else:
+                stats.inc("errors")
+                _logger.debug(f"Respuesta {response.status_code}: {response.text[:200]}")
+
+    _logger.info(
+        f"Gateway: {args.rate:,} lecturas/s objetivo en lotes de {args.batch_size} ({args.format}) "
+        f"con {args.concurrency} conexiones durante {args.duration}s -> {args.url}"
+    )
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    reporter = asyncio.create_task(_report_loop(stats, args.report_interval))
+    try:
+        async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+            await asyncio.gather(*(_sender(client) for _ in range(args.concurrency)))
+    finally:
+        reporter.cancel()
+        _finish(stats, args.json_report, {"mode": "gateway", "target_rate": args.rate, "batch_size": args.batch_size, "format": args.format})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de carga para el Core Engine y la API de ingesta.")
+    parser.add_argument("--pattern", choices=PATTERNS, default="sine")
+    parser.add_argument("--period", type=float, default=60.0, help="Periodo (s) de los patrones sine y ramp.")
+    parser.add_argument("--asset-id", action="append", default=[], help="Activo destino (repetible).")
+    parser.add_argument("--duration", type=float, default=60.0, help="Segundos de prueba (0 = sin límite en modbus).")
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--json-report", help="Ruta donde guardar el resumen en JSON.")
+    parser.add_argument("--seed", type=int, default=0)
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    modbus = sub.add_parser("modbus", help="Esclavos Modbus TCP simulados.")
+    modbus.add_argument("--slaves", type=int, default=100)
+    modbus.add_argument("--registers", type=int, default=200)
+    modbus.add_argument("--host", default="0.0.0.0")
+    modbus.add_argument("--advertise-host", default="localhost", help="Host que usarán los conectores.")
+    modbus.add_argument("--base-port", type=int, default=15020)
+    modbus.add_argument("--update-interval", type=float, default=1.0, help="Segundos entre actualizaciones de valores.")
+    modbus.add_argument("--poll-interval", type=float, default=1.0, help="polling_interval_seconds de las fuentes generadas.")
+    modbus.add_argument("--emit-data-sources", help="Ruta donde escribir las definiciones de DataSource.")
+
+    gateway = sub.add_parser("gateway", help="Gateways HTTP que envían lotes a la API de ingesta.")
+    gateway.add_argument("--url", default=DEFAULT_API_URL)
+    gateway.add_argument("--rate", type=int, default=10_000, help="Lecturas por segundo objetivo.")
+    gateway.add_argument("--batch-size", type=int, default=1_000)
+    gateway.add_argument("--metrics", type=int, default=10, help="Métricas por activo.")
+    gateway.add_argument("--concurrency", type=int, default=16, help="Peticiones en vuelo como máximo.")
+    gateway.add_argument("--format", choices=("msgpack", "json"), default="msgpack")
+    gateway.add_argument("--timeout", type=float, default=10.0)
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_modbus(args) if args.mode == "modbus" else run_gateway(args))
+    except KeyboardInterrupt:
+        _logger.info("Generador de carga detenido por el usuario.")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ import asyncio
 import logging
 import random
 
+NUM_REGISTERS = 200  # Registros holding expuestos (los 2 primeros tienen semántica propia)
+
 from pymodbus.server import StartAsyncTcpServer
 from pymodbus.datastore import ModbusSequentialDataBlock, ModbusSlaveContext, ModbusServerContext
 
@@ -23,18 +25,20 @@ async def run_server():
     # Usaremos registros "holding" (código de función 3)
     # Dirección 0: Nivel del Tanque (0-1000)
     # Dirección 1: Estado de la Válvula (0=OFF, 1=ON)
+    # Direcciones 2..199: señales analógicas genéricas (0-1000)
     store = ModbusSlaveContext(
-        hr=ModbusSequentialDataBlock(0, [0] * 100),
+        hr=ModbusSequentialDataBlock(0, [0] * NUM_REGISTERS),
     )
     context = ModbusServerContext(slaves=store, single=True)
 
     # Inicia el servidor en el puerto 5020
-    server_task = StartAsyncTcpServer(context, address=("", 5020))
+    server_task = asyncio.create_task(StartAsyncTcpServer(context=context, address=("", 5020)))
 
     _logger.info("Servidor Modbus TCP Simulador iniciado en el puerto 5020.")
     _logger.info("Registros disponibles:")
     _logger.info("  - Dirección 0: Nivel del Tanque (Holding Register)")
     _logger.info("  - Dirección 1: Estado de la Válvula (Holding Register)")
+    _logger.info(f"  - Direcciones 2-{NUM_REGISTERS - 1}: Señales analógicas genéricas (Holding Registers)")
 
     # Bucle para actualizar los valores de los registros
     while True:
@@ -51,6 +55,7 @@ async def run_server():
 
             store.setValues(3, 0, [new_level])
             store.setValues(3, 1, [valve_status])
+            store.setValues(3, 2, [random.randint(0, 1000) for _ in range(NUM_REGISTERS - 2)])
 
             _logger.info(f"Actualizando registros -> Nivel Tanque: {new_level}, Estado Válvula: {'ON' if valve_status == 1 else 'OFF'}")
             
@@ -0,0 +1,101 @@
+import numpy as np
+
+from app.alarming.windows import (
+    RULE_RATE_OF_CHANGE,
+    RULE_ROLLING_MEAN,
+    RULE_ROLLING_STD,
+    RingBufferStore,
+    sustained_breaches,
+    window_statistic,
+)
+
+SECOND = 1_000_000_000
+
+
+def _series(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.arange(values.shape[0], dtype=np.int64) * SECOND, values
+
+
+def test_ring_buffer_keeps_last_samples_in_order():
+    store = RingBufferStore(capacity=4, initial_slots=1)
+    store.extend("a", *_series([1, 2, 3]))
+    store.extend("b", *_series([10]))
+    ts, values = store.read("a")
+    assert values.tolist() == [1, 2, 3]
+
+    store.extend("a", np.array([3, 4, 5]) * SECOND, np.array([4.0, 5.0, 6.0]))
+    ts, values = store.read("a")
+    assert values.tolist() == [3, 4, 5, 6]
+    assert (ts // SECOND).tolist() == [2, 3, 4, 5]
+    assert store.read("b")[1].tolist() == [10]
+    assert store.read("missing")[0].shape == (0,)
+    assert len(store) == 2
+
+
+def test_ring_buffer_revert_keeps_later_extensions():
+    """
+    Deshacer las lecturas de un lote sin confirmar recupera las que desplazó y conserva las que
+    otro lote añadió después.
+    """
+    store = RingBufferStore(capacity=3, initial_slots=1)
+    store.extend("a", *_series([1, 2, 3]))
+    undo = store.extend("a", np.array([3, 4]) * SECOND, np.array([4.0, 5.0]))  # lote que hará rollback
+    store.extend("a", np.array([5]) * SECOND, np.array([6.0]))  # otro lote, confirmado
+
+    store.revert("a", undo)
+
+    ts, values = store.read("a")
+    assert (ts // SECOND).tolist() == [1, 2, 5]
+    assert values.tolist() == [2, 3, 6]
+
+
+def test_ring_buffer_revert_keeps_other_readings_with_the_same_timestamp():
+    store = RingBufferStore(capacity=4, initial_slots=1)
+    store.extend("a", *_series([1, 2]))
+    undo = store.extend("a", np.array([2]) * SECOND, np.array([3.0]))  # lote que hará rollback
+    store.extend("a", np.array([2]) * SECOND, np.array([7.0]))  # p. ej. replay del spool
+
+    store.revert("a", undo)
+
+    ts, values = store.read("a")
+    assert (ts // SECOND).tolist() == [0, 1, 2]
+    assert values.tolist() == [1, 2, 7]
+
+
+def test_rolling_mean_and_std_match_direct_computation():
+    ts, values = _series([1000.0, 1002.0, 1004.0, 1010.0, 1010.0, 1030.0])
+    mean = window_statistic(RULE_ROLLING_MEAN, ts, values, 2 * SECOND, first=2)
+    std = window_statistic(RULE_ROLLING_STD, ts, values, 2 * SECOND, first=2)
+    for k, j in enumerate(range(2, 6)):
+        window = values[j - 2:j + 1]
+        assert np.isclose(mean[k], window.mean())
+        assert np.isclose(std[k], window.std())
+
+
+def test_rate_of_change_is_per_second_from_oldest_sample_in_window():
+    ts, values = _series([0.0, 10.0, 30.0, 60.0])
+    rate = window_statistic(RULE_RATE_OF_CHANGE, ts, values, 2 * SECOND)
+    assert np.isnan(rate[0])
+    assert rate[1:].tolist() == [10.0, 15.0, 25.0]
+
+
+def test_sustained_requires_condition_for_whole_window():
+    ts, values = _series([1, 5, 5, 5, 1, 5, 5, 5, 5])
+    hit, streak = sustained_breaches(ts, values > 3, 2 * SECOND)
+    assert np.flatnonzero(hit).tolist() == [3, 7, 8]
+    assert streak == 5 * SECOND
+
+    first, streak = sustained_breaches(ts[:6], values[:6] > 3, 2 * SECOND)
+    second, streak = sustained_breaches(ts[6:], values[6:] > 3, 2 * SECOND, streak)
+    assert np.concatenate([first, second]).tolist() == hit.tolist()
+
+
+def test_sustained_streak_is_not_limited_by_the_buffer():
+    """Una condición mantenida 20 min a 1 Hz dispara una regla de 600 s aunque llegue en lotes."""
+    streak, fired = None, []
+    for start in range(0, 1200, 100):
+        ts = np.arange(start, start + 100, dtype=np.int64) * SECOND
+        hit, streak = sustained_breaches(ts, np.ones(100, dtype=bool), 600 * SECOND, streak)
+        fired += (ts[hit] // SECOND).tolist()
+    assert fired[0] == 600 and len(fired) == 600
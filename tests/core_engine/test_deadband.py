@@ -0,0 +1,36 @@
+# /tests/core_engine/test_deadband.py
+"""
+Tests para el filtro de banda muerta de los conectores.
+"""
+import numpy as np
+
+from app.core_engine.connectors.deadband import DeadbandFilter
+
+
+def test_deadband_rules_over_consecutive_polls():
+    """
+    Banda absoluta, porcentual, intervalo mínimo y latido evaluados ciclo a ciclo.
+    """
+    deadband = DeadbandFilter(
+        [
+            {"deadband_abs": 1},
+            {"deadband_pct": 10},
+            {"min_interval_seconds": 5},
+            {"deadband_abs": 100, "max_silent_seconds": 10},
+        ]
+    )
+    tags = np.arange(4)
+
+    assert deadband.apply(tags, [0, 100, 0, 0], [0] * 4).tolist() == [True, True, True, True]
+    assert deadband.apply(tags, [0.5, 105, 1, 1], [1] * 4).tolist() == [False, False, False, False]
+    assert deadband.apply(tags, [1.6, 111, 1, 1], [2] * 4).tolist() == [True, True, False, False]
+    assert deadband.apply(tags, [1.6, 111, 2, 1], [6] * 4).tolist() == [False, False, True, False]
+    assert deadband.apply(tags, [1.6, 111, 2, 1], [10] * 4).tolist() == [False, False, False, True]
+
+
+def test_repeated_tags_in_one_batch_are_evaluated_in_order():
+    deadband = DeadbandFilter([{"deadband_abs": 1}, {}])
+
+    keep = deadband.apply([0, 0, 1, 0, 1], [0, 0.5, 3, 2, 3], [0, 1, 1, 2, 2])
+
+    assert keep.tolist() == [True, False, True, True, True]
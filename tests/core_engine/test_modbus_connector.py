@@ -0,0 +1,68 @@
+# /tests/core_engine/test_modbus_connector.py
+"""
+Tests para el conector Modbus.
+"""
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.core_engine.connectors.modbus_client import ILLEGAL_DATA_ADDRESS, ModbusReadError
+from app.core_engine.connectors.modbus_connector import ModbusConnector
+
+
+class _DeviceWithoutAddress:
+    """Dispositivo falso que rechaza cualquier petición que incluya la dirección `missing`."""
+
+    def __init__(self, missing: int):
+        self.missing = missing
+        self.requests = []
+
+    async def read_block(self, block):
+        self.requests.append((block.start, block.count))
+        if block.start <= self.missing < block.start + block.count:
+            raise ModbusReadError(block, ILLEGAL_DATA_ADDRESS)
+        return [7] * block.count
+
+
+def test_illegal_address_in_contiguous_block_is_isolated():
+    """
+    Un bloque contiguo rechazado se divide en bloques de un registro: los demás registros se
+    siguen leyendo y el plan deja de incluir el bloque rechazado (sin reintentarlo en bucle).
+    """
+    asset_id = uuid.uuid4()
+    data_source = SimpleNamespace(
+        id=uuid.uuid4(),
+        name="plc",
+        connection_params={"registers": [{"address": a, "asset_id": asset_id, "metric_name": f"m{a}"} for a in range(3)]},
+    )
+    connector = ModbusConnector(data_source, data_callback=None, scheduler=None)
+    connector.client = _DeviceWithoutAddress(missing=1)
+
+    results = asyncio.run(connector._read_block(connector.read_plan[0]))
+
+    assert connector.client.requests == [(0, 3), (0, 1), (1, 1), (2, 1)]
+    assert [block.start for block, _, _ in results] == [0, 2]
+    assert [(b.start, b.count) for b in connector.read_plan] == [(0, 1), (1, 1), (2, 1)]
+
+
+def test_poll_without_any_readable_block_is_a_failure():
+    """Si no se puede leer ningún registro, el ciclo cuenta como fallo para el supervisor."""
+    asset_id = uuid.uuid4()
+    data_source = SimpleNamespace(
+        id=uuid.uuid4(),
+        name="plc",
+        connection_params={"registers": [{"address": 0, "asset_id": asset_id, "metric_name": "m0"}]},
+    )
+    connector = ModbusConnector(data_source, data_callback=None, scheduler=None)
+    connector.client = _DeviceWithoutAddress(missing=0)
+
+    async def _ensure_connected():
+        pass
+
+    connector.client.ensure_connected = _ensure_connected
+    with pytest.raises(ModbusReadError):
+        asyncio.run(connector.poll_once())
+    assert connector.health.consecutive_failures == 1
+    assert connector.health.last_success_at is None
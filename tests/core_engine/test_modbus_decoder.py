@@ -0,0 +1,39 @@
+# /tests/core_engine/test_modbus_decoder.py
+"""
+Tests para la decodificación tipada de registros Modbus.
+"""
+import struct
+
+from app.core_engine.connectors.modbus_decoder import BlockDecoder
+from app.core_engine.connectors.modbus_read_planner import plan_reads
+
+
+def _words(raw: bytes):
+    return [int.from_bytes(raw[i:i + 2], "big") for i in range(0, len(raw), 2)]
+
+
+def test_block_is_decoded_with_types_orders_and_scaling():
+    """
+    Un bloque con tipos, órdenes de bytes/palabras y escalados mixtos se decodifica de una vez.
+    """
+    registers = [
+        {"address": 0, "data_type": "float32"},
+        {"address": 2, "data_type": "int32", "word_order": "little"},
+        {"address": 4, "data_type": "int16", "scale": 0.1, "offset": 5},
+        {"address": 5, "data_type": "float64", "byte_order": "little", "word_order": "little"},
+        {"address": 9},
+    ]
+    int32 = struct.pack(">i", -123456)
+    words = (
+        _words(struct.pack(">f", 3.25))
+        + _words(int32[2:] + int32[:2])
+        + _words(struct.pack(">h", -50))
+        + _words(struct.pack("<d", -1.5e10))
+        + [65535]
+    )
+
+    plan = plan_reads(registers)
+    values = BlockDecoder(plan[0], registers).decode(words)
+
+    assert len(plan) == 1 and plan[0].count == 10
+    assert values.tolist() == [3.25, -123456.0, 0.0, -1.5e10, 65535.0]
@@ -0,0 +1,64 @@
+# /tests/core_engine/test_modbus_read_planner.py
+"""
+Tests para el planificador de lecturas Modbus.
+"""
+from app.core_engine.connectors.modbus_read_planner import MAX_REGISTERS_PER_REQUEST, plan_reads
+
+
+def test_contiguous_registers_are_coalesced():
+    """
+    200 registros consecutivos deben leerse en 2 peticiones (límite de 125 por petición).
+    """
+    registers = [{"address": i} for i in range(200)]
+
+    plan = plan_reads(registers)
+
+    assert [(b.start, b.count) for b in plan] == [(0, MAX_REGISTERS_PER_REQUEST), (125, 75)]
+    offsets = {item.index: (block.start + item.offset) for block in plan for item in block.items}
+    assert offsets == {i: i for i in range(200)}
+
+
+def test_gaps_slaves_and_register_types_split_requests():
+    """
+    Los huecos grandes, los esclavos distintos y los registros input abren peticiones nuevas.
+    """
+    registers = [
+        {"address": 0},
+        {"address": 1, "count": 2},
+        {"address": 10},               # Hueco pequeño: se fusiona
+        {"address": 500},              # Hueco grande: petición nueva
+        {"address": 2, "register_type": "input"},
+        {"address": 3, "slave_id": 7},
+    ]
+
+    plan = plan_reads(registers, max_gap=16)
+
+    assert [(b.slave, b.register_type, b.start, b.count) for b in plan] == [
+        (1, "holding", 0, 11),
+        (1, "holding", 500, 1),
+        (1, "input", 2, 1),
+        (7, "holding", 3, 1),
+    ]
+
+
+def test_split_contiguous_drops_gaps():
+    block = plan_reads([{"address": 0}, {"address": 5}, {"address": 6}])[0]
+
+    parts = block.split_contiguous()
+
+    assert [(p.start, p.count) for p in parts] == [(0, 1), (5, 2)]
+    assert [item.index for p in parts for item in p.items] == [0, 1, 2]
+
+
+def test_split_of_contiguous_block_isolates_each_register():
+    """
+    Un bloque ya contiguo rechazado por "Illegal Data Address" se divide en un bloque por
+    registro; si no, el conector volvería a pedir el mismo bloque indefinidamente.
+    """
+    block = plan_reads([{"address": 0}, {"address": 1, "count": 2}])[0]
+
+    parts = block.split()
+
+    assert [(p.start, p.count) for p in parts] == [(0, 1), (1, 2)]
+    assert all(len(p.items) == 1 and p.items[0].offset == 0 for p in parts)
+    assert [p.split() for p in parts] == [[p] for p in parts]
@@ -0,0 +1,112 @@
+import numpy as np
+
+from app.core_engine.state_rules import (
+    DEFAULT_STATE_RULE,
+    UNKNOWN_CODE,
+    CompiledStateRule,
+    detect_transitions,
+)
+
+SECOND = 1_000_000_000
+
+
+def _rule(**overrides):
+    config = {
+        "metric_name": "Process_Speed",
+        "default_state": "STOPPED",
+        "states": [
+            {"state": "FAULT", "min": 1500},
+            {"state": "RUNNING", "min": 10, "max": 1500},
+            {"state": "IDLE", "min": 2, "max": 10},
+        ],
+    }
+    config.update(overrides)
+    return CompiledStateRule.from_config(config)
+
+
+def _names(rule, transitions):
+    return [(ts // SECOND, rule.state_names[code]) for ts, code in transitions]
+
+
+def _series(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values, np.arange(values.shape[0], dtype=np.int64) * SECOND
+
+
+def test_classify_uses_band_priority_and_default():
+    rule = _rule()
+    codes = rule.classify(np.array([0.0, 5.0, 50.0, 2000.0]))
+    assert [rule.state_names[c] for c in codes] == ["STOPPED", "IDLE", "RUNNING", "FAULT"]
+    assert rule.metric_name == "process_speed"
+
+
+def test_default_rule_matches_legacy_threshold():
+    values, ts = _series([50, 5, 20])
+    transitions, state, _ = detect_transitions(DEFAULT_STATE_RULE, values, ts)
+    assert _names(DEFAULT_STATE_RULE, transitions) == [(0, "RUNNING"), (1, "STOPPED"), (2, "RUNNING")]
+
+
+def test_hysteresis_suppresses_flapping_around_threshold():
+    rule = _rule(hysteresis=1.0)
+    values, ts = _series([12, 9.5, 10.2, 9.6, 10.4, 8.5, 9.5, 11.5])
+    transitions, state, _ = detect_transitions(rule, values, ts)
+    assert _names(rule, transitions) == [(0, "RUNNING"), (5, "IDLE"), (7, "RUNNING")]
+    assert rule.state_names[state] == "RUNNING"
+
+
+def test_min_dwell_debounces_short_excursions():
+    rule = _rule(min_dwell_seconds=2)
+    values, ts = _series([50, 0, 0, 50, 0, 0, 0, 0])
+    transitions, _, _ = detect_transitions(rule, values, ts)
+    # La primera parada dura 2 lecturas (1 s): no se confirma. La segunda sí, fechada en su inicio.
+    assert _names(rule, transitions) == [(0, "RUNNING"), (4, "STOPPED")]
+
+
+def test_pending_candidate_carries_over_batches():
+    rule = _rule(min_dwell_seconds=3)
+    running = rule.code("RUNNING")
+    values, ts = _series([0, 0])
+    transitions, state, pending = detect_transitions(rule, values, ts, state=running)
+    assert transitions == [] and state == running
+    assert pending == (rule.code("STOPPED"), 0)
+
+    values, ts = _series([0, 0, 0])
+    transitions, state, pending = detect_transitions(rule, values, ts + 2 * SECOND, state, pending)
+    assert _names(rule, transitions) == [(0, "STOPPED")]
+    assert pending is None
+
+
+def test_unknown_state_is_confirmed_immediately():
+    rule = _rule(min_dwell_seconds=60)
+    values, ts = _series([5])
+    transitions, state, _ = detect_transitions(rule, values, ts, state=UNKNOWN_CODE)
+    assert _names(rule, transitions) == [(0, "IDLE")]
+
+
+def _in_batches(rule, values, ts, cuts, state=UNKNOWN_CODE):
+    transitions, pending = [], None
+    for lo, hi in zip([0] + cuts, cuts + [values.shape[0]]):
+        found, state, pending = detect_transitions(rule, values[lo:hi], ts[lo:hi], state, pending)
+        transitions += found
+    return transitions, state, pending
+
+
+def test_batch_boundaries_do_not_change_transitions():
+    """
+    Partir una serie en cualquier punto da las mismas transiciones que evaluarla en un lote,
+    también cuando el candidato pendiente sigue en la banda de histéresis del estado actual.
+    """
+    rule = _rule(hysteresis=1.0, min_dwell_seconds=2)
+    running = rule.code("RUNNING")
+    values, ts = _series([5, 9.5, 9.5, 9.5])
+    assert _names(rule, _in_batches(rule, values, ts, [1], running)[0]) == [(0, "IDLE")]
+
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        values = rng.choice([0, 1, 3, 8, 9.5, 10, 10.5, 12, 1499, 1501, 2000], size=20).astype(np.float64)
+        ts = np.cumsum(rng.integers(0, 3, size=20)).astype(np.int64) * SECOND
+        state = int(rng.choice([UNKNOWN_CODE, running]))
+        expected = detect_transitions(rule, values, ts, state)
+        for cut in range(1, 20):
+            assert _in_batches(rule, values, ts, [cut], state) == expected
+        assert _in_batches(rule, values, ts, list(range(1, 20)), state) == expected
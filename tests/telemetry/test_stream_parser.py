@@ -0,0 +1,34 @@
+import gzip
+import json
+import uuid
+
+from app.telemetry.stream_parser import NdjsonReadingParser
+
+ASSET_ID = str(uuid.uuid4())
+
+
+def _lines(values):
+    return b"".join(
+        json.dumps({"asset_id": ASSET_ID, "timestamp": "2024-01-01T00:00:00Z", "metric_name": "temperature", "value": v}).encode() + b"\n"
+        for v in values
+    )
+
+
+def _parse(body, chunk_size):
+    parser = NdjsonReadingParser(max_line_bytes=4096)
+    readings, errors = [], []
+    for start in range(0, len(body), chunk_size):
+        found, failed = parser.feed(body[start:start + chunk_size])
+        readings += found
+        errors += failed
+    found, failed = parser.close()
+    return readings + found, errors + failed
+
+
+def test_concatenated_gzip_members_are_read_entirely():
+    body = gzip.compress(_lines([1, 2, 3])) + gzip.compress(_lines([4, 5, 6]))
+    for chunk_size in (len(body), 7, 1):
+        readings, errors = _parse(body, chunk_size)
+        assert [reading.value for _, reading in readings] == [1, 2, 3, 4, 5, 6]
+        assert [line for line, _ in readings] == [1, 2, 3, 4, 5, 6]
+        assert errors == []